@@ -0,0 +1,148 @@
+#!/usr/bin/python
+#
+# Copyright I.T. Dev Ltd 2018
+# http://www.itdev.co.uk
+#
+# Benchmark the response latency and idle CPU usage of the MCVirt agent
+# receive loop, comparing the previous polling loop (read, then sleep
+# for a second) with the event-driven loop.
+#
+# A pseudo-terminal is used in place of the VM serial port: the agent
+# loop runs in a child process against the slave side, whilst the
+# benchmark acts as the host on the master side.
+#
+# Must be run on a machine with the mcvirt-agent package installed.
+#
+# Usage: benchmark_agent_latency.py [<pings>] [<idle period (seconds)>]
+
+import os
+import pty
+import random
+import select
+import signal
+import sys
+import time
+import tty
+
+from serial import Serial
+
+from mcvirt.agent.host_connection import HostConnection
+
+PINGS = 20
+IDLE_PERIOD = 10
+RESPONSE_TIMEOUT = 5
+START_ATTEMPTS = 5
+
+
+class PollingHostConnection(HostConnection):
+    """Agent host connection using the previous polling receive loop."""
+
+    def run_loop(self, conn):
+        """Read a command from the host, handle it and then sleep."""
+        while True:
+            msg = conn.readline().strip()
+            self._handle_command(conn, msg)
+            time.sleep(1)
+
+
+def start_agent(host_connection_class, port):
+    """Fork a child process running the agent loop on the given port."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            conn = Serial(port=port, baudrate=115200, timeout=0)
+            host_connection_class().run_loop(conn)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def get_cpu_time(pid):
+    """Return the CPU time (seconds) used by the given process."""
+    with open('/proc/%s/stat' % pid, 'r') as stat_fh:
+        fields = stat_fh.read().rsplit(')', 1)[1].split()
+    # utime and stime are the 14th and 15th fields of the stat file
+    return float(int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def get_wakeups(pid):
+    """Return the number of times that the given process has voluntarily slept."""
+    with open('/proc/%s/status' % pid, 'r') as status_fh:
+        for line in status_fh:
+            if line.startswith('voluntary_ctxt_switches:'):
+                return int(line.split()[1])
+
+
+def ping(master_fd, timeout=RESPONSE_TIMEOUT):
+    """Send ping to the agent and return the time (ms) taken to receive pong."""
+    start = time.time()
+    os.write(master_fd, 'ping\n')
+    response = ''
+    while not response.endswith('\n'):
+        if not select.select([master_fd], [], [], timeout)[0]:
+            raise Exception('Timed out waiting for agent response')
+        response += os.read(master_fd, 1024)
+    if response.strip() != 'pong':
+        raise Exception('Unexpected agent response: %s' % response)
+    return (time.time() - start) * 1000
+
+
+def wait_for_agent(master_fd):
+    """Wait for the agent to respond, as data sent before it has opened the port is discarded."""
+    for attempt in range(START_ATTEMPTS):
+        try:
+            return ping(master_fd, timeout=2)
+        except Exception:
+            if attempt == START_ATTEMPTS - 1:
+                raise
+
+
+def run_benchmark(host_connection_class, pings, idle_period):
+    """Return latencies (ms), idle CPU time (ms) and idle wakeups for a receive loop."""
+    master_fd, slave_fd = pty.openpty()
+    # Disable echo before the agent has opened the port
+    tty.setraw(slave_fd)
+    pid = start_agent(host_connection_class, os.ttyname(slave_fd))
+    try:
+        wait_for_agent(master_fd)
+
+        cpu_start = get_cpu_time(pid)
+        wakeups_start = get_wakeups(pid)
+        time.sleep(idle_period)
+        idle_cpu = (get_cpu_time(pid) - cpu_start) * 1000
+        idle_wakeups = get_wakeups(pid) - wakeups_start
+
+        # Send pings at random intervals, so that they are not aligned
+        # with the sleep of the polling loop
+        latencies = []
+        for _ in range(pings):
+            time.sleep(random.random())
+            latencies.append(ping(master_fd))
+    finally:
+        os.kill(pid, signal.SIGTERM)
+        os.waitpid(pid, 0)
+        os.close(master_fd)
+        os.close(slave_fd)
+    return sorted(latencies), idle_cpu, idle_wakeups
+
+
+def main():
+    """Run the benchmark for each receive loop."""
+    pings = int(sys.argv[1]) if len(sys.argv) > 1 else PINGS
+    idle_period = int(sys.argv[2]) if len(sys.argv) > 2 else IDLE_PERIOD
+
+    print '%10s %12s %12s %12s %16s %14s' % ('loop', 'median (ms)', 'p95 (ms)', 'max (ms)',
+                                             'idle CPU (ms)', 'idle wakeups')
+    for name, host_connection_class in [('polling', PollingHostConnection),
+                                        ('event', HostConnection)]:
+        latencies, idle_cpu, idle_wakeups = run_benchmark(host_connection_class, pings,
+                                                          idle_period)
+        print '%10s %12.2f %12.2f %12.2f %16.1f %14s' % (
+            name, latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            latencies[-1], idle_cpu, idle_wakeups)
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+#
+# Copyright I.T. Dev Ltd 2018
+# http://www.itdev.co.uk
+#
+# Benchmark the statistics queries performed during statistics sync
+# against a statistics database of increasing size, with and without
+# the index added by the v2 database schema.
+#
+# Usage: benchmark_stats_db.py [<rows> ...]
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+DEVICES = 300
+STAT_TYPES = 4
+QUERY_RUNS = 20
+INSERT_BATCH = 100000
+
+
+def create_database(path):
+    """Create the v1 statistics schema."""
+    conn = sqlite3.connect(path)
+    conn.execute("""PRAGMA journal_mode=OFF""")
+    conn.execute("""PRAGMA synchronous=OFF""")
+    conn.execute("""CREATE TABLE stats(
+                        device_type INT, device_id VARCHAR,
+                        stat_type INT, stat_value REAL,
+                        stat_date INT
+                    )""")
+    return conn
+
+
+def add_rows(conn, start, end):
+    """Add rows, in the order that they are written by the statistics threads."""
+    for batch_start in range(start, end, INSERT_BATCH):
+        rows = []
+        for row in range(batch_start, min(end, batch_start + INSERT_BATCH)):
+            sample = row // STAT_TYPES
+            rows.append((2, 'vm-%s' % (sample % DEVICES), (row % STAT_TYPES) + 1,
+                         float(row % 100), 1500000000 + (sample // DEVICES)))
+        conn.executemany("""INSERT INTO stats(device_type, device_id, stat_type,
+                                              stat_value, stat_date)
+                            VALUES(?, ?, ?, ?, ?)""", rows)
+        conn.commit()
+
+
+def add_index(conn):
+    """Apply the v2 schema index."""
+    conn.execute("""CREATE INDEX IF NOT EXISTS stats_device_date
+                    ON stats(device_type, device_id, stat_date,
+                             stat_type, stat_value)""")
+    conn.execute("""ANALYZE stats""")
+    conn.commit()
+
+
+def time_queries(conn):
+    """Return average time (ms) of latest stat and statistics range queries."""
+    latest_date = conn.execute("""SELECT max(stat_date) FROM stats""").fetchone()[0]
+
+    start = time.time()
+    for run in range(QUERY_RUNS):
+        conn.execute("""SELECT max(stat_date) FROM stats WHERE device_type=? AND device_id=?""",
+                     (2, 'vm-%s' % run)).fetchone()
+    latest_ms = (time.time() - start) * 1000 / QUERY_RUNS
+
+    start = time.time()
+    for run in range(QUERY_RUNS):
+        conn.execute("""SELECT stat_date, stat_value, stat_type FROM stats
+                        WHERE device_type=? AND device_id=? AND stat_date > ?""",
+                     (2, 'vm-%s' % run, latest_date - 60)).fetchall()
+    range_ms = (time.time() - start) * 1000 / QUERY_RUNS
+    return latest_ms, range_ms
+
+
+def main():
+    """Run benchmark for each database size."""
+    sizes = sorted([int(size) for size in sys.argv[1:]] or
+                   [1000000, 5000000, 10000000, 20000000])
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print '%12s %24s %24s' % ('rows', 'latest stat (ms)', 'stats since date (ms)')
+        print '%12s %11s %12s %11s %12s' % ('', 'no index', 'index', 'no index', 'index')
+        conn = create_database(os.path.join(temp_dir, 'stats.db'))
+        row_count = 0
+        for size in sizes:
+            add_rows(conn, row_count, size)
+            row_count = size
+
+            # Copy database so that the unindexed table can continue to be extended
+            conn.close()
+            indexed_path = os.path.join(temp_dir, 'stats_indexed.db')
+            shutil.copyfile(os.path.join(temp_dir, 'stats.db'), indexed_path)
+            conn = sqlite3.connect(os.path.join(temp_dir, 'stats.db'))
+
+            no_index_latest, no_index_range = time_queries(conn)
+            indexed_conn = sqlite3.connect(indexed_path)
+            add_index(indexed_conn)
+            index_latest, index_range = time_queries(indexed_conn)
+            indexed_conn.close()
+            os.unlink(indexed_path)
+
+            print '%12s %11.2f %12.3f %11.2f %12.3f' % (
+                size, no_index_latest, index_latest, no_index_range, index_range)
+            sys.stdout.flush()
+        conn.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,9 +15,12 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
+import math
 import time
 import json
-from serial import Serial
+import select
+from threading import Lock, Thread
+from serial import Serial, SerialException
 
 from mcvirt.constants import AgentSerialConfig
 from mcvirt.os_stats import OSStats
@@ -27,6 +30,27 @@ from mcvirt.version import VERSION
 class HostConnection(object):
     """Provide loop that connects to host and runs commands."""
 
+    # Maximum number of bytes to read from the serial port at once
+    READ_SIZE = 4096
+
+    # Period (seconds) to wait before polling the serial port again, after
+    # it has been reported as readable without returning any data, which
+    # occurs whilst the host side of the port is disconnected
+    HANGUP_WAIT = 1
+
+    # Commands that are quick to run, which are handled in the receiving
+    # loop, rather than in a separate thread
+    INLINE_COMMANDS = ['ping', 'version', 'subscribe']
+
+    def __init__(self):
+        """Create lock for writing responses."""
+        self.write_lock = Lock()
+
+        # Interval (seconds) that statistics are pushed to the host,
+        # once subscribed, and the time that they are next due
+        self.telemetry_interval = None
+        self.next_telemetry = None
+
     def start_loop(self):
         """Obtain serial connection and start receiving loop."""
         conn = Serial(port=AgentSerialConfig.AGENT_PORT_PATH,
@@ -41,29 +65,149 @@ class HostConnection(object):
         if 'reset_output_buffer' in dir(conn):
             conn.reset_output_buffer()
 
+        self.run_loop(conn)
+
+    def run_loop(self, conn):
+        """Wait for data from the host and handle each command as soon as it is received."""
+        poller = select.poll()
+        poller.register(conn.fileno(), select.POLLIN | select.POLLPRI)
+        read_buffer = ''
         while True:
-            msg = conn.readline().strip()
-            self._handle_command(conn, msg)
-            time.sleep(1)
+            # Block until the serial port is readable or statistics are due to be pushed
+            events = poller.poll(self._get_poll_timeout())
+            if self.telemetry_interval and time.time() >= self.next_telemetry:
+                self._send_telemetry(conn)
+            if not events:
+                continue
+
+            data = self._read(conn)
+            if not data:
+                time.sleep(self.HANGUP_WAIT)
+                continue
+
+            # Handle each complete command, retaining any partial
+            # command until the remainder has been received
+            read_buffer += data
+            while '\n' in read_buffer:
+                msg, read_buffer = read_buffer.split('\n', 1)
+                msg = msg.strip()
+                if msg.startswith('{'):
+                    self._handle_request(conn, msg)
+                else:
+                    self._handle_command(conn, msg)
+
+    def _get_poll_timeout(self):
+        """Return the time (milliseconds) until statistics are next due
+        to be pushed, or None to wait indefinitely.
+        """
+        if not self.telemetry_interval:
+            return None
+        return max(0, int(math.ceil((self.next_telemetry - time.time()) * 1000)))
+
+    def _send_telemetry(self, conn):
+        """Push statistics to the host."""
+        self.next_telemetry += self.telemetry_interval
+        # Avoid sending a backlog of statistics if the loop has been delayed
+        if self.next_telemetry < time.time():
+            self.next_telemetry = time.time() + self.telemetry_interval
+        self._write(conn, json.dumps({'event': 'stats', 'stats': self._command_stats()}) + '\n')
+
+    def _read(self, conn):
+        """Return the data available on the serial port, without blocking."""
+        try:
+            return conn.read(self.READ_SIZE)
+        except SerialException:
+            # Raised by newer versions of pyserial when the port
+            # is readable but returns no data
+            return ''
+
+    def _write(self, conn, data):
+        """Write data to the host."""
+        with self.write_lock:
+            conn.write(data)
+            conn.flush()
+
+    def _handle_request(self, conn, msg):
+        """Handle JSON request from host, containing the request ID,
+        command and optional arguments.
+        """
+        try:
+            request = json.loads(msg)
+            request_id = request['id']
+            command = request['cmd']
+        except (ValueError, KeyError, TypeError):
+            self._write(conn, '%%%%\n')
+            return
+
+        args = request.get('args') or {}
+        if command in self.INLINE_COMMANDS:
+            self._run_request(conn, request_id, command, args)
+        else:
+            # Run in a separate thread, so that subsequent requests
+            # are not held up, with the response being returned once complete
+            thread = Thread(target=self._run_request, args=(conn, request_id, command, args))
+            thread.daemon = True
+            thread.start()
+
+    def _run_request(self, conn, request_id, command, args):
+        """Run command and write the response, containing the request ID."""
+        response = {'id': request_id}
+        command_method = getattr(self, '_command_%s' % command, None)
+        if command_method is None:
+            response['error'] = 'Unknown command'
+        else:
+            try:
+                response['result'] = command_method(**args)
+            except Exception, exc:
+                response['error'] = str(exc)
+        self._write(conn, json.dumps(response) + '\n')
 
     def _handle_command(self, conn, msg):
         """Proces command from host."""
         # Response to ping
         if msg == 'ping':
-            conn.write('pong\n')
+            self._write(conn, 'pong\n')
 
-        # Obtain CPU and memory stats
+        # Obtain CPU, memory and filesystem stats
         elif msg == 'stats':
-            conn.write(json.dumps({
-                'cpu_usage': OSStats.get_cpu_usage(),
-                'memory_usage': OSStats.get_ram_usage()
-            }) + '\n')
+            self._write(conn, json.dumps(self._command_stats()) + '\n')
         # Return JSON file
         elif msg == 'version':
-            conn.write(VERSION + '\n')
+            self._write(conn, VERSION + '\n')
 
         elif msg:
             # Default to outputting %%
-            conn.write('%%%%\n')
+            self._write(conn, '%%%%\n')
+
+    def _command_ping(self):
+        """Respond to ping."""
+        return 'pong'
+
+    def _command_stats(self):
+        """Obtain CPU, memory and filesystem usage and load average."""
+        return {
+            'cpu_usage': OSStats.get_cpu_usage(),
+            'memory_usage': OSStats.get_ram_usage(),
+            'filesystem_usage': OSStats.get_filesystem_usage(),
+            'load_average': OSStats.get_load_average()[0]
+        }
+
+    def _command_subscribe(self, interval=None):
+        """Push statistics to the host at the given interval (seconds),
+        or stop pushing statistics if an interval is not provided.
+        Returns the interval used, which is limited to the minimum interval.
+        """
+        if interval:
+            self.telemetry_interval = max(float(interval),
+                                          AgentSerialConfig.MIN_TELEMETRY_INTERVAL)
+            self.next_telemetry = time.time()
+        else:
+            self.telemetry_interval = None
+        return {'interval': self.telemetry_interval}
 
-        conn.flush()
+    def _command_version(self):
+        """Return agent version and the protocol version supported."""
+        return {
+            'version': VERSION,
+            'protocol': AgentSerialConfig.PROTOCOL_VERSION
+        }
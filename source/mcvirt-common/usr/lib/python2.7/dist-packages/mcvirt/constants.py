@@ -35,6 +35,7 @@ class DirectoryLocation(object):
     LOG_FILE = '/var/log/mcvirt.log'
     DRBD_HOOK_CONFIG = NODE_STORAGE_DIR + '/drbd-hook-config.json'
     SQLITE_DATABASE = NODE_STORAGE_DIR + '/database.db'
+    CONFIG_SHARD_DIR = NODE_STORAGE_DIR + '/config.d'
 
 
 class LockStates(Enum):
@@ -70,17 +71,53 @@ class AgentSerialConfig(object):
     AGENT_PORT = "ttyS0"
     AGENT_PORT_PATH = "/dev/%s" % AGENT_PORT
 
+    # Agent protocol versions. Version 1 agents handle a single bare
+    # command per line, responding in order. Version 2 agents also handle
+    # JSON requests containing an ID, which may be responded to out of order.
+    LEGACY_PROTOCOL_VERSION = 1
+    PROTOCOL_VERSION = 2
+
+    # Minimum interval (seconds) between statistics pushed by the agent
+    MIN_TELEMETRY_INTERVAL = 0.1
+
 
 class StatisticsDeviceType(Enum):
     """Statistics device type."""
     HOST = 1
     VIRTUAL_MACHINE = 2
+    # Hard drives and network interfaces of virtual machines, with the device ID
+    # of <VM ID>:<disk target> or <VM ID>:net<interface index>
+    VIRTUAL_MACHINE_DISK = 3
+    VIRTUAL_MACHINE_INTERFACE = 4
+    # CPU cores, block devices and network interfaces of nodes, with the
+    # device ID of <hostname>:cpu<core>, <hostname>:<block device>
+    # or <hostname>:<interface>
+    HOST_CPU = 5
+    HOST_DISK = 6
+    HOST_INTERFACE = 7
 
 
 class HostStatisticsStatType(Enum):
     """Statistics stat type."""
     CPU_USAGE = 1
     MEMORY_USAGE = 2
+    CPU_IOWAIT = 3
+    CPU_STEAL = 4
+    LOAD_AVERAGE_1 = 5
+    LOAD_AVERAGE_5 = 6
+    LOAD_AVERAGE_15 = 7
+    # Block device statistics (per second, and average milliseconds per operation)
+    DISK_READ_BYTES = 8
+    DISK_WRITE_BYTES = 9
+    DISK_READ_OPERATIONS = 10
+    DISK_WRITE_OPERATIONS = 11
+    DISK_READ_LATENCY = 12
+    DISK_WRITE_LATENCY = 13
+    # Network interface statistics (per second)
+    NETWORK_RX_BYTES = 14
+    NETWORK_TX_BYTES = 15
+    NETWORK_RX_PACKETS = 16
+    NETWORK_TX_PACKETS = 17
 
 
 class VirtualMachineStatisticsStatType(Enum):
@@ -89,6 +126,33 @@ class VirtualMachineStatisticsStatType(Enum):
     GUEST_MEMORY_USAGE = 2
     HOST_CPU_USAGE = 3
     HOST_MEMORY_USAGE = 4
+    GUEST_FILESYSTEM_USAGE = 5
+    GUEST_LOAD_AVERAGE = 6
+
+
+class DiskStatisticsStatType(Enum):
+    """Statistics stat type for virtual machine disks (per second)."""
+    READ_BYTES = 1
+    WRITE_BYTES = 2
+    READ_OPERATIONS = 3
+    WRITE_OPERATIONS = 4
+
+
+class InterfaceStatisticsStatType(Enum):
+    """Statistics stat type for virtual machine network interfaces (per second)."""
+    RX_BYTES = 1
+    TX_BYTES = 2
+    RX_PACKETS = 3
+    TX_PACKETS = 4
+
+
+class StatisticsResolution(Enum):
+    """Resolution (seconds) of statistics, where raw
+    statistics are stored at the statistics interval."""
+    RAW = 0
+    MINUTE = 60
+    HOUR = 3600
+    DAY = 86400
 
 
 # Name of the default storage backend, used during upgrade
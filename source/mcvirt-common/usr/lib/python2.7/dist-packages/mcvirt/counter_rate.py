@@ -0,0 +1,84 @@
+"""Provide conversion of cumulative counters into rates."""
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+
+
+def get_monotonic_time():
+    """Return seconds since an arbitrary point, which is not
+    affected by changes to the system clock.
+    """
+    return os.times()[4]
+
+
+class CounterRate(object):
+    """Convert samples of cumulative counters into rates per second.
+
+    Counters are identified by a key. If a counter decreases, it is
+    assumed to have been reset, unless the width of the counter is given,
+    in which case it is assumed to have wrapped, unless the wrapped
+    difference is implausibly large. Counters are also treated as reset when
+    the generation (e.g. the ID of a domain, which changes when it is
+    restarted) differs from the previous sample.
+    """
+
+    def __init__(self):
+        """Create dict of key -> (sample time, value, generation)."""
+        self.samples = {}
+
+    def get_rate(self, key, value, sample_time=None, generation=None, width=None):
+        """Add a sample of a counter, returning the rate per second since
+        the previous sample, or None if there is no valid previous sample.
+
+        The width (bits) should only be given for counters that are known
+        to wrap, e.g. 32-bit counters.
+        """
+        sample_time = get_monotonic_time() if sample_time is None else sample_time
+        previous = self.samples.get(key)
+        if value is None:
+            self.samples.pop(key, None)
+            return None
+        self.samples[key] = (sample_time, value, generation)
+
+        if previous is None or previous[2] != generation:
+            return None
+        previous_time, previous_value, _ = previous
+        elapsed = sample_time - previous_time
+        if elapsed <= 0:
+            return None
+
+        difference = value - previous_value
+        if difference < 0:
+            if width is None or previous_value >= 2 ** width:
+                return None
+
+            # Only treat as a wrap if the counter has advanced less
+            # than half of its range, otherwise assume it was reset
+            difference = value + 2 ** width - previous_value
+            if difference >= 2 ** (width - 1):
+                return None
+
+        return difference / float(elapsed)
+
+    def remove(self, keys=None):
+        """Remove the samples for the given keys, or all keys."""
+        if keys is None:
+            self.samples = {}
+        else:
+            for key in keys:
+                self.samples.pop(key, None)
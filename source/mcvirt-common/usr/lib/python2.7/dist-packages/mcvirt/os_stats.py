@@ -15,18 +15,80 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
-from psutil import cpu_percent, virtual_memory
+import os
+
+from psutil import (cpu_percent, cpu_times_percent, disk_io_counters, disk_partitions,
+                    disk_usage, net_io_counters, virtual_memory)
 
 
 class OSStats(object):
     """Provide functions to obtain VM functions."""
 
+    # Prefixes of block devices that are excluded from disk statistics
+    EXCLUDED_DISK_PREFIXES = ['loop', 'ram']
+
+    # Network interfaces that are excluded from network statistics
+    EXCLUDED_INTERFACES = ['lo']
+
     @staticmethod
     def get_cpu_usage():
         """Obtain CPU usage statistics."""
         return cpu_percent()
 
+    @staticmethod
+    def get_per_cpu_usage():
+        """Obtain list of CPU usage statistics for each core."""
+        return cpu_percent(percpu=True)
+
+    @staticmethod
+    def get_cpu_wait_usage():
+        """Obtain percentage of CPU time spent waiting for IO (iowait)
+        and waiting for the hypervisor (steal).
+        """
+        cpu_times = cpu_times_percent()
+        return getattr(cpu_times, 'iowait', None), getattr(cpu_times, 'steal', None)
+
+    @staticmethod
+    def get_load_average():
+        """Obtain 1, 5 and 15 minute load averages."""
+        return os.getloadavg()
+
+    @staticmethod
+    def get_disk_counters():
+        """Obtain dict of cumulative IO counters for each block device, excluding
+        partitions, which are not listed in /sys/block.
+        """
+        return {
+            disk: counters._asdict()
+            for disk, counters in (disk_io_counters(perdisk=True) or {}).items()
+            if (os.path.exists('/sys/block/%s' % disk) and
+                not [prefix for prefix in OSStats.EXCLUDED_DISK_PREFIXES
+                     if disk.startswith(prefix)])
+        }
+
+    @staticmethod
+    def get_network_counters():
+        """Obtain dict of cumulative IO counters for each network interface."""
+        return {
+            interface: counters._asdict()
+            for interface, counters in (net_io_counters(pernic=True) or {}).items()
+            if interface not in OSStats.EXCLUDED_INTERFACES
+        }
+
     @staticmethod
     def get_ram_usage():
         """Get memory usage statistics."""
         return virtual_memory().percent
+
+    @staticmethod
+    def get_filesystem_usage():
+        """Obtain percentage of space used across all mounted physical filesystems."""
+        used = total = 0
+        for partition in disk_partitions():
+            try:
+                usage = disk_usage(partition.mountpoint)
+            except OSError:
+                continue
+            used += usage.used
+            total += usage.total
+        return round(used * 100.0 / total, 1) if total else None
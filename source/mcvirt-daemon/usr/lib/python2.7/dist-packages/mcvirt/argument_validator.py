@@ -123,6 +123,17 @@ class ArgumentValidator(object):
         if int(value) < 1:
             raise MCVirtTypeError('Not a positive integer')
 
+    @staticmethod
+    def validate_positive_float(value):
+        """Validate that a given variable is a
+        positive number
+        """
+        try:
+            if float(value) <= 0:
+                raise MCVirtTypeError('Not a positive number')
+        except (ValueError, TypeError):
+            raise MCVirtTypeError('Not a positive number')
+
     @staticmethod
     def validate_boolean(variable):
         """Ensure variable is a boolean."""
@@ -20,6 +20,7 @@
 import json
 import base64
 import socket
+from threading import Thread
 from texttable import Texttable
 
 import Pyro4
@@ -34,6 +35,8 @@ from mcvirt.exceptions import (NodeAlreadyPresent, NodeDoesNotExistException,
 from mcvirt.config.core import Core as MCVirtConfig
 from mcvirt.config.virtual_machine import VirtualMachine as VirtualMachineConfig
 from mcvirt.config.hard_drive import HardDrive as HardDriveConfig
+from mcvirt.config.replication import ConfigReplication
+from mcvirt.config.hash_tree import ConfigHashTree
 from mcvirt.auth.user_types.connection_user import ConnectionUser
 from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.client.rpc import Connection
@@ -46,6 +49,11 @@ from mcvirt.syslogger import Syslogger
 class Cluster(PyroObject):
     """Class to perform node management within the MCVirt cluster."""
 
+    # Attributes of the Pyro context of a request that are used
+    # when connecting to remote nodes
+    REMOTE_CONTEXT_ATTRIBUTES = ['session_id', 'username', 'proxy_user', 'has_lock',
+                                 'ignore_cluster', 'ignore_drbd', 'INTERNAL_REQUEST']
+
     @Expose()
     def generate_connection_info(self):
         """Generate required information to connect to this node from a remote node."""
@@ -429,13 +437,12 @@ class Cluster(PyroObject):
         remote_storage_factory = remote_object.get_connection('storage_factory')
         storage_factory_config = storage_factory.get_config()
 
-        remote_mcvirt_config_obj = remote_object.get_connection('mcvirt_config')
-        remote_config = remote_mcvirt_config_obj.get_config_remote()
-
-        # Update remote MCVirt config with entire storage backend config
-        remote_config[storage_factory.STORAGE_CONFIG_KEY] = storage_factory_config
-        remote_mcvirt_config_obj.manual_update_config(
-            remote_config,
+        # Replicate storage backend config to remote node, which
+        # is expected to have no storage backends
+        ConfigReplication.replicate(
+            remote_object, [storage_factory.STORAGE_CONFIG_KEY],
+            {storage_factory.STORAGE_CONFIG_KEY: {}},
+            {storage_factory.STORAGE_CONFIG_KEY: storage_factory_config},
             'Replicate storage backend configuration to new node')
 
         # Add new node to storage backends that have a default location
@@ -466,28 +473,23 @@ class Cluster(PyroObject):
         hard_drive_config = HardDriveConfig.get_global_config()
         virtual_machine_config = VirtualMachineConfig.get_global_config()
 
-        remote_mcvirt_config_obj = remote_object.get_connection('mcvirt_config')
-        remote_config = remote_mcvirt_config_obj.get_config_remote()
-        remote_config['hard_drives'] = hard_drive_config
-        remote_config['virtual_machines'] = virtual_machine_config
-
-        # Update hard drive and virtual machinie configuration to remote node
-        remote_mcvirt_config_obj.manual_update_config(remote_config,
-                                                      ('Update HDD/VM configuration after'
-                                                       ' joining node to cluster.'))
+        # Update hard drive and virtual machine configuration on remote node,
+        # which is expected to have no hard drives or virtual machines
+        ConfigReplication.replicate(
+            remote_object, ['hard_drives', 'virtual_machines'],
+            {'hard_drives': {}, 'virtual_machines': {}},
+            {'hard_drives': hard_drive_config, 'virtual_machines': virtual_machine_config},
+            'Update HDD/VM configuration after joining node to cluster.')
 
     def sync_config(self, remote_connection):
         """Sync MCVirt configuration."""
         local_config = self.po__get_registered_object('mcvirt_config')().get_config()
-        remote_mcvirt_config_obj = remote_connection.get_connection('mcvirt_config')
-        remote_config = remote_mcvirt_config_obj.get_config_remote()
 
         # Update Git and LDAP configuration to remote node
-        remote_config['git'] = local_config['git']
-        remote_config['ldap'] = local_config['ldap']
-        remote_mcvirt_config_obj.manual_update_config(remote_config,
-                                                      ('Update LDAP/Git configuration after'
-                                                       ' joining node to cluster.'))
+        ConfigReplication.replicate(
+            remote_connection, ['git', 'ldap'], None,
+            ConfigReplication.get_subtrees(local_config, ['git', 'ldap']),
+            'Update LDAP/Git configuration after joining node to cluster.')
 
     def check_remote_machine(self, remote_connection, location_overrides):
         """Perform checks on the remote node to ensure that there will be
@@ -604,6 +606,59 @@ class Cluster(PyroObject):
         # Remove the SSL certificates from the other nodes
         self._remove_node_ssl_certificates(node_name_to_remove)
 
+    @Expose()
+    def get_config_hash_tree_node(self, path):
+        """Return a node of the local config hash tree, to be compared
+        with the config of a remote node.
+        """
+        self.po__get_registered_object('auth').assert_user_type('ClusterUser')
+        return ConfigHashTree.get_node(path)
+
+    @Expose()
+    def check_config_consistency(self):
+        """Compare the cluster-wide config of each remote node with the
+        local node, returning a dict of node -> dict containing the list
+        of config keys that differ and any error obtaining the config.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+
+        # The Pyro context, containing the session and lock state of the
+        # request, is specific to this thread, so is copied to the thread
+        # for each node before connecting to it
+        context = {attribute: getattr(Pyro4.current_context, attribute)
+                   for attribute in self.REMOTE_CONTEXT_ATTRIBUTES
+                   if attribute in dir(Pyro4.current_context)}
+        results = {}
+
+        def check_node(node):
+            """Compare config hash tree of remote node."""
+            for attribute, value in context.items():
+                setattr(Pyro4.current_context, attribute, value)
+            try:
+                # Pyro proxies are not shared between threads, so
+                # each thread uses its own connection to the node.
+                # When the configs match, only the root hash is obtained.
+                remote_cluster = self.get_remote_node(node).get_connection('cluster')
+                differences = ConfigHashTree.compare(remote_cluster.get_config_hash_tree_node)
+                results[node] = {
+                    'differences': ['/'.join(path) for path in differences],
+                    'error': None
+                }
+            except Exception, exc:
+                results[node] = {'differences': [], 'error': str(exc)}
+
+        # Compare each node in parallel
+        threads = []
+        for node in self.get_nodes():
+            thread = Thread(target=check_node, args=(node,),
+                            name='ConfigConsistency-%s' % node)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        return results
+
     @Expose()
     def remove_node_ssl_certificates(self, remote_node):
         """Exposed method for _remove_node_ssl_certificates."""
@@ -21,20 +21,29 @@ import json
 import os
 import stat
 import pwd
+import tempfile
+from threading import local
 
 from mcvirt.utils import get_hostname
 from mcvirt.system import System
 from mcvirt.constants import DirectoryLocation
+from mcvirt.config.cache import ConfigCache
+from mcvirt.config.replication import ConfigDelta, ConfigReplication
 from mcvirt.rpc.pyro_object import PyroObject
 from mcvirt.rpc.expose_method import Expose
 from mcvirt.auth.permissions import PERMISSIONS
-from mcvirt.exceptions import UserDoesNotExistException
+from mcvirt.exceptions import UserDoesNotExistException, ConfigDeltaConflictException
 
 
 class Base(PyroObject):
     """Provides operations to obtain and set the MCVirt configuration for a VM."""
 
-    CURRENT_VERSION = 22
+    # Permissions for config files and directories, which
+    # are only accessible by their owner
+    CONFIG_FILE_MODE = stat.S_IRUSR
+    CONFIG_DIRECTORY_MODE = stat.S_IRUSR | stat.S_IWUSR | stat.S_IXUSR
+
+    CURRENT_VERSION = 25
     GIT = '/usr/bin/git'
 
     def __init__(self):
@@ -43,11 +52,27 @@ class Base(PyroObject):
 
     def get_config(self):
         """Load the VM configuration from disk and returns the parsed JSON."""
-        config_file = open(self.config_file, 'r')
-        config = json.loads(config_file.read())
-        config_file.close()
+        # If a config transaction is in progress for the config file,
+        # return the uncommitted config
+        transaction = ConfigTransaction.get_active(self.config_file)
+        if transaction is not None:
+            return transaction.get_config()
+
+        return self._read_config()
+
+    def _read_config(self):
+        """Read the config from disk."""
+        # Obtain a copy of the parsed config from the cache, which is
+        # only re-read from disk if the file has been changed
+        return ConfigCache.get(self.config_file)
+
+    def _write_config(self, config):
+        """Write the config to disk."""
+        Base._writeJSON(config, self.config_file)
 
-        return config
+    def _get_git_paths(self):
+        """Return the paths that are committed to git when the config changes."""
+        return [self.config_file]
 
     @Expose(locking=True)
     def get_config_remote(self):
@@ -55,9 +80,66 @@ class Base(PyroObject):
         self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
         return self.get_config()
 
+    @Expose(locking=True)
+    def apply_config_delta(self, subtrees, base_hash, delta, reason=''):
+        """Apply a delta, from a remote node, to sub-trees of the config.
+
+        Raises ConfigDeltaConflictException if the sub-trees do not
+        match the base that the delta was created from and
+        InvalidConfigDeltaException if the delta modifies config outside of the sub-trees.
+        """
+        self.po__get_registered_object('auth').assert_user_type('ClusterUser')
+
+        # Ensure that the delta only modifies the given sub-trees
+        ConfigDelta.assert_within_subtrees(delta, subtrees)
+
+        def apply_delta(config):
+            """Ensure config matches base and apply delta."""
+            subtree_config = ConfigReplication.get_subtrees(config, subtrees)
+            if ConfigDelta.get_hash(subtree_config) != base_hash:
+                raise ConfigDeltaConflictException(
+                    'Config does not match base config of delta')
+            ConfigDelta.apply(config, delta)
+        self.update_config(apply_delta, reason)
+
+    @Expose(locking=True)
+    def set_config_subtrees(self, subtree_config, reason=''):
+        """Replace top-level sub-trees of the config with those from a remote node."""
+        self.po__get_registered_object('auth').assert_user_type('ClusterUser')
+
+        def set_subtrees(config):
+            """Replace sub-trees."""
+            config.update(subtree_config)
+        self.update_config(set_subtrees, reason)
+
+    def update_cluster_config(self, callback_function, subtrees, reason='', nodes=None):
+        """Update top-level sub-trees of the local config and replicate
+        the delta of the change to remote nodes.
+        """
+        with self.config_transaction(reason) as transaction:
+            base_config = ConfigReplication.get_subtrees(transaction.get_config(), subtrees)
+            transaction.apply(callback_function)
+            config = ConfigReplication.get_subtrees(transaction.get_config(), subtrees)
+
+        def remote_command(remote_object):
+            """Replicate config delta to remote node."""
+            ConfigReplication.replicate(remote_object, subtrees, base_config, config, reason)
+        self.po__get_registered_object('cluster').run_remote_command(remote_command, nodes=nodes)
+
+    @Expose()
+    def get_config_cache_statistics(self):
+        """Return the hit/miss counters of the config cache."""
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        return ConfigCache.get_statistics()
+
     @Expose(locking=True)
     def manual_update_config(self, config, reason=''):
-        """Provide an exposed method for updating the config."""
+        """Provide an exposed method for replacing the entire config.
+
+        This only updates the local node. Changes that are replicated
+        to remote nodes should use update_cluster_config, which only
+        sends the delta of the change.
+        """
         def set_config(origin_config):
             origin_config.clear()
             origin_config.update(config)
@@ -65,11 +147,18 @@ class Base(PyroObject):
 
     def update_config(self, callback_function, reason=''):
         """Write a provided configuration back to the configuration file."""
-        config = Base.get_config(self)
-        callback_function(config)
-        Base._writeJSON(config, self.config_file)
-        self.gitAdd(reason)
-        self.setConfigPermissions()
+        # If a transaction is already in progress, the change is applied to
+        # the transaction's config and written once the transaction completes.
+        # Otherwise, the change is written immediately.
+        with self.config_transaction() as transaction:
+            transaction.apply(callback_function, reason)
+
+    def config_transaction(self, reason=''):
+        """Return a transaction, which applies all config updates
+        made within it to a single copy of the config, which is
+        written to disk and committed once the transaction is complete
+        """
+        return ConfigTransaction(self, reason)
 
     def getPermissionConfig(self):
         """Obtain the permission config."""
@@ -81,49 +170,119 @@ class Base(PyroObject):
         """Parse and writes the JSON VM config file."""
         json_data = json.dumps(data, indent=2, separators=(',', ': '))
 
-        # Open the config file and write to contents
-        config_file = open(file_name, 'w')
-        config_file.write(json_data)
-        config_file.close()
-
-        # Check file permissions, only giving read/write access to root
-        os.chmod(file_name, stat.S_IWUSR | stat.S_IRUSR)
-        os.chown(file_name, 0, 0)
+        # Write the config to a temporary file in the same directory,
+        # so that the config file can be atomically replaced
+        config_dir = os.path.dirname(file_name)
+        temp_fd, temp_file = tempfile.mkstemp(
+            dir=config_dir, prefix='.%s.' % os.path.basename(file_name))
+        try:
+            with os.fdopen(temp_fd, 'w') as config_file:
+                config_file.write(json_data)
+                config_file.flush()
+                os.fsync(config_file.fileno())
+
+            # Set file permissions before the file is put in place, only
+            # giving read access to root, so that permissions only need to
+            # be enforced on the files that have been written
+            os.chmod(temp_file, Base.CONFIG_FILE_MODE)
+            os.chown(temp_file, 0, 0)
+
+            # Replace the config file and ensure the rename is on disk
+            os.rename(temp_file, file_name)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.unlink(temp_file)
+            raise
+
+        dir_fd = os.open(config_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+        # Refresh the cached copy of the config
+        ConfigCache.update(file_name, json_data)
 
     @staticmethod
     def create(self):
         """Create a basic VM configuration for new VMs."""
         raise NotImplementedError
 
-    def setConfigPermissions(self):
-        """Set file permissions for config directories."""
-
-        def set_permission(path, directory=True, owner=0):
-            """Ser permissions on directory."""
-            permission_mode = stat.S_IRUSR
-            if directory:
-                permission_mode = permission_mode | stat.S_IWUSR | stat.S_IXUSR
-
-            if (directory and os.path.isdir(path) or
-                    not directory and os.path.exists(path)):
+    @staticmethod
+    def set_path_permission(path, directory=False, owner=0, repair=True):
+        """Ensure that a config file or directory is owned by the given
+        user and is only accessible by the owner.
+
+        Returns a list of the changes required, which are only
+        made if repair is True.
+        """
+        permission_mode = Base.CONFIG_FILE_MODE
+        if directory:
+            permission_mode = Base.CONFIG_DIRECTORY_MODE
+
+        try:
+            path_stat = os.lstat(path)
+        except OSError:
+            return []
+        if directory != stat.S_ISDIR(path_stat.st_mode):
+            return []
+
+        changes = []
+        if path_stat.st_uid != owner or path_stat.st_gid != 0:
+            changes.append('owner %s:%s -> %s:0' % (path_stat.st_uid, path_stat.st_gid, owner))
+            if repair:
                 os.chown(path, owner, 0)
+        if stat.S_IMODE(path_stat.st_mode) != permission_mode:
+            changes.append('mode %o -> %o' % (stat.S_IMODE(path_stat.st_mode), permission_mode))
+            if repair:
                 os.chmod(path, permission_mode)
+        return changes
 
-        # Set permissions on git directory
+    @staticmethod
+    def get_permission_paths():
+        """Return a list of (path, is directory, owner) for each path
+        in the config tree that has enforced permissions.
+        """
+        paths = []
         for directory in os.listdir(DirectoryLocation.BASE_STORAGE_DIR):
             path = os.path.join(DirectoryLocation.BASE_STORAGE_DIR, directory)
             if os.path.isdir(path):
                 if directory == '.git':
-                    set_permission(path, directory=True)
+                    paths.append((path, True, 0))
                 else:
-                    set_permission(os.path.join(path, 'vm'), directory=True)
-                    set_permission(os.path.join(path, 'config.json'), directory=False)
+                    paths.append((os.path.join(path, 'vm'), True, 0))
+                    paths.append((os.path.join(path, 'config.json'), False, 0))
 
-        # Set permission for base directory, node directory and ISO directory
+                    # Add per-object config files, if stored on the node
+                    for root, _, file_names in os.walk(os.path.join(path, 'config.d')):
+                        paths.append((root, True, 0))
+                        paths.extend([(os.path.join(root, file_name), False, 0)
+                                      for file_name in file_names])
+
+        # Base directory, node directory and ISO directory are owned by libvirt
+        libvirt_uid = pwd.getpwnam('libvirt-qemu').pw_uid
         for directory in [DirectoryLocation.BASE_STORAGE_DIR, DirectoryLocation.NODE_STORAGE_DIR,
                           DirectoryLocation.ISO_STORAGE_DIR]:
-            set_permission(directory, directory=True,
-                           owner=pwd.getpwnam('libvirt-qemu').pw_uid)
+            paths.append((directory, True, libvirt_uid))
+        return paths
+
+    @classmethod
+    def audit_permissions(cls, repair=True):
+        """Check the permissions of the entire config tree, returning
+        a dict of path -> list of changes required. If repair is True,
+        the changes are made.
+        """
+        changes = {}
+        for path, directory, owner in cls.get_permission_paths():
+            path_changes = cls.set_path_permission(path, directory=directory,
+                                                   owner=owner, repair=repair)
+            if path_changes:
+                changes[path] = path_changes
+        return changes
+
+    def setConfigPermissions(self):
+        """Set file permissions for config directories."""
+        self.audit_permissions(repair=True)
 
     def _upgrade(self, config):
         """Updates the configuration file."""
@@ -156,62 +315,54 @@ class Base(PyroObject):
         else:
             return 0
 
-    def gitAdd(self, message=''):
+    def gitAdd(self, message='', paths=None):
         """Commit changes to an added or modified configuration file."""
-        if self._checkGitRepo():
-            session_obj = self.po__get_registered_object('mcvirt_session')
-            username = ''
-            user = None
-            if session_obj:
-                try:
-                    user = session_obj.get_proxy_user_object()
-                except UserDoesNotExistException:
-                    pass
-            if user:
-                username = session_obj.get_proxy_user_object().get_username()
-            message += "\nUser: %s\nNode: %s" % (username, get_hostname())
-            try:
-                System.runCommand([self.GIT, 'add', self.config_file],
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
-                System.runCommand([self.GIT,
-                                   'commit',
-                                   '-m',
-                                   message,
-                                   self.config_file],
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
-                System.runCommand([self.GIT,
-                                   'push'],
-                                  raise_exception_on_failure=False,
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
-            except Exception:
-                pass
+        self._add_git_change('add', message, paths=paths)
 
     def gitRemove(self, message='', custom_file=None):
         """Remove and commits a configuration file."""
-        if self._checkGitRepo():
-            session_obj = self.po__get_registered_object('mcvirt_session')
-            username = ''
-            user = None
-            if session_obj:
-                try:
-                    user = session_obj.get_proxy_user_object()
-                except UserDoesNotExistException:
-                    pass
-            if user:
-                username = session_obj.get_proxy_user_object().get_username()
-            message += "\nUser: %s\nNode: %s" % (username, get_hostname())
+        self._add_git_change('rm', message)
+
+    def _add_git_change(self, action, message, paths=None):
+        """Pass a config file change to the git history thread to be
+        committed and pushed, or commit it directly if the thread
+        is not running.
+        """
+        paths = self._get_git_paths() if paths is None else paths
+
+        from mcvirt.config.core import Core
+        from mcvirt.thread.git_history import GitHistory
+
+        # Only commit changes if the git URL has been set in the MCVirt configuration.
+        # The git config is read directly from the main config file, rather
+        # than from the full node config, as this is performed on every write.
+        if ConfigCache.get(Core.get_config_file())['git']['repo_domain'] == '':
+            return
+
+        # Determine the user from the current session whilst
+        # still in the context of the request
+        session_obj = self.po__get_registered_object('mcvirt_session')
+        username = ''
+        user = None
+        if session_obj:
             try:
-                System.runCommand([self.GIT,
-                                   'rm',
-                                   '--cached',
-                                   self.config_file],
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
-                System.runCommand([self.GIT, 'commit', '-m', message],
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
-                System.runCommand([self.GIT,
-                                   'push'],
-                                  raise_exception_on_failure=False,
-                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
+                user = session_obj.get_proxy_user_object()
+            except UserDoesNotExistException:
+                pass
+        if user:
+            username = user.get_username()
+        message += "\nUser: %s\nNode: %s" % (username, get_hostname())
+
+        git_history = self.po__get_registered_object('git_history')
+        if git_history is not None:
+            git_history.add_change(paths, action, message)
+        else:
+            try:
+                if GitHistory.commit_changes([(paths, action, message)]):
+                    System.runCommand([self.GIT,
+                                       'push'],
+                                      raise_exception_on_failure=False,
+                                      cwd=DirectoryLocation.BASE_STORAGE_DIR)
             except Exception:
                 pass
 
@@ -289,3 +440,120 @@ class Base(PyroObject):
                               cwd=DirectoryLocation.BASE_STORAGE_DIR)
 
         return True
+
+
+class ConfigTransaction(object):
+    """Apply multiple config updates to a single in-memory copy of the
+    config, which is written, committed to git and has permissions set
+    once, when the outer-most transaction for the config file completes.
+    """
+
+    # Thread-local storage of the transactions currently in progress,
+    # keyed on the config file
+    ACTIVE = local()
+
+    @classmethod
+    def _get_active_transactions(cls):
+        """Return the dict of transactions in progress for the current thread."""
+        if not hasattr(cls.ACTIVE, 'transactions'):
+            cls.ACTIVE.transactions = {}
+        return cls.ACTIVE.transactions
+
+    @classmethod
+    def get_active(cls, config_file):
+        """Return the transaction in progress for a config file, if one exists."""
+        return cls._get_active_transactions().get(config_file)
+
+    def __init__(self, config_object, reason=''):
+        """Store member variables."""
+        self.config_object = config_object
+        self.config_file = config_object.config_file
+        self.reasons = [reason] if reason else []
+        self.parent = None
+        self._config = None
+        self._modified = False
+        self._snapshot = None
+        self._parent_state = None
+
+        # Nested transactions currently in progress within this transaction
+        self._nested = []
+
+    def __enter__(self):
+        """Register the transaction, or join the transaction already in progress."""
+        active_transactions = self._get_active_transactions()
+        self.parent = active_transactions.get(self.config_file)
+        if self.parent is None:
+            active_transactions[self.config_file] = self
+        else:
+            # Store the state of the outer transaction, so that changes
+            # made within this transaction can be reverted if it fails.
+            # The config is only copied once a change is made within
+            # this transaction.
+            self._parent_state = (self.parent._modified, len(self.parent.reasons))
+            self.parent._nested.append(self)
+            self.parent.reasons.extend(self.reasons)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Write the config, unless nested or an exception was raised.
+
+        If a nested transaction raises an exception, changes made within it
+        are reverted, so they are not written if the exception is caught.
+        """
+        if self.parent is not None:
+            self.parent._nested.remove(self)
+            if exc_type is not None:
+                modified, reason_count = self._parent_state
+                if self._snapshot is not None:
+                    # The snapshot may be shared with outer nested transactions
+                    self.parent._config = ConfigCache.copy(self._snapshot)
+                self.parent._modified = modified
+                del self.parent.reasons[reason_count:]
+            return
+
+        del self._get_active_transactions()[self.config_file]
+        if exc_type is None and self._modified:
+            self.commit()
+
+    @property
+    def modified(self):
+        """Return whether the config has been modified within the transaction."""
+        if self.parent is not None:
+            return self.parent.modified
+        return self._modified
+
+    def _get_config(self):
+        """Return the uncommitted config, loading it on first use."""
+        if self._config is None:
+            self._config = self.config_object._read_config()
+        return self._config
+
+    def get_config(self):
+        """Return a copy of the uncommitted config."""
+        if self.parent is not None:
+            return self.parent.get_config()
+        return ConfigCache.copy(self._get_config())
+
+    def apply(self, callback_function, reason=''):
+        """Apply a config update callback to the uncommitted config."""
+        if self.parent is not None:
+            return self.parent.apply(callback_function, reason)
+
+        # Copy the config for nested transactions that have not yet made
+        # a change, so that the change can be reverted if they fail
+        nested_transactions = [nested_transaction for nested_transaction in self._nested
+                               if nested_transaction._snapshot is None]
+        if nested_transactions:
+            snapshot = ConfigCache.copy(self._get_config())
+            for nested_transaction in nested_transactions:
+                nested_transaction._snapshot = snapshot
+
+        callback_function(self._get_config())
+        self._modified = True
+        if reason:
+            self.reasons.append(reason)
+
+    def commit(self):
+        """Write the config to disk and commit to git."""
+        self.config_object._write_config(self._config)
+        self.config_object.gitAdd('\n'.join(self.reasons))
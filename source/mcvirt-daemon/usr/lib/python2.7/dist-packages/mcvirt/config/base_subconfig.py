@@ -17,7 +17,9 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
+from mcvirt.config.base import ConfigTransaction
 from mcvirt.config.core import Core
+from mcvirt.config.sharded_storage import ShardedStorage, ShardedObjectConfig
 from mcvirt.rpc.expose_method import Expose
 
 
@@ -35,9 +37,26 @@ class BaseSubconfig(Core):
         """Get the key for the config, default to no key, which will be skipped."""
         return None
 
+    @classmethod
+    def _get_sharded_subtree(cls):
+        """Return the name of the sub-tree, if the objects are stored in
+        individual config files and can be read/written directly.
+        """
+        if (len(cls.SUBTREE_ARRAY) == 1 and
+                cls.SUBTREE_ARRAY[0] in ShardedStorage.SUBTREES and
+                ShardedStorage.is_enabled() and
+                ConfigTransaction.get_active(Core.get_config_file()) is None):
+            return cls.SUBTREE_ARRAY[0]
+        return None
+
     @classmethod
     def get_global_config(cls):
         """Obtain entire config for this object type."""
+        # If sharded, only read the config files for the sub-tree
+        sharded_subtree = cls._get_sharded_subtree()
+        if sharded_subtree:
+            return ShardedStorage.read_subtree(sharded_subtree)
+
         # Get config from parent, which should be the whole config
         parent_config = Core().get_config()
 
@@ -52,7 +71,11 @@ class BaseSubconfig(Core):
     @Expose()
     @classmethod
     def set_global_config(cls, config):
-        """Set global config."""
+        """Set global config, replacing the entire config for this object type.
+
+        Objects are otherwise kept in sync with remote nodes by re-running
+        each change on the remote nodes, rather than sending the config.
+        """
         cls.po__get_registered_object('auth').assert_user_type('ClusterUser')
 
         def update_config(parent_config):
@@ -66,11 +89,29 @@ class BaseSubconfig(Core):
 
     def get_config(self):
         """Get the config for the object."""
+        # If sharded, only read the config file for the object
+        sharded_subtree = self._get_sharded_subtree()
+        if sharded_subtree:
+            # Return the uncommitted config, if an update to the object is in progress
+            transaction = ConfigTransaction.get_active(
+                ShardedStorage.get_object_file(sharded_subtree, self._get_config_key()))
+            if transaction is not None:
+                return transaction.get_config()
+            return ShardedStorage.read_object(sharded_subtree, self._get_config_key())
+
         # Return the object ID value from the config dict
         return self.__class__.get_global_config()[self._get_config_key()]
 
     def update_config(self, callback_function, reason=''):
         """Write a provided configuration back to the configuration file."""
+        # If sharded, only update the config file for the object
+        sharded_subtree = self._get_sharded_subtree()
+        if sharded_subtree:
+            object_config = ShardedObjectConfig(self, sharded_subtree, self._get_config_key())
+            with ConfigTransaction(object_config) as transaction:
+                transaction.apply(callback_function, reason)
+            return
+
         def update_sub_config(config):
             """Update the subconfig."""
             # Traverse the parent config to get the subconfig
@@ -0,0 +1,132 @@
+"""Provide in-process cache of parsed configuration files."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import json
+import marshal
+import os
+from threading import Lock
+
+
+class ConfigCache(object):
+    """Shared cache of parsed config files, keyed on the path of the file.
+
+    Each entry is invalidated using the inode, modification time and size
+    of the file, so changes made outside of MCVirt are still picked up.
+    The parsed config is stored as a marshalled snapshot and each caller
+    is given a new copy, so modifications made by a caller cannot
+    alter the cached config.
+    """
+
+    # Lock for the cache entries and counters
+    LOCK = Lock()
+
+    # Dict of config file path -> (stat key, marshalled config)
+    ENTRIES = {}
+
+    # Cache statistics
+    HITS = 0
+    MISSES = 0
+
+    # Incremented each time the content of a cached config file changes,
+    # so that objects derived from the config can determine if they are stale
+    GENERATION = 0
+
+    @staticmethod
+    def _get_stat_key(stat_result):
+        """Return the key used to determine if a file has changed."""
+        return (stat_result.st_ino, stat_result.st_mtime, stat_result.st_size)
+
+    @staticmethod
+    def copy(config):
+        """Return a copy of a parsed config, which is faster
+        than a deep copy as it only contains built-in types.
+        """
+        return marshal.loads(marshal.dumps(config))
+
+    @classmethod
+    def get(cls, config_file):
+        """Return a private copy of the parsed config file."""
+        stat_key = cls._get_stat_key(os.stat(config_file))
+        with cls.LOCK:
+            entry = cls.ENTRIES.get(config_file)
+            if entry is not None and entry[0] == stat_key:
+                cls.HITS += 1
+                return marshal.loads(entry[1])
+            cls.MISSES += 1
+
+        # Read the file outside of the lock and use the stat of the open
+        # file, so that the key always matches the content that was read
+        with open(config_file, 'r') as config_fh:
+            config_data = config_fh.read()
+            stat_key = cls._get_stat_key(os.fstat(config_fh.fileno()))
+
+        config = json.loads(config_data)
+        with cls.LOCK:
+            cls.ENTRIES[config_file] = (stat_key, marshal.dumps(config))
+            cls.GENERATION += 1
+        return config
+
+    @classmethod
+    def update(cls, config_file, json_data):
+        """Refresh the cache entry for a config file that has just been written."""
+        stat_key = cls._get_stat_key(os.stat(config_file))
+        snapshot = marshal.dumps(json.loads(json_data))
+        with cls.LOCK:
+            cls.ENTRIES[config_file] = (stat_key, snapshot)
+            cls.GENERATION += 1
+
+    @classmethod
+    def get_file_key(cls, config_file):
+        """Return the key used to determine if a file has changed,
+        or None if the file does not exist.
+        """
+        try:
+            return cls._get_stat_key(os.stat(config_file))
+        except OSError:
+            return None
+
+    @classmethod
+    def check(cls, config_file):
+        """Remove the cache entry for a config file if it has been modified on disk."""
+        stat_key = cls.get_file_key(config_file)
+        with cls.LOCK:
+            entry = cls.ENTRIES.get(config_file)
+            if entry is not None and entry[0] != stat_key:
+                del cls.ENTRIES[config_file]
+                cls.GENERATION += 1
+
+    @classmethod
+    def invalidate(cls, config_file=None):
+        """Remove a config file, or all config files, from the cache."""
+        with cls.LOCK:
+            if config_file is None:
+                cls.ENTRIES.clear()
+            elif config_file in cls.ENTRIES:
+                del cls.ENTRIES[config_file]
+            cls.GENERATION += 1
+
+    @classmethod
+    def get_statistics(cls):
+        """Return the hit/miss counters for the cache."""
+        with cls.LOCK:
+            return {
+                'hits': cls.HITS,
+                'misses': cls.MISSES,
+                'entries': len(cls.ENTRIES)
+            }
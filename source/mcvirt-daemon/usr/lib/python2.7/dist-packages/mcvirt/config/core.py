@@ -18,6 +18,8 @@
 import os
 
 from mcvirt.config.base import Base
+from mcvirt.config.cache import ConfigCache
+from mcvirt.config.sharded_storage import ShardedStorage
 from mcvirt.exceptions import IntermediateUpgradeRequiredError
 from mcvirt.constants import (DirectoryLocation,
                               DEFAULT_STORAGE_NAME, DEFAULT_STORAGE_ID,
@@ -44,10 +46,55 @@ class Core(Base):
         # If performing an upgrade has been specified, do so
         self.upgrade()
 
+    @staticmethod
+    def get_config_file():
+        """Return the location of the config file."""
+        return DirectoryLocation.NODE_STORAGE_DIR + '/config.json'
+
     @property
     def config_file(self):
         """Return the location of the config file."""
-        return DirectoryLocation.NODE_STORAGE_DIR + '/config.json'
+        return Core.get_config_file()
+
+    def _read_config(self):
+        """Read the config from disk, including object configs
+        if they are stored in individual files.
+        """
+        config = ConfigCache.get(self.config_file)
+        if config.get('sharded_storage', False):
+            for subtree in ShardedStorage.SUBTREES:
+                config[subtree] = ShardedStorage.read_subtree(subtree)
+        return config
+
+    def _write_config(self, config):
+        """Write the config to disk, writing object configs to individual
+        files if sharded storage is enabled.
+        """
+        from mcvirt.config.virtual_machine_index import VirtualMachineIndex
+
+        if config.get('sharded_storage', False):
+            # Write the object configs and remove them from the main config
+            ShardedStorage.write(config)
+            main_config = dict(config)
+            for subtree in ShardedStorage.SUBTREES:
+                main_config[subtree] = {}
+
+            # Only write the main config if it has been modified
+            if main_config != ConfigCache.get(self.config_file):
+                Base._writeJSON(main_config, self.config_file)
+        else:
+            # Write the full config before removing any object
+            # configs, in case sharded storage has been disabled
+            Base._writeJSON(config, self.config_file)
+            if ShardedStorage.is_enabled():
+                ShardedStorage.remove()
+
+        # Update the virtual machine indexes with the written config
+        VirtualMachineIndex.config_written(config)
+
+    def _get_git_paths(self):
+        """Return the paths that are committed to git when the config changes."""
+        return [self.config_file, ShardedStorage.get_base_dir()]
 
     def _get_config_subtree_array(self):
         """Get a list of dict keys to traverse the parent config."""
@@ -169,9 +216,20 @@ class Core(Base):
                 },
                 'statistics': {
                     # Default to 60 seconds statistics daemon
-                    'interval': 60
-
-                }
+                    'interval': 60,
+                    # Retention periods (seconds) for raw statistics and
+                    # rollups, defaulting to 1 week of raw statistics,
+                    # 30 days of minute and 1 year of hourly rollups
+                    'retention': {
+                        'raw': 604800,
+                        'minute': 2592000,
+                        'hour': 31536000,
+                        'day': None
+                    }
+                },
+                # Store virtual machine, hard drive and storage
+                # backend configs in the main config file
+                'sharded_storage': False
             }
 
         # Write the configuration to disk
@@ -194,3 +252,9 @@ class Core(Base):
 
         if self._getVersion() < 20:
             migrations.v20.migrate(self, config)
+
+        if self._getVersion() < 23:
+            migrations.v23.migrate(self, config)
+
+        if self._getVersion() < 24:
+            migrations.v24.migrate(self, config)
@@ -0,0 +1,136 @@
+"""Provide hash tree of the cluster-wide node config."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import hashlib
+from threading import Lock
+
+from mcvirt.config.cache import ConfigCache
+from mcvirt.config.core import Core
+from mcvirt.config.replication import ConfigDelta
+
+
+class ConfigHashTree(object):
+    """Maintain a hash tree (Merkle tree) of the parts of the node
+    config that should be identical across all nodes in the cluster.
+
+    The hash of each dict is calculated from the keys and hashes of its
+    values, so two configs can be compared by comparing the root hash and
+    only descending into the keys whose hashes differ.
+    """
+
+    # Sub-trees of the config that are compared between nodes
+    SUBTREES = ['virtual_machines', 'hard_drives', 'storage_backends',
+                'networks', 'users', 'groups', 'superusers']
+
+    # Lock for building the tree
+    LOCK = Lock()
+
+    # Config cache generation that the tree was built from
+    GENERATION = None
+
+    # Root of the tree, in which each node is a tuple of
+    # (hash, dict of key -> child node, or None for values that are not dicts)
+    TREE = None
+
+    @staticmethod
+    def _get_distributed_config(config):
+        """Return the sub-trees of the config that are distributed across the cluster."""
+        from mcvirt.auth.factory import Factory as UserFactory
+
+        # Remove users that are specific to each node and password
+        # hashes, which are salted independently on each node
+        distributed_user_types = [user_class.__name__
+                                  for user_class in UserFactory.USER_CLASS.__subclasses__()
+                                  if user_class.DISTRIBUTED]
+        config = {subtree: config.get(subtree) for subtree in ConfigHashTree.SUBTREES}
+        config['users'] = {
+            username: {key: value for key, value in user_config.items()
+                       if key not in ['password', 'salt']}
+            for username, user_config in (config['users'] or {}).items()
+            if user_config['user_type'] in distributed_user_types
+        }
+        return config
+
+    @classmethod
+    def _build(cls, value):
+        """Return the tree node for a config value."""
+        if not isinstance(value, dict):
+            return (ConfigDelta.get_hash(value), None)
+
+        children = {key: cls._build(child) for key, child in value.items()}
+        dict_hash = hashlib.sha1()
+        for key in sorted(children.keys()):
+            dict_hash.update('%s:%s;' % (ConfigDelta.get_hash(key), children[key][0]))
+        return (dict_hash.hexdigest(), children)
+
+    @classmethod
+    def _get_tree(cls):
+        """Return the tree, re-building it if the config has changed."""
+        with cls.LOCK:
+            ConfigCache.check(Core.get_config_file())
+            if cls.TREE is None or cls.GENERATION != ConfigCache.GENERATION:
+                generation = ConfigCache.GENERATION
+                cls.TREE = cls._build(cls._get_distributed_config(Core().get_config()))
+                cls.GENERATION = generation
+            return cls.TREE
+
+    @classmethod
+    def get_node(cls, path):
+        """Return dict of the hash of the tree node at a path (list of keys)
+        and the hashes of its children (None if the node is not a dict).
+        Returns None if the path does not exist.
+        """
+        node = cls._get_tree()
+        for key in path:
+            if node[1] is None or key not in node[1]:
+                return None
+            node = node[1][key]
+
+        return {
+            'hash': node[0],
+            'children': ({key: child[0] for key, child in node[1].items()}
+                         if node[1] is not None else None)
+        }
+
+    @classmethod
+    def compare(cls, get_remote_node, path=None):
+        """Compare the local tree to a remote tree, using a function that
+        returns the remote tree node for a path, returning the list of
+        paths that differ.
+        """
+        path = [] if path is None else path
+        local_node = cls.get_node(path)
+        remote_node = get_remote_node(path)
+        if local_node is None or remote_node is None:
+            return [] if local_node == remote_node else [path]
+        if local_node['hash'] == remote_node['hash']:
+            return []
+        if local_node['children'] is None or remote_node['children'] is None:
+            return [path]
+
+        differences = []
+        for key in sorted(set(local_node['children'].keys()) |
+                          set(remote_node['children'].keys())):
+            local_hash = local_node['children'].get(key)
+            remote_hash = remote_node['children'].get(key)
+            if local_hash is None or remote_hash is None:
+                differences.append(path + [key])
+            elif local_hash != remote_hash:
+                differences.extend(cls.compare(get_remote_node, path + [key]))
+        return differences
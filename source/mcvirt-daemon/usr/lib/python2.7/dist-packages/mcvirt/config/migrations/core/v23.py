@@ -0,0 +1,24 @@
+# Copyright (c) 2018 - Matt Comben
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+
+def migrate(config_obj, config):
+    """Migrate v23"""
+    # Add option for storing virtual machine, hard drive and
+    # storage backend configs in individual files, which
+    # is disabled by default
+    config['sharded_storage'] = False
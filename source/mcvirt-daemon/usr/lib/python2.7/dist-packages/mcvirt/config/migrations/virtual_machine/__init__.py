@@ -16,4 +16,4 @@
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
 
-from . import v17, v21, v22
+from . import v17, v21, v22, v25
@@ -0,0 +1,132 @@
+"""Provide delta-based replication of config sub-trees to remote nodes."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import copy
+import hashlib
+import json
+
+from mcvirt.exceptions import ConfigDeltaConflictException, InvalidConfigDeltaException
+from mcvirt.syslogger import Syslogger
+
+
+class ConfigDelta(object):
+    """Calculate and apply JSON-patch style deltas between configs.
+
+    A delta is a list of operations, each being a dict containing
+    'op' ('add', 'replace' or 'remove'), 'path' (list of keys from the
+    root of the config) and, for add/replace, 'value'. Dicts are compared
+    key-by-key; any other changed value, including lists, is replaced.
+    """
+
+    @staticmethod
+    def get_hash(config):
+        """Return a hash of the content of a config."""
+        return hashlib.sha1(
+            json.dumps(config, sort_keys=True, separators=(',', ':'))
+        ).hexdigest()
+
+    @staticmethod
+    def create(old_config, new_config, path=None):
+        """Return the list of operations that convert old_config to new_config."""
+        path = [] if path is None else path
+        if old_config == new_config:
+            return []
+
+        if not isinstance(old_config, dict) or not isinstance(new_config, dict):
+            return [{'op': 'replace', 'path': path, 'value': new_config}]
+
+        delta = []
+        for key in sorted(set(old_config.keys()) - set(new_config.keys())):
+            delta.append({'op': 'remove', 'path': path + [key]})
+        for key in sorted(new_config.keys()):
+            if key not in old_config:
+                delta.append({'op': 'add', 'path': path + [key], 'value': new_config[key]})
+            else:
+                delta.extend(ConfigDelta.create(old_config[key], new_config[key],
+                                                path=path + [key]))
+        return delta
+
+    @staticmethod
+    def assert_within_subtrees(delta, subtrees):
+        """Raise InvalidConfigDeltaException if the delta modifies
+        config outside of the given top-level sub-trees.
+        """
+        for operation in delta:
+            if not operation['path'] or operation['path'][0] not in subtrees:
+                raise InvalidConfigDeltaException(
+                    'Config delta path is not within sub-trees (%s): %s' %
+                    (', '.join(subtrees), '/'.join(map(str, operation['path']))))
+
+    @staticmethod
+    def apply(config, delta):
+        """Apply a delta to a config, modifying it in place."""
+        for operation in delta:
+            if not operation['path']:
+                # Replacing the entire config
+                config.clear()
+                config.update(copy.deepcopy(operation['value']))
+                continue
+
+            parent = config
+            for key in operation['path'][:-1]:
+                parent = parent[key]
+            key = operation['path'][-1]
+
+            if operation['op'] == 'remove':
+                del parent[key]
+            else:
+                parent[key] = copy.deepcopy(operation['value'])
+
+
+class ConfigReplication(object):
+    """Replicate changes to sub-trees of the node config to remote nodes."""
+
+    @staticmethod
+    def get_subtrees(config, subtrees):
+        """Return a dict containing only the given top-level keys of a config."""
+        return {subtree: config[subtree] for subtree in subtrees}
+
+    @staticmethod
+    def replicate(remote_object, subtrees, base_config, config, reason):
+        """Update sub-trees of the config on a remote node.
+
+        base_config is the expected content of the sub-trees on the remote node,
+        which the delta is calculated from. The remote node rejects the delta if
+        its sub-trees do not match the base config, in which case the entire
+        sub-trees are sent. If base_config is None, the sub-trees are always
+        sent in full.
+
+        Returns True if only the delta was sent.
+        """
+        remote_mcvirt_config = remote_object.get_connection('mcvirt_config')
+        if base_config is not None:
+            delta = ConfigDelta.create(base_config, config)
+            if not delta:
+                return True
+            try:
+                remote_mcvirt_config.apply_config_delta(
+                    subtrees, ConfigDelta.get_hash(base_config), delta, reason)
+                return True
+            except ConfigDeltaConflictException:
+                Syslogger.logger().warning(
+                    'Config on %s does not match base config, sending full config for: %s' %
+                    (remote_object.name, ', '.join(subtrees)))
+
+        remote_mcvirt_config.set_config_subtrees(config, reason)
+        return False
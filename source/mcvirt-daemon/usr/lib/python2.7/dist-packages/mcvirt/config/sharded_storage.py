@@ -0,0 +1,155 @@
+"""Provide per-object storage of configuration sub-trees."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import os
+import shutil
+
+from mcvirt.config.base import Base
+from mcvirt.config.cache import ConfigCache
+from mcvirt.constants import DirectoryLocation
+
+
+class ShardedStorage(object):
+    """Store each virtual machine, hard drive and storage backend config
+    in an individual file, with an index file listing the objects
+    in each sub-tree.
+    """
+
+    # Sub-trees of the node config that are stored per-object
+    SUBTREES = ['virtual_machines', 'hard_drives', 'storage_backends']
+
+    @staticmethod
+    def get_base_dir():
+        """Return the directory containing the object config files."""
+        return DirectoryLocation.CONFIG_SHARD_DIR
+
+    @classmethod
+    def get_index_file(cls):
+        """Return the path of the index file."""
+        return os.path.join(cls.get_base_dir(), 'index.json')
+
+    @classmethod
+    def get_object_file(cls, subtree, key):
+        """Return the path of the config file for an object."""
+        return os.path.join(cls.get_base_dir(), subtree, '%s.json' % key)
+
+    @classmethod
+    def is_enabled(cls):
+        """Determine if the config is currently stored per-object."""
+        return os.path.isfile(cls.get_index_file())
+
+    @classmethod
+    def get_index(cls):
+        """Return the dict of sub-tree -> list of object keys."""
+        if not cls.is_enabled():
+            return {subtree: [] for subtree in cls.SUBTREES}
+        return ConfigCache.get(cls.get_index_file())
+
+    @classmethod
+    def read_object(cls, subtree, key):
+        """Return the config for a single object."""
+        if key not in cls.get_index()[subtree]:
+            raise KeyError(key)
+        return ConfigCache.get(cls.get_object_file(subtree, key))
+
+    @classmethod
+    def read_subtree(cls, subtree):
+        """Return the config for all objects in a sub-tree."""
+        return {key: ConfigCache.get(cls.get_object_file(subtree, key))
+                for key in cls.get_index()[subtree]}
+
+    @classmethod
+    def _create_directory(cls, path):
+        """Create a directory, only accessible by root, if it does not exist."""
+        if not os.path.isdir(path):
+            os.mkdir(path)
+            Base.set_path_permission(path, directory=True)
+
+    @classmethod
+    def write_object(cls, subtree, key, config):
+        """Write the config for a single, existing, object."""
+        from mcvirt.config.virtual_machine_index import VirtualMachineIndex
+        Base._writeJSON(config, cls.get_object_file(subtree, key))
+        VirtualMachineIndex.object_written(subtree, key, config)
+
+    @classmethod
+    def write(cls, config):
+        """Write the sub-trees of a full node config, only writing
+        the object files that have changed.
+        """
+        from mcvirt.config.virtual_machine_index import VirtualMachineIndex
+        old_index = cls.get_index()
+        new_index = {}
+        cls._create_directory(cls.get_base_dir())
+        for subtree in cls.SUBTREES:
+            cls._create_directory(os.path.join(cls.get_base_dir(), subtree))
+            new_index[subtree] = sorted(config[subtree].keys())
+
+            for key, object_config in config[subtree].items():
+                if (key not in old_index[subtree] or
+                        ConfigCache.get(cls.get_object_file(subtree, key)) != object_config):
+                    cls.write_object(subtree, key, object_config)
+
+        # Write the index, before removing objects that no longer exist
+        if new_index != old_index:
+            Base._writeJSON(new_index, cls.get_index_file())
+
+        for subtree in cls.SUBTREES:
+            for key in set(old_index[subtree]) - set(new_index[subtree]):
+                object_file = cls.get_object_file(subtree, key)
+                if os.path.isfile(object_file):
+                    os.unlink(object_file)
+                ConfigCache.invalidate(object_file)
+                VirtualMachineIndex.object_written(subtree, key, None)
+
+    @classmethod
+    def remove(cls):
+        """Remove all object config files."""
+        if os.path.isdir(cls.get_base_dir()):
+            shutil.rmtree(cls.get_base_dir())
+        ConfigCache.invalidate()
+
+
+class ShardedObjectConfig(object):
+    """Config of a single object stored in an individual file,
+    which is updated using a config transaction.
+    """
+
+    def __init__(self, config_object, subtree, key):
+        """Store member variables."""
+        self.config_object = config_object
+        self.subtree = subtree
+        self.key = key
+
+    @property
+    def config_file(self):
+        """Return the location of the config file for the object."""
+        return ShardedStorage.get_object_file(self.subtree, self.key)
+
+    def _read_config(self):
+        """Read the config for the object."""
+        return ShardedStorage.read_object(self.subtree, self.key)
+
+    def _write_config(self, config):
+        """Write the config for the object."""
+        ShardedStorage.write_object(self.subtree, self.key, config)
+
+    def gitAdd(self, message=''):
+        """Commit changes to the config file for the object."""
+        self.config_object.gitAdd(message, paths=[self.config_file])
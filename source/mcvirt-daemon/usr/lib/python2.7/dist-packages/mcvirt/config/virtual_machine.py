@@ -71,7 +71,8 @@ class VirtualMachine(BaseSubconfig):
                 'autostart': AutoStartStates.NO_AUTOSTART.value,
                 'uuid': None,
                 'agent': {
-                    'connection_timeout': None
+                    'connection_timeout': None,
+                    'telemetry_interval': None
                 },
                 'snapshots': [],
                 'watchdog': {
@@ -107,3 +108,6 @@ class VirtualMachine(BaseSubconfig):
 
         if self._getVersion() < 22:
             migrations.v22.migrate(self, config)
+
+        if self._getVersion() < 25:
+            migrations.v25.migrate(self, config)
@@ -0,0 +1,335 @@
+"""Provide indexes for looking up virtual machines by attribute."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+
+import copy
+from threading import Lock
+
+from mcvirt.config.base import ConfigTransaction
+from mcvirt.config.cache import ConfigCache
+from mcvirt.config.core import Core
+from mcvirt.config.sharded_storage import ShardedStorage
+
+
+class VirtualMachineIndex(object):
+    """Maintain indexes of virtual machine name, node, storage backend and
+    clone parent to virtual machine IDs.
+
+    The indexes are built from the config on first use and are then updated
+    by the config write path, which passes the config of each virtual machine
+    or hard drive that has been written. Only the index entries for the
+    virtual machines affected by the change are re-calculated. Changes made
+    outside of MCVirt are detected using the stat of the main config file or,
+    if sharded storage is enabled, of the index file and each object file.
+    """
+
+    # Lock for refreshing and reading indexes
+    LOCK = Lock()
+
+    # Whether the indexes were built from sharded storage, or None if not yet built
+    SHARDED = None
+
+    # Whether the indexes contain uncommitted changes of a config transaction
+    UNCOMMITTED = False
+
+    # Dict of file path -> stat key of the config files that the indexes were built from
+    FILE_KEYS = {}
+
+    # Dict of VM ID -> (name, node, storage backend IDs, clone parent name)
+    ENTRIES = {}
+
+    # Configs used to calculate each entry and the VMs that each hard drive is attached to
+    VM_CONFIGS = {}
+    HARD_DRIVE_CONFIGS = {}
+    HARD_DRIVE_VMS = {}
+
+    # Indexes
+    NAME = {}
+    NODE = {}
+    STORAGE_BACKEND = {}
+    CLONE_PARENT = {}
+
+    @classmethod
+    def invalidate(cls):
+        """Discard the indexes, so that they are re-built on next use."""
+        with cls.LOCK:
+            cls.SHARDED = None
+
+    @classmethod
+    def object_written(cls, subtree, key, config):
+        """Update the index entries affected by the config of a virtual machine
+        or hard drive that has been written to its own file, or removed if
+        config is None.
+        """
+        if subtree not in ['virtual_machines', 'hard_drives']:
+            return
+        with cls.LOCK:
+            if not cls.SHARDED:
+                return
+            cls._set_object(subtree, key, config)
+            object_file = ShardedStorage.get_object_file(subtree, key)
+            if config is None:
+                cls.FILE_KEYS.pop(object_file, None)
+            else:
+                cls.FILE_KEYS[object_file] = ConfigCache.get_file_key(object_file)
+
+    @classmethod
+    def config_written(cls, config):
+        """Update the index entries affected by a write of the main config file."""
+        with cls.LOCK:
+            # If sharded, changes are passed for each object file that is written
+            if cls.SHARDED is False:
+                cls._sync(config['virtual_machines'], config['hard_drives'])
+                cls.FILE_KEYS = {
+                    Core.get_config_file(): ConfigCache.get_file_key(Core.get_config_file())
+                }
+            cls.UNCOMMITTED = False
+
+    @classmethod
+    def _refresh(cls):
+        """Bring the indexes up to date.
+
+        Must be called whilst holding the lock.
+        """
+        if cls.SHARDED is None or cls.SHARDED != ShardedStorage.is_enabled():
+            cls._build()
+        elif cls.SHARDED:
+            cls._check_object_files()
+        elif cls.FILE_KEYS[Core.get_config_file()] != ConfigCache.get_file_key(
+                Core.get_config_file()):
+            # The main config file has been modified outside of MCVirt
+            cls._sync(*cls._read_configs())
+            cls._record_file_keys()
+
+        # Include changes made by a config transaction in progress in the current
+        # thread, which are not passed to the index until they are written
+        transaction = ConfigTransaction.get_active(Core.get_config_file())
+        if transaction is not None and transaction.modified:
+            config = transaction.get_config()
+            cls._sync(config['virtual_machines'], config['hard_drives'])
+            cls.UNCOMMITTED = True
+        elif cls.UNCOMMITTED:
+            # Revert the changes of a transaction that was not written
+            cls._sync(*cls._read_configs())
+            cls.UNCOMMITTED = False
+
+    @classmethod
+    def _build(cls):
+        """Build the indexes from the config."""
+        cls.SHARDED = ShardedStorage.is_enabled()
+        cls.UNCOMMITTED = False
+        for index in [cls.ENTRIES, cls.VM_CONFIGS, cls.HARD_DRIVE_CONFIGS,
+                      cls.HARD_DRIVE_VMS, cls.NAME, cls.NODE, cls.STORAGE_BACKEND,
+                      cls.CLONE_PARENT]:
+            index.clear()
+        cls._sync(*cls._read_configs())
+        cls._record_file_keys()
+
+    @classmethod
+    def _read_configs(cls):
+        """Return the committed virtual machine and hard drive configs."""
+        if cls.SHARDED:
+            return (ShardedStorage.read_subtree('virtual_machines'),
+                    ShardedStorage.read_subtree('hard_drives'))
+        config = ConfigCache.get(Core.get_config_file())
+        return config['virtual_machines'], config['hard_drives']
+
+    @classmethod
+    def _get_files(cls):
+        """Return the config files that the indexes are built from."""
+        if not cls.SHARDED:
+            return [Core.get_config_file()]
+        return ([ShardedStorage.get_index_file()] +
+                [ShardedStorage.get_object_file('virtual_machines', vm_id)
+                 for vm_id in cls.VM_CONFIGS] +
+                [ShardedStorage.get_object_file('hard_drives', hdd_id)
+                 for hdd_id in cls.HARD_DRIVE_CONFIGS])
+
+    @classmethod
+    def _record_file_keys(cls):
+        """Record the stat of the config files that the indexes are built from."""
+        cls.FILE_KEYS = {config_file: ConfigCache.get_file_key(config_file)
+                         for config_file in cls._get_files()}
+
+    @classmethod
+    def _check_object_files(cls):
+        """Update the index entries for objects whose config files have been
+        modified, added or removed outside of MCVirt.
+        """
+        # Determine the objects that have been added or removed
+        index_file = ShardedStorage.get_index_file()
+        index_file_key = ConfigCache.get_file_key(index_file)
+        object_index = None
+        if cls.FILE_KEYS.get(index_file) != index_file_key:
+            object_index = ShardedStorage.get_index()
+            cls.FILE_KEYS[index_file] = index_file_key
+
+        for subtree, configs in [('virtual_machines', cls.VM_CONFIGS),
+                                 ('hard_drives', cls.HARD_DRIVE_CONFIGS)]:
+            keys = configs.keys() if object_index is None else object_index[subtree]
+            for key in set(configs.keys()) - set(keys):
+                cls._set_object(subtree, key, None)
+                cls.FILE_KEYS.pop(ShardedStorage.get_object_file(subtree, key), None)
+
+            for key in keys:
+                object_file = ShardedStorage.get_object_file(subtree, key)
+                file_key = ConfigCache.get_file_key(object_file)
+                if cls.FILE_KEYS.get(object_file) != file_key:
+                    cls._set_object(subtree, key, ConfigCache.get(object_file))
+                    cls.FILE_KEYS[object_file] = file_key
+
+    @classmethod
+    def _sync(cls, vm_configs, hard_drive_configs):
+        """Update the index entries for virtual machines and hard drives
+        whose config differs from the config the indexes were built from.
+        """
+        # Hard drives are updated first, so that the entries of
+        # virtual machines use the new hard drive configs
+        for hdd_id in set(hard_drive_configs.keys()) | set(cls.HARD_DRIVE_CONFIGS.keys()):
+            cls._set_object('hard_drives', hdd_id, hard_drive_configs.get(hdd_id))
+        for vm_id in set(vm_configs.keys()) | set(cls.VM_CONFIGS.keys()):
+            cls._set_object('virtual_machines', vm_id, vm_configs.get(vm_id))
+
+    @classmethod
+    def _set_object(cls, subtree, key, config):
+        """Update the config of a virtual machine or hard drive, or remove
+        it if config is None, and re-calculate the affected entries.
+        """
+        if subtree == 'virtual_machines':
+            old_config = cls.VM_CONFIGS.get(key)
+            if old_config == config:
+                return
+            if old_config is not None:
+                for hdd_id in cls._get_hard_drive_ids(old_config):
+                    cls._discard(cls.HARD_DRIVE_VMS, hdd_id, key)
+            cls._remove_entry(key)
+
+            if config is None:
+                del cls.VM_CONFIGS[key]
+                return
+            cls.VM_CONFIGS[key] = copy.deepcopy(config)
+            for hdd_id in cls._get_hard_drive_ids(config):
+                cls.HARD_DRIVE_VMS.setdefault(hdd_id, set()).add(key)
+            cls._add_entry(key)
+
+        elif subtree == 'hard_drives':
+            if cls.HARD_DRIVE_CONFIGS.get(key) == config:
+                return
+            if config is None:
+                del cls.HARD_DRIVE_CONFIGS[key]
+            else:
+                cls.HARD_DRIVE_CONFIGS[key] = copy.deepcopy(config)
+
+            # Re-calculate the entries of the VMs that the hard drive is attached to
+            for vm_id in cls.HARD_DRIVE_VMS.get(key, set()).copy():
+                cls._remove_entry(vm_id)
+                cls._add_entry(vm_id)
+
+    @staticmethod
+    def _get_hard_drive_ids(vm_config):
+        """Return the IDs of the hard drives attached to a VM."""
+        return [attachment['hard_drive_id'] for attachment in vm_config['hard_drives'].values()]
+
+    @classmethod
+    def _add_entry(cls, vm_id):
+        """Calculate the entry for a VM and add it to each of the indexes."""
+        vm_config = cls.VM_CONFIGS[vm_id]
+        name = vm_config['name']
+        node = vm_config['node']
+        storage_backends = frozenset([cls.HARD_DRIVE_CONFIGS[hdd_id]['storage_backend']
+                                      for hdd_id in cls._get_hard_drive_ids(vm_config)
+                                      if hdd_id in cls.HARD_DRIVE_CONFIGS])
+        clone_parent = vm_config['clone_parent'] or None
+
+        cls.ENTRIES[vm_id] = (name, node, storage_backends, clone_parent)
+        cls.NAME[name] = vm_id
+        cls.NODE.setdefault(node, set()).add(vm_id)
+        for storage_backend in storage_backends:
+            cls.STORAGE_BACKEND.setdefault(storage_backend, set()).add(vm_id)
+        if clone_parent:
+            cls.CLONE_PARENT.setdefault(clone_parent, set()).add(vm_id)
+
+    @classmethod
+    def _remove_entry(cls, vm_id):
+        """Remove the entry for a VM from each of the indexes."""
+        if vm_id not in cls.ENTRIES:
+            return
+        name, node, storage_backends, clone_parent = cls.ENTRIES.pop(vm_id)
+        if cls.NAME.get(name) == vm_id:
+            del cls.NAME[name]
+        cls._discard(cls.NODE, node, vm_id)
+        for storage_backend in storage_backends:
+            cls._discard(cls.STORAGE_BACKEND, storage_backend, vm_id)
+        if clone_parent:
+            cls._discard(cls.CLONE_PARENT, clone_parent, vm_id)
+
+    @staticmethod
+    def _discard(index, key, vm_id):
+        """Remove a VM ID from an index, removing the key if empty."""
+        if key in index:
+            index[key].discard(vm_id)
+            if not index[key]:
+                del index[key]
+
+    @classmethod
+    def get_ids(cls):
+        """Return the IDs of all VMs."""
+        with cls.LOCK:
+            cls._refresh()
+            return cls.ENTRIES.keys()
+
+    @classmethod
+    def exists(cls, vm_id):
+        """Determine if a VM exists with the given ID."""
+        with cls.LOCK:
+            cls._refresh()
+            return vm_id in cls.ENTRIES
+
+    @classmethod
+    def get_names(cls):
+        """Return the names of all VMs."""
+        with cls.LOCK:
+            cls._refresh()
+            return cls.NAME.keys()
+
+    @classmethod
+    def get_id_by_name(cls, name):
+        """Return the ID of the VM with the given name, or None."""
+        with cls.LOCK:
+            cls._refresh()
+            return cls.NAME.get(name)
+
+    @classmethod
+    def get_ids_by_node(cls, node):
+        """Return the IDs of VMs registered on a node."""
+        with cls.LOCK:
+            cls._refresh()
+            return list(cls.NODE.get(node, []))
+
+    @classmethod
+    def get_ids_by_storage_backend(cls, storage_backend_id):
+        """Return the IDs of VMs with hard drives using a storage backend."""
+        with cls.LOCK:
+            cls._refresh()
+            return list(cls.STORAGE_BACKEND.get(storage_backend_id, []))
+
+    @classmethod
+    def get_clone_children(cls, name):
+        """Return the names of VMs that are clones of the given VM."""
+        with cls.LOCK:
+            cls._refresh()
+            return sorted([cls.ENTRIES[vm_id][0]
+                           for vm_id in cls.CLONE_PARENT.get(name, [])])
@@ -17,22 +17,29 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
-from threading import Lock, Timer
+from threading import Lock
+from Queue import Queue
+from functools import partial
 import gc
 from datetime import datetime, timedelta
 import sqlite3
+import time
 
 import Pyro4
 
 from mcvirt.rpc.expose_method import Expose
 from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.exceptions import (DatabaseClassAlreadyInstanciatedError,
                                DoNotHaveDatabaseConnectionLockError,
-                               UnableToObtainDatabaseLockError)
-from mcvirt.constants import DirectoryLocation, StatisticsDeviceType
+                               UnableToObtainDatabaseLockError,
+                               InvalidStatisticsQueryException)
+from mcvirt.constants import DirectoryLocation, StatisticsDeviceType, StatisticsResolution
 from . import schema_migrations as migrations
+from mcvirt.config.core import Core as MCVirtConfig
 from mcvirt.syslogger import Syslogger
 from mcvirt.thread.repeat_timer import RepeatTimer
+from mcvirt.thread.scheduler import Scheduler
 
 
 class DatabaseFactory(PyroObject):
@@ -48,6 +55,59 @@ class DatabaseFactory(PyroObject):
     # callback query can be performed at once
     CONNECTION_LOCK = Lock()
 
+    # Lock for creating the writer connection and reader pool
+    SQLITE_OBJECT_LOCK = Lock()
+
+    # Long-lived writer connection, used whilst holding the connection lock
+    WRITER_CONNECTION = None
+
+    # Pool of reader connections, which do not require the connection lock
+    READER_POOL = None
+    READER_POOL_SIZE = 4
+
+    # Number of prepared statements cached per connection
+    CACHED_STATEMENTS = 256
+
+    # Size (bytes) of the database that is memory mapped by each connection
+    MMAP_SIZE = 268435456
+
+    # Resolutions that statistics are aggregated into, each being
+    # aggregated from the previous (finer) resolution
+    ROLLUP_RESOLUTIONS = [StatisticsResolution.MINUTE,
+                          StatisticsResolution.HOUR,
+                          StatisticsResolution.DAY]
+
+    # Period (seconds) before the current time that raw statistics are
+    # aggregated until, allowing for statistics being inserted after
+    # they have been gathered
+    ROLLUP_DELAY = 60
+
+    # Maximum number of periods aggregated for each resolution during a single
+    # rollup, so that the database is not locked for long periods whilst
+    # aggregating existing statistics
+    ROLLUP_MAX_PERIODS = 1440
+
+    # Maximum number of data points per statistic type returned
+    # by a range query, which determines the resolution used
+    RANGE_MAX_POINTS = 1000
+
+    # Aggregate functions supported by statistics queries
+    QUERY_AGGREGATES = ['avg', 'min', 'max', 'p95', 'last']
+
+    # Maximum number of devices in a single statistics query
+    QUERY_MAX_DEVICES = 100
+
+    # Number of free pages reclaimed by incremental vacuum after pruning
+    VACUUM_PAGES = 2000
+
+    # Maximum number of statistics sent to a remote node in a single
+    # import during statistics sync
+    SYNC_CHUNK_SIZE = 5000
+
+    # Maximum number of devices included in a single statistics sync
+    # query, keeping the query parameters within the SQLite limit
+    SYNC_QUERY_DEVICES = 300
+
     def __init__(self):
         """Obtain singleton lock and create connection to DB."""
         if not DatabaseFactory.SINGLETON_LOCK.acquire(False):
@@ -72,9 +132,49 @@ class DatabaseFactory(PyroObject):
         self.po__register_object(db_object)
         return db_object
 
+    def get_read_connection(self):
+        """Obtain a read-only database connection from the reader pool,
+        which does not wait for the connection lock.
+        """
+        return DatabaseReadConnection(self)
+
+    @classmethod
+    def _create_sqlite_object(cls, read_only=False):
+        """Create a new connection to the database."""
+        # Connections are shared between threads, but each is only used by a
+        # single thread at a time, whilst holding the lock or taken from the pool
+        sqlite_object = sqlite3.connect(DirectoryLocation.SQLITE_DATABASE,
+                                        check_same_thread=False,
+                                        cached_statements=cls.CACHED_STATEMENTS)
+        sqlite_object.execute("""PRAGMA mmap_size=%s""" % cls.MMAP_SIZE)
+        if read_only:
+            sqlite_object.execute("""PRAGMA query_only=1""")
+        else:
+            # Use write-ahead log, so that readers do not wait for writers
+            sqlite_object.execute("""PRAGMA journal_mode=WAL""")
+            sqlite_object.execute("""PRAGMA synchronous=NORMAL""")
+        return sqlite_object
+
     def get_sqlite_object(self):
-        """Retrun the SQLite database object."""
-        return sqlite3.connect(DirectoryLocation.SQLITE_DATABASE)
+        """Return the SQLite writer database object."""
+        with DatabaseFactory.SQLITE_OBJECT_LOCK:
+            if DatabaseFactory.WRITER_CONNECTION is None:
+                DatabaseFactory.WRITER_CONNECTION = self._create_sqlite_object()
+            return DatabaseFactory.WRITER_CONNECTION
+
+    def obtain_read_sqlite_object(self):
+        """Take a reader SQLite database object from the reader pool."""
+        with DatabaseFactory.SQLITE_OBJECT_LOCK:
+            if DatabaseFactory.READER_POOL is None:
+                DatabaseFactory.READER_POOL = Queue()
+                for _ in range(self.READER_POOL_SIZE):
+                    DatabaseFactory.READER_POOL.put(
+                        self._create_sqlite_object(read_only=True))
+        return DatabaseFactory.READER_POOL.get()
+
+    def release_read_sqlite_object(self, sqlite_object):
+        """Return a reader SQLite database object to the reader pool."""
+        DatabaseFactory.READER_POOL.put(sqlite_object)
 
     @staticmethod
     def obtain_db_conn_lock():
@@ -99,7 +199,7 @@ class DatabaseFactory(PyroObject):
         res = db_inst.cursor.execute(
             """SELECT version FROM mcvirt_schema;""")
         version = res.fetchone()
-        return version if version is not None else 0
+        return version[0] if version is not None else 0
 
     def _schema_migration(self, db_inst):
         """Perform schema miagrations."""
@@ -110,6 +210,15 @@ class DatabaseFactory(PyroObject):
         if schema_version < 1:
             migrations.v1.migrate(db_inst)
 
+        if schema_version < 2:
+            migrations.v2.migrate(db_inst)
+
+        if schema_version < 3:
+            migrations.v3.migrate(db_inst)
+
+        if schema_version < 4:
+            migrations.v4.migrate(db_inst)
+
         if schema_version < migrations.SCHEMA_VERSION:
             migrations.update_schema_version(db_inst)
 
@@ -118,7 +227,7 @@ class DatabaseFactory(PyroObject):
         """Obtain latest statistics date."""
         self.po__get_registered_object('auth').assert_user_type('ClusterUser')
         local_latest = None
-        with self.get_locking_connection(perform_sync=False) as db_inst:
+        with self.get_read_connection() as db_inst:
             res = db_inst.cursor.execute(
                 """SELECT max(stat_date) FROM stats WHERE device_type=? AND device_id=?""",
                 (device_type, device_id))
@@ -130,7 +239,7 @@ class DatabaseFactory(PyroObject):
     def get_statistics(self, device_type, device_id, from_date):
         """Obtain ist of statistics from a given date."""
         data_set = []
-        with self.get_locking_connection(perform_sync=False) as db_inst:
+        with self.get_read_connection() as db_inst:
             res = db_inst.cursor.execute(
                 """SELECT stat_date, stat_value, stat_type FROM stats
                    WHERE device_type=? AND device_id=? AND stat_date > ?""",
@@ -139,6 +248,94 @@ class DatabaseFactory(PyroObject):
                 data_set.append(list(stat))
         return data_set
 
+    @Expose()
+    def get_latest_stats(self, devices=None):
+        """Obtain the latest statistics date for a list of
+        [device_type, device_id], or all devices if not specified,
+        as a list of [device_type, device_id, latest date].
+        """
+        self.po__get_registered_object('auth').assert_user_type('ClusterUser')
+        return [[device_type, device_id, latest]
+                for (device_type, device_id), latest in self._get_latest_stats(devices).items()]
+
+    def _get_latest_stats(self, devices=None):
+        """Return dict of (device_type, device_id) -> latest statistics date,
+        for the given list of (device_type, device_id) or all devices.
+        """
+        if devices is None:
+            with self.get_read_connection() as db_inst:
+                res = db_inst.cursor.execute(
+                    """SELECT device_type, device_id, max(stat_date) FROM stats
+                       GROUP BY device_type, device_id""")
+                return {(device_type, device_id): latest
+                        for device_type, device_id, latest in res}
+
+        latest_dates = {}
+        devices = list(devices)
+        for chunk_start in range(0, len(devices), self.SYNC_QUERY_DEVICES):
+            chunk = devices[chunk_start:chunk_start + self.SYNC_QUERY_DEVICES]
+            params = []
+            for device_type, device_id in chunk:
+                params += [device_type, device_id]
+            with self.get_read_connection() as db_inst:
+                res = db_inst.cursor.execute(
+                    """WITH devices(device_type, device_id) AS (VALUES %s)
+                       SELECT devices.device_type, devices.device_id,
+                              (SELECT max(stat_date) FROM stats
+                               WHERE stats.device_type=devices.device_type
+                               AND stats.device_id=devices.device_id)
+                       FROM devices""" % ', '.join(['(?, ?)'] * len(chunk)),
+                    params)
+                for device_type, device_id, latest in res:
+                    if latest is not None:
+                        latest_dates[(device_type, device_id)] = latest
+        return latest_dates
+
+    def insert_statistics(self, stats):
+        """Insert statistics, each being (device_type, device_id, stat_type,
+        stat_value, stat_date), marking the devices to be synced.
+        """
+        with self.get_locking_connection() as db_inst:
+            db_inst.cursor.executemany(
+                """INSERT INTO stats(
+                    device_type, device_id, stat_type, stat_value, stat_date
+                ) VALUES(?, ?, ?, ?, ?)""",
+                stats)
+
+            change_seq = db_inst.cursor.execute(
+                """SELECT ifnull(max(change_seq), 0) + 1 FROM stats_device_state"""
+            ).fetchone()[0]
+            db_inst.cursor.executemany(
+                """INSERT OR REPLACE INTO stats_device_state(device_type, device_id, change_seq)
+                   VALUES(?, ?, ?)""",
+                [(device_type, device_id, change_seq)
+                 for device_type, device_id in set([(stat[0], stat[1]) for stat in stats])])
+
+    def get_statistics_since(self, latest_dates):
+        """Return generator of statistics for multiple devices, from
+        a dict of (device_type, device_id) -> date, each statistic being
+        [stat_date, stat_value, stat_type, device_type, device_id].
+        """
+        devices = latest_dates.items()
+        for chunk_start in range(0, len(devices), self.SYNC_QUERY_DEVICES):
+            chunk = devices[chunk_start:chunk_start + self.SYNC_QUERY_DEVICES]
+            params = []
+            for (device_type, device_id), from_date in chunk:
+                params += [device_type, device_id, from_date]
+            with self.get_read_connection() as db_inst:
+                res = db_inst.cursor.execute(
+                    """WITH sync_from(device_type, device_id, from_date) AS (VALUES %s)
+                       SELECT stats.stat_date, stats.stat_value, stats.stat_type,
+                              stats.device_type, stats.device_id
+                       FROM sync_from INNER JOIN stats
+                       ON stats.device_type=sync_from.device_type
+                       AND stats.device_id=sync_from.device_id
+                       AND stats.stat_date > sync_from.from_date""" %
+                    ', '.join(['(?, ?, ?)'] * len(chunk)),
+                    params)
+                for stat in res:
+                    yield list(stat)
+
     @Expose()
     def import_statistics(self, device_type, device_id, stats):
         """Import stats into local db."""
@@ -146,49 +343,397 @@ class DatabaseFactory(PyroObject):
         for stat in stats:
             stat.append(device_type)
             stat.append(device_id)
+        self._import_statistics(stats)
+
+    @Expose()
+    def import_statistics_bulk(self, stats):
+        """Import stats for multiple devices into local db, each being
+        [stat_date, stat_value, stat_type, device_type, device_id].
+        """
+        self.po__get_registered_object('auth').assert_user_type('ClusterUser')
+        self._import_statistics(stats)
+
+    def _import_statistics(self, stats):
+        """Insert statistics into local db."""
         with self.get_locking_connection(perform_sync=False) as db_inst:
             db_inst.cursor.executemany(
                 """INSERT INTO stats(stat_date, stat_value, stat_type, device_type, device_id)
                    VALUES(?, ?, ?, ?, ?)""",
                 stats)
 
+            # Ensure that periods containing the imported statistics
+            # are re-aggregated during the next rollup
+            if stats:
+                self._rewind_rollups(db_inst, min([stat[0] for stat in stats]))
+
+    def _rewind_rollups(self, db_inst, from_date):
+        """Re-aggregate each rollup resolution from the period containing a date.
+
+        Periods are only re-aggregated if the statistics of the source resolution
+        are still retained for the entire period, so that existing aggregates are
+        not replaced by aggregates of the remaining partial data.
+        """
+        now = int(time.time())
+        retention = self.get_statistics_retention()
+        source_resolution = StatisticsResolution.RAW
+        for resolution in self.ROLLUP_RESOLUTIONS:
+            period = resolution.value
+            rollup_date = from_date
+            if retention[source_resolution] is not None:
+                # Start of the first period that is within the source retention period
+                retained_from = now - retention[source_resolution]
+                rollup_date = max(rollup_date, -(-retained_from // period) * period)
+            db_inst.cursor.execute(
+                """UPDATE stats_rollup_state SET rollup_date=?
+                   WHERE resolution=? AND rollup_date > ?""",
+                (rollup_date, period, rollup_date))
+            source_resolution = resolution
+
+    @staticmethod
+    def get_statistics_retention():
+        """Return dict of resolution -> retention period (seconds),
+        or None if statistics are kept indefinitely.
+        """
+        retention_config = MCVirtConfig().get_config()['statistics']['retention']
+        return {resolution: retention_config[resolution.name.lower()]
+                for resolution in StatisticsResolution}
+
+    def rollup_statistics(self):
+        """Aggregate statistics into periods for each rollup resolution."""
+        now = int(time.time())
+        with self.get_locking_connection(perform_sync=False) as db_inst:
+            rollup_dates = dict(db_inst.cursor.execute(
+                """SELECT resolution, rollup_date FROM stats_rollup_state""").fetchall())
+
+            # Raw statistics can be aggregated up to the current time
+            source_resolution = StatisticsResolution.RAW
+            source_end = now - self.ROLLUP_DELAY
+            for resolution in self.ROLLUP_RESOLUTIONS:
+                period = resolution.value
+
+                # Determine start of the first period that has not been aggregated
+                start = rollup_dates.get(period)
+                if start is None:
+                    if source_resolution is StatisticsResolution.RAW:
+                        start = db_inst.cursor.execute(
+                            """SELECT min(stat_date) FROM stats""").fetchone()[0]
+                    else:
+                        start = db_inst.cursor.execute(
+                            """SELECT min(stat_date) FROM stats_rollup
+                               WHERE resolution=?""", (source_resolution.value, )).fetchone()[0]
+                    if start is None:
+                        break
+                start = (start // period) * period
+
+                # Only aggregate complete periods that the source resolution
+                # has been completely aggregated for
+                end = min((source_end // period) * period,
+                          start + (period * self.ROLLUP_MAX_PERIODS))
+                if end <= start:
+                    break
+
+                if source_resolution is StatisticsResolution.RAW:
+                    db_inst.cursor.execute(
+                        """INSERT OR REPLACE INTO stats_rollup(
+                               resolution, device_type, device_id, stat_date, stat_type,
+                               stat_min, stat_avg, stat_max, stat_count)
+                           SELECT ?, device_type, device_id, (stat_date / ?) * ?, stat_type,
+                                  min(stat_value), avg(stat_value), max(stat_value), count(*)
+                           FROM stats WHERE stat_date >= ? AND stat_date < ?
+                           GROUP BY device_type, device_id, stat_date / ?, stat_type""",
+                        (period, period, period, start, end, period))
+                else:
+                    db_inst.cursor.execute(
+                        """INSERT OR REPLACE INTO stats_rollup(
+                               resolution, device_type, device_id, stat_date, stat_type,
+                               stat_min, stat_avg, stat_max, stat_count)
+                           SELECT ?, device_type, device_id, (stat_date / ?) * ?, stat_type,
+                                  min(stat_min), sum(stat_avg * stat_count) / sum(stat_count),
+                                  max(stat_max), sum(stat_count)
+                           FROM stats_rollup
+                           WHERE resolution=? AND stat_date >= ? AND stat_date < ?
+                           GROUP BY device_type, device_id, stat_date / ?, stat_type""",
+                        (period, period, period, source_resolution.value, start, end, period))
+
+                db_inst.cursor.execute(
+                    """INSERT OR REPLACE INTO stats_rollup_state(resolution, rollup_date)
+                       VALUES(?, ?)""", (period, end))
+                source_resolution = resolution
+                source_end = end
+
+    def prune_statistics(self):
+        """Remove statistics that are older than the retention period."""
+        now = int(time.time())
+        retention = self.get_statistics_retention()
+        with self.get_locking_connection(perform_sync=False) as db_inst:
+            rollup_dates = dict(db_inst.cursor.execute(
+                """SELECT resolution, rollup_date FROM stats_rollup_state""").fetchall())
+
+            source_resolution = StatisticsResolution.RAW
+            for resolution in self.ROLLUP_RESOLUTIONS + [None]:
+                if retention[source_resolution] is not None:
+                    # Do not remove statistics that have not yet been aggregated
+                    # into the next resolution
+                    remove_before = now - retention[source_resolution]
+                    if resolution is not None:
+                        remove_before = min(remove_before,
+                                            rollup_dates.get(resolution.value, 0))
+
+                    if source_resolution is StatisticsResolution.RAW:
+                        db_inst.cursor.execute(
+                            """DELETE FROM stats WHERE stat_date < ?""", (remove_before, ))
+                    else:
+                        db_inst.cursor.execute(
+                            """DELETE FROM stats_rollup WHERE resolution=? AND stat_date < ?""",
+                            (source_resolution.value, remove_before))
+                source_resolution = resolution
+
+        # Release free pages to the filesystem
+        with self.get_locking_connection(perform_sync=False) as db_inst:
+            db_inst.cursor.execute("""PRAGMA incremental_vacuum(%s)""" % self.VACUUM_PAGES)
+
+    def get_statistics_resolution(self, start_date, end_date):
+        """Return the finest resolution that contains statistics for the
+        start of the date range and returns no more than the maximum
+        number of data points.
+        """
+        now = int(time.time())
+        retention = self.get_statistics_retention()
+        for resolution in [StatisticsResolution.RAW] + self.ROLLUP_RESOLUTIONS:
+            period = (resolution.value or
+                      MCVirtConfig().get_config()['statistics']['interval'] or 1)
+            if (((end_date - start_date) // period) <= self.RANGE_MAX_POINTS and
+                    (retention[resolution] is None or
+                     start_date >= now - retention[resolution])):
+                return resolution
+        return self.ROLLUP_RESOLUTIONS[-1]
+
+    def get_statistics_range(self, device_type, device_id, start_date, end_date,
+                             resolution=None):
+        """Obtain statistics for a device between two dates, returning the
+        resolution used and list of [stat_date, stat_type, min, avg, max, count]
+        for each period. If resolution is not specified, the resolution
+        is determined by the size of the date range.
+        """
+        if resolution is None:
+            resolution = self.get_statistics_resolution(start_date, end_date)
+
+        with self.get_read_connection() as db_inst:
+            if resolution is StatisticsResolution.RAW:
+                res = db_inst.cursor.execute(
+                    """SELECT stat_date, stat_type, stat_value, stat_value, stat_value, 1
+                       FROM stats
+                       WHERE device_type=? AND device_id=? AND stat_date >= ? AND stat_date < ?
+                       ORDER BY stat_date""",
+                    (device_type, device_id, start_date, end_date))
+            else:
+                res = db_inst.cursor.execute(
+                    """SELECT stat_date, stat_type, stat_min, stat_avg, stat_max, stat_count
+                       FROM stats_rollup
+                       WHERE resolution=? AND device_type=? AND device_id=? AND
+                             stat_date >= ? AND stat_date < ?
+                       ORDER BY stat_date""",
+                    (resolution.value, device_type, device_id, start_date, end_date))
+            data_set = [list(stat) for stat in res]
+        return resolution, data_set
+
+    def get_query_resolution(self, start_date, bucket_width):
+        """Return the finest resolution that contains statistics for the
+        start date and is no coarser than the bucket width.
+        """
+        now = int(time.time())
+        retention = self.get_statistics_retention()
+        for resolution in [StatisticsResolution.RAW] + self.ROLLUP_RESOLUTIONS:
+            if resolution.value > bucket_width:
+                break
+            if retention[resolution] is None or start_date >= now - retention[resolution]:
+                return resolution
+        return self.ROLLUP_RESOLUTIONS[-1]
+
+    @Expose()
+    def query_statistics(self, devices, start_date, end_date, stat_types=None,
+                         bucket_width=None, aggregates=None):
+        """Obtain statistics for a list of [device_type, device_id] between
+        two dates, aggregated into buckets of bucket_width seconds.
+
+        The bucket width is increased, if required, so that no more than the
+        maximum number of buckets are returned for each statistic. Aggregates
+        may contain avg, min, max, p95 and last (default avg).
+
+        Returns dict of the query and a list of series, one per device and
+        stat type, each containing a list of bucket start dates and a list
+        of values for each aggregate.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        aggregates = list(aggregates) if aggregates else ['avg']
+        invalid_aggregates = [aggregate for aggregate in aggregates
+                              if aggregate not in self.QUERY_AGGREGATES]
+        if invalid_aggregates:
+            raise InvalidStatisticsQueryException(
+                'Invalid aggregate(s): %s. Must be one of: %s' %
+                (', '.join(invalid_aggregates), ', '.join(self.QUERY_AGGREGATES)))
+        if not devices or len(devices) > self.QUERY_MAX_DEVICES:
+            raise InvalidStatisticsQueryException(
+                'Between 1 and %s devices must be specified' % self.QUERY_MAX_DEVICES)
+        start_date = int(start_date)
+        end_date = int(end_date)
+        if end_date <= start_date:
+            raise InvalidStatisticsQueryException('End date must be after start date')
+
+        # Align buckets to the bucket width
+        bucket_width = max(int(bucket_width or 0), 1,
+                           -(-(end_date - start_date) // self.RANGE_MAX_POINTS))
+        start_date -= start_date % bucket_width
+        resolution = self.get_query_resolution(start_date, bucket_width)
+
+        if resolution is StatisticsResolution.RAW:
+            table = 'stats'
+            table_filter = ''
+            value_column = 'stat_value'
+            aggregate_columns = ['avg(stat_value)', 'min(stat_value)', 'max(stat_value)']
+        else:
+            table = 'stats_rollup'
+            table_filter = 'resolution=%s AND ' % resolution.value
+            value_column = 'stat_avg'
+            aggregate_columns = ['sum(stat_avg * stat_count) / sum(stat_count)',
+                                 'min(stat_min)', 'max(stat_max)']
+        stat_type_filter = ''
+        if stat_types:
+            stat_type_filter = 'AND stat_type IN (%s)' % ', '.join(
+                [str(int(stat_type)) for stat_type in stat_types])
+
+        def execute(db_inst, columns, device_type, device_id, group=True):
+            """Run query for a device, either grouped into buckets or
+            returning each value, ordered by bucket and value.
+            """
+            return db_inst.cursor.execute(
+                """SELECT stat_type, (stat_date / ?) * ? AS bucket, %s FROM %s
+                   WHERE %sdevice_type=? AND device_id=? AND
+                         stat_date >= ? AND stat_date < ? %s
+                   %s ORDER BY stat_type, bucket%s""" % (
+                       columns, table, table_filter, stat_type_filter,
+                       'GROUP BY stat_type, bucket' if group else '',
+                       '' if group else ', %s' % value_column),
+                (bucket_width, bucket_width, device_type, device_id, start_date, end_date))
+
+        series = []
+        with self.get_read_connection() as db_inst:
+            for device_type, device_id in devices:
+                device_series = {}
+                for row in execute(db_inst, ', '.join(aggregate_columns),
+                                   device_type, device_id):
+                    stat_series = device_series.get(row[0])
+                    if stat_series is None:
+                        stat_series = {'device_type': device_type, 'device_id': device_id,
+                                       'stat_type': row[0], 'dates': []}
+                        stat_series.update({aggregate: [] for aggregate in aggregates})
+                        device_series[row[0]] = stat_series
+                    stat_series['dates'].append(row[1])
+                    for index, aggregate in enumerate(['avg', 'min', 'max']):
+                        if aggregate in stat_series:
+                            stat_series[aggregate].append(row[2 + index])
+
+                if 'last' in aggregates:
+                    # Value of the row with the latest date in each bucket
+                    for stat_type, bucket, _, value in execute(
+                            db_inst, 'max(stat_date), %s' % value_column,
+                            device_type, device_id):
+                        stat_series = device_series[stat_type]
+                        stat_series['last'].append(value)
+
+                if 'p95' in aggregates:
+                    # Nearest-rank percentile of the ordered values in each bucket
+                    values = {}
+                    for stat_type, bucket, value in execute(
+                            db_inst, value_column, device_type, device_id, group=False):
+                        if value is not None:
+                            values.setdefault((stat_type, bucket), []).append(value)
+                    for stat_type, stat_series in device_series.items():
+                        for bucket in stat_series['dates']:
+                            bucket_values = values.get((stat_type, bucket))
+                            stat_series['p95'].append(
+                                bucket_values[-(-len(bucket_values) * 95 // 100) - 1]
+                                if bucket_values else None)
+
+                series += [device_series[stat_type] for stat_type in sorted(device_series)]
+
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'bucket_width': bucket_width,
+            'resolution': resolution.name,
+            'aggregates': aggregates,
+            'series': series
+        }
+
     def sync(self):
         """Syncronise all local data with remote nodes."""
         # @TODO This is just waiting for a dead lock
         # Need to implement global cluster lock
-
-        virtual_machines = self.po__get_registered_object(
-            'virtual_machine_factory').get_all_virtual_machines()
         cluster = self.po__get_registered_object('cluster')
-        for node in cluster.get_nodes():
-            node_object = cluster.get_remote_node(node)
-            remote_db_fact = node_object.get_connection('database_factory')
-
-            for device_id, device_type in (
-                    [(vm.id_, StatisticsDeviceType.VIRTUAL_MACHINE.value)
-                     for vm in virtual_machines] +
-                    [(node, StatisticsDeviceType.HOST.value)
-                     for node in cluster.get_nodes(return_all=True,
-                                                   include_local=True)]):
-
-                local_latest = self.get_latest_stat(device_type, device_id)
-
-                remote_latest = remote_db_fact.get_latest_stat(device_type,
-                                                               device_id)
-
-                # If local data is newer than remote data,
-                # push the changes
-                if local_latest > remote_latest:
-                    Syslogger.logger().info(
-                        'Syncing stats from %s to %s for %s %s:%s' %
-                        (remote_latest, local_latest, node, device_type, device_id))
-                    push_data = self.get_statistics(device_type=device_type,
-                                                    device_id=device_id,
-                                                    from_date=remote_latest)
-                    remote_db_fact.import_statistics(device_type=device_type,
-                                                     device_id=device_id,
-                                                     stats=push_data)
-                    Syslogger.logger().info('Complete single stat sync')
+        with self.get_read_connection() as db_inst:
+            change_seq = db_inst.cursor.execute(
+                """SELECT ifnull(max(change_seq), 0) FROM stats_device_state"""
+            ).fetchone()[0]
+            synced_seqs = dict(db_inst.cursor.execute(
+                """SELECT node, change_seq FROM stats_sync_state"""))
+
+        # Sync each node with changes since the last sync in parallel,
+        # using the scheduler's long-running workers
+        Scheduler.get_instance().run_long_running([
+            partial(self._sync_node, cluster, node, synced_seqs.get(node, 0), change_seq)
+            for node in cluster.get_nodes()
+            if synced_seqs.get(node, 0) < change_seq
+        ])
+
+    def _sync_node(self, cluster, node, from_seq, to_seq):
+        """Push statistics for devices changed between two change sequence
+        numbers that are newer than the latest statistics on a remote node.
+        """
+        Pyro4.current_context.INTERNAL_REQUEST = True
+        try:
+            with self.get_read_connection() as db_inst:
+                devices = [(device_type, device_id) for device_type, device_id in
+                           db_inst.cursor.execute(
+                               """SELECT device_type, device_id FROM stats_device_state
+                                  WHERE change_seq > ? AND change_seq <= ?""",
+                               (from_seq, to_seq))]
+
+            remote_db_fact = cluster.get_remote_node(node).get_connection('database_factory')
+            remote_latest = {(device_type, device_id): latest
+                             for device_type, device_id, latest
+                             in remote_db_fact.get_latest_stats(devices)}
+            local_latest = self._get_latest_stats(devices)
+
+            # Determine devices with local data newer than remote data
+            sync_from = {}
+            for device in devices:
+                if local_latest.get(device, 0) > remote_latest.get(device, 0):
+                    sync_from[device] = remote_latest.get(device, 0)
+
+            Syslogger.logger().info('Syncing stats for %s of %s changed devices to %s' %
+                                    (len(sync_from), len(devices), node))
+            stat_count = 0
+            push_data = []
+            for stat in self.get_statistics_since(sync_from):
+                push_data.append(stat)
+                if len(push_data) >= self.SYNC_CHUNK_SIZE:
+                    remote_db_fact.import_statistics_bulk(push_data)
+                    stat_count += len(push_data)
+                    push_data = []
+            if push_data:
+                remote_db_fact.import_statistics_bulk(push_data)
+                stat_count += len(push_data)
+
+            # Store the change sequence number that the node has been synced to
+            with self.get_locking_connection(perform_sync=False) as db_inst:
+                db_inst.cursor.execute(
+                    """INSERT OR REPLACE INTO stats_sync_state(node, change_seq) VALUES(?, ?)""",
+                    (node, to_seq))
+            Syslogger.logger().info('Complete stat sync of %s statistics to %s' %
+                                    (stat_count, node))
+        except Exception, exc:
+            Syslogger.logger().error('Failed to sync stats to %s: %s' % (node, str(exc)))
 
 
 class DatabaseConnection(PyroObject):
@@ -243,9 +788,48 @@ class DatabaseConnection(PyroObject):
             'Do not have database connection lock')
 
 
+class DatabaseReadConnection(object):
+    """Provide a read-only connection to the sqlite database
+    object from the reader pool.
+    """
+
+    def __init__(self, database):
+        """Store the database factory."""
+        self._database = database
+        self._sqlite_object = None
+
+    def __enter__(self):
+        """Take connection from the reader pool."""
+        self._sqlite_object = self._database.obtain_read_sqlite_object()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """End the read transaction and return the connection to the pool."""
+        self._sqlite_object.rollback()
+        self._database.release_read_sqlite_object(self._sqlite_object)
+        self._sqlite_object = None
+        self._database = None
+
+    def get_db_object(self):
+        """Return DB object."""
+        return self._sqlite_object
+
+    @property
+    def cursor(self):
+        """Obtain the cursor."""
+        if self._sqlite_object is not None:
+            return self._sqlite_object.cursor()
+        raise DoNotHaveDatabaseConnectionLockError(
+            'Do not have database connection')
+
+
 class StatisticsSync(RepeatTimer):
     """Object to perform regular statistics syncronisation between nodes."""
 
+    # Syncs wait on remote nodes. This is the only long-running job that waits
+    # for other long-running jobs, so the workers cannot all be waiting
+    LONG_RUNNING = True
+
     DEFAULT_TIMEOUT_WAIT_PERIOD = 30
     MAXIMUM_WAIT_PERIOD = 120
 
@@ -289,8 +873,7 @@ class StatisticsSync(RepeatTimer):
         # timer start time
         if self.timer is None:
             self.original_timer_start = datetime.now()
-            self.timer = Timer(float(self.DEFAULT_TIMEOUT_WAIT_PERIOD), self.repeat_run)
-            self.timer.start()
+            self.timer = self._schedule(float(self.DEFAULT_TIMEOUT_WAIT_PERIOD))
 
     def repeat_run(self):
         """Re-start timer once run has complete."""
@@ -300,8 +883,7 @@ class StatisticsSync(RepeatTimer):
         new_interval = self.interval
         if new_interval:
             # Start new timer
-            self.timer = Timer(new_interval, self.repeat_run)
-            self.timer.start()
+            self.timer = self._schedule(new_interval)
             return
 
         # Otherwise, perform sync
@@ -16,9 +16,12 @@
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
 from . import v1
+from . import v2
+from . import v3
+from . import v4
 
 
-SCHEMA_VERSION = 1
+SCHEMA_VERSION = 4
 
 
 def update_schema_version(db_inst):
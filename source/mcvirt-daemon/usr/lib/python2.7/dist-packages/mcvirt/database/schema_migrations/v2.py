@@ -0,0 +1,27 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+
+def migrate(db_inst):
+    """Add index for obtaining statistics for a device by date."""
+
+    # Index covers all columns, so that obtaining the latest
+    # date and statistics for a device do not read the table
+    db_inst.cursor.execute("""CREATE INDEX IF NOT EXISTS stats_device_date
+                              ON stats(device_type, device_id, stat_date,
+                                       stat_type, stat_value)""")
+    db_inst.cursor.execute("""ANALYZE stats""")
@@ -0,0 +1,43 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+
+def migrate(db_inst):
+    """Add tables for statistics rollups and enable incremental vacuum."""
+
+    # Aggregated statistics for each resolution, where stat_date is
+    # the start of the period
+    db_inst.cursor.execute("""CREATE TABLE stats_rollup(
+                                  resolution INT, device_type INT, device_id VARCHAR,
+                                  stat_date INT, stat_type INT,
+                                  stat_min REAL, stat_avg REAL, stat_max REAL,
+                                  stat_count INT,
+                                  PRIMARY KEY (resolution, device_type, device_id,
+                                               stat_date, stat_type)
+                              ) WITHOUT ROWID""")
+
+    # End date of the last period that has been aggregated for each resolution
+    db_inst.cursor.execute("""CREATE TABLE stats_rollup_state(
+                                  resolution INT PRIMARY KEY, rollup_date INT
+                              )""")
+
+    # Index for removing statistics past the retention period
+    db_inst.cursor.execute("""CREATE INDEX IF NOT EXISTS stats_date ON stats(stat_date)""")
+
+    # Enable incremental vacuum, which requires the database to be rebuilt
+    db_inst.cursor.execute("""PRAGMA auto_vacuum=INCREMENTAL""")
+    db_inst.cursor.execute("""VACUUM""")
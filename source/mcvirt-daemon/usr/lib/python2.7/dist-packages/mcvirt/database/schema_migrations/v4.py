@@ -0,0 +1,38 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+
+def migrate(db_inst):
+    """Add tables for tracking devices with statistics to be synced."""
+
+    # Sequence number of the last change to the statistics of each device
+    db_inst.cursor.execute("""CREATE TABLE stats_device_state(
+                                  device_type INT, device_id VARCHAR, change_seq INT,
+                                  PRIMARY KEY (device_type, device_id)
+                              ) WITHOUT ROWID""")
+    db_inst.cursor.execute("""CREATE INDEX IF NOT EXISTS stats_device_state_change_seq
+                              ON stats_device_state(change_seq)""")
+
+    # Change sequence number that each remote node has been synced up to
+    db_inst.cursor.execute("""CREATE TABLE stats_sync_state(
+                                  node VARCHAR PRIMARY KEY, change_seq INT
+                              )""")
+
+    # Mark all existing devices as changed, so that they are
+    # checked during the first sync to each node
+    db_inst.cursor.execute("""INSERT INTO stats_device_state(device_type, device_id, change_seq)
+                              SELECT DISTINCT device_type, device_id, 1 FROM stats""")
@@ -0,0 +1,148 @@
+"""Provide in-memory buffers of recent statistics."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+from array import array
+from threading import Lock
+import time
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+
+
+class StatisticsRingBuffer(object):
+    """Fixed-size buffer of the most recent values of a statistic,
+    overwriting the oldest value once full.
+    """
+
+    def __init__(self, size):
+        """Allocate arrays for statistic dates and values."""
+        self.size = size
+        self.dates = array('d', [0.0]) * size
+        self.values = array('d', [0.0]) * size
+        self.count = 0
+        self.lock = Lock()
+
+    def append(self, stat_date, value):
+        """Add a value to the buffer, storing missing values as NaN."""
+        with self.lock:
+            index = self.count % self.size
+            self.dates[index] = float(stat_date)
+            self.values[index] = float('nan') if value is None else float(value)
+            self.count += 1
+
+    def _get_indexes(self):
+        """Return indexes of values in the buffer, oldest first.
+
+        Must be called whilst holding the lock.
+        """
+        if self.count <= self.size:
+            return range(self.count)
+        start = self.count % self.size
+        return range(start, self.size) + range(start)
+
+    def get_last(self, count):
+        """Return the dates and values of the last N values, oldest first,
+        with missing values as None.
+        """
+        with self.lock:
+            indexes = self._get_indexes()[-count:] if count > 0 else []
+            return ([self.dates[index] for index in indexes],
+                    [None if self.values[index] != self.values[index] else self.values[index]
+                     for index in indexes])
+
+    def get_average(self, period, now=None):
+        """Return the average of the values within a period (seconds)
+        before the current time, or None if there are no values.
+        """
+        from_date = (time.time() if now is None else now) - period
+        total = 0.0
+        count = 0
+        with self.lock:
+            for index in reversed(self._get_indexes()):
+                if self.dates[index] < from_date:
+                    break
+                # Skip missing values (NaN)
+                if self.values[index] == self.values[index]:
+                    total += self.values[index]
+                    count += 1
+        return total / count if count else None
+
+
+class StatisticsBuffer(PyroObject):
+    """Hold ring buffers of the most recent statistics gathered for each
+    device and stat type on the local node.
+    """
+
+    # Number of values retained for each device and stat type
+    BUFFER_SIZE = 360
+
+    def __init__(self):
+        """Create dict of (device_type, device_id, stat_type) -> buffer."""
+        self.buffers = {}
+        self.lock = Lock()
+
+    def add_statistics(self, rows):
+        """Add statistics, each being a tuple of
+        (device_type, device_id, stat_type, stat_value, stat_date).
+        """
+        for device_type, device_id, stat_type, stat_value, stat_date in rows:
+            self._get_buffer(device_type, device_id, stat_type, create=True).append(
+                stat_date, stat_value)
+
+    def _get_buffer(self, device_type, device_id, stat_type, create=False):
+        """Return the buffer for a device and stat type."""
+        key = (device_type, device_id, stat_type)
+        with self.lock:
+            if key not in self.buffers and create:
+                self.buffers[key] = StatisticsRingBuffer(self.BUFFER_SIZE)
+            return self.buffers.get(key)
+
+    def remove_device(self, device_id):
+        """Remove the buffers for a device, including the buffers for
+        disks and interfaces of the device, which have a device ID of
+        <device ID>:<name>.
+        """
+        with self.lock:
+            for key in [key for key in self.buffers
+                        if key[1] == device_id or key[1].startswith('%s:' % device_id)]:
+                del self.buffers[key]
+
+    @Expose()
+    def get_last_statistics(self, device_type, device_id, stat_type, count):
+        """Return the dates and values of the last N statistics for a device
+        and stat type, as [[dates], [values]], oldest first.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        stat_buffer = self._get_buffer(device_type, device_id, stat_type)
+        if stat_buffer is None:
+            return [[], []]
+        return list(stat_buffer.get_last(int(count)))
+
+    @Expose()
+    def get_average_statistic(self, device_type, device_id, stat_type, period):
+        """Return the average value of a statistic for a device over a
+        period (seconds) before the current time, or None if there are
+        no values.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        stat_buffer = self._get_buffer(device_type, device_id, stat_type)
+        if stat_buffer is None:
+            return None
+        return stat_buffer.get_average(int(period))
@@ -927,6 +927,12 @@ class UnknownAgentCommandRun(MCVirtException):
     pass
 
 
+class AgentCommandFailedError(MCVirtException):
+    """Agent returned an error whilst running a command."""
+
+    pass
+
+
 class TaskSchedulerConflictError(MCVirtException):
     """Task scheduler suffered a conflict with another node"""
 
@@ -945,6 +951,30 @@ class MemballooningNotEnabledError(MCVirtException):
     pass
 
 
+class ConfigDeltaConflictException(MCVirtException):
+    """Config does not match the base config of a delta."""
+
+    pass
+
+
+class InvalidConfigDeltaException(MCVirtException):
+    """Config delta modifies config outside of its sub-trees."""
+
+    pass
+
+
+class InvalidStatisticsRetentionException(MCVirtException):
+    """Statistics retention period is not valid."""
+
+    pass
+
+
+class InvalidStatisticsQueryException(MCVirtException):
+    """Statistics query parameters are not valid."""
+
+    pass
+
+
 for exception_class in get_all_submodules(MCVirtException):
     Pyro4.util.all_exceptions[
         '%s.%s' % (exception_class.__module__, exception_class.__name__)
@@ -86,15 +86,13 @@ class LdapFactory(PyroObject):
         def update_config(config):
             """Enable LDAP in MCVirt config."""
             config['ldap']['enabled'] = enable
-        MCVirtConfig().update_config(update_config, 'Updated LDAP status')
 
+        # Replicate the change to the LDAP config to remote nodes
         if self.po__is_cluster_master:
-            def remote_command(node_connection):
-                """Enable ldap on a remote node."""
-                remote_ldap_factory = node_connection.get_connection('ldap_factory')
-                remote_ldap_factory.set_enable(enable)
-            cluster = self.po__get_registered_object('cluster')
-            cluster.run_remote_command(remote_command)
+            MCVirtConfig().update_cluster_config(
+                update_config, ['ldap'], 'Updated LDAP status')
+        else:
+            MCVirtConfig().update_config(update_config, 'Updated LDAP status')
 
     def get_user_filter(self, username=None):
         """Determine a search filter based on user filtering and custom search filter."""
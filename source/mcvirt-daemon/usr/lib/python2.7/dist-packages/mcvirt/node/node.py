@@ -26,12 +26,40 @@ from mcvirt.rpc.expose_method import Expose
 from mcvirt.version import VERSION
 from mcvirt.argument_validator import ArgumentValidator
 from mcvirt.system import System
-from mcvirt.constants import DirectoryLocation
+from mcvirt.constants import DirectoryLocation, StatisticsResolution
+from mcvirt.exceptions import InvalidStatisticsRetentionException
+from mcvirt.syslogger import Syslogger
 
 
 class Node(PyroObject):
     """Provides methods to configure the local node."""
 
+    def initialise(self):
+        """Repair any config permissions that were modified whilst
+        the daemon was not running.
+        """
+        self._audit_config_permissions(repair=True)
+
+    @Expose(locking=True)
+    def audit_config_permissions(self, repair=False):
+        """Check the permissions of all configuration files and directories
+        on the node, returning the changes required for each path.
+        If repair is True, the changes are made.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.MANAGE_NODE)
+
+        ArgumentValidator.validate_boolean(repair)
+
+        return self._audit_config_permissions(repair=repair)
+
+    def _audit_config_permissions(self, repair):
+        """Audit config permissions, logging the changes required."""
+        changes = MCVirtConfig.audit_permissions(repair=repair)
+        for path in sorted(changes.keys()):
+            Syslogger.logger().warning('%s config permissions on %s: %s' % (
+                'Repaired' if repair else 'Incorrect', path, ', '.join(changes[path])))
+        return changes
+
     @Expose()
     def get_listen_ports(self):
         return self._get_listen_ports(include_remote=False)
@@ -65,6 +93,53 @@ class Node(PyroObject):
         mcvirt_config.update_config(update_config, 'Set node cluster IP address to %s' %
                                     ip_address)
 
+    @Expose(locking=True)
+    def set_sharded_config_storage(self, enabled):
+        """Set whether virtual machine, hard drive and storage backend
+        configs are stored in individual files on the local node.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.MANAGE_NODE)
+
+        ArgumentValidator.validate_boolean(enabled)
+
+        def update_config(config):
+            """Update sharded storage in MCVirt config."""
+            config['sharded_storage'] = enabled
+        MCVirtConfig().update_config(update_config, '%s sharded config storage' %
+                                     ('Enabled' if enabled else 'Disabled'))
+
+    @Expose(locking=True)
+    def set_statistics_retention(self, resolution, retention):
+        """Set the retention period (seconds) for raw statistics ('raw') or a
+        statistics rollup resolution ('minute', 'hour' or 'day').
+        A retention of None retains the statistics indefinitely.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.MANAGE_NODE)
+
+        resolutions = [resolution_itx.name.lower() for resolution_itx in StatisticsResolution]
+        if resolution not in resolutions:
+            raise InvalidStatisticsRetentionException(
+                'Resolution must be one of: %s' % ', '.join(resolutions))
+        if retention is not None:
+            ArgumentValidator.validate_positive_integer(retention)
+            retention = int(retention)
+
+            # Ensure that statistics are retained for long enough to be
+            # aggregated into the next resolution
+            resolution_index = resolutions.index(resolution)
+            if resolution_index + 1 < len(resolutions):
+                next_resolution = StatisticsResolution[resolutions[resolution_index + 1].upper()]
+                if retention < (next_resolution.value * 2):
+                    raise InvalidStatisticsRetentionException(
+                        'Retention for %s statistics must be at least %s seconds' %
+                        (resolution, next_resolution.value * 2))
+
+        def update_config(config):
+            """Update statistics retention in MCVirt config."""
+            config['statistics']['retention'][resolution] = retention
+        MCVirtConfig().update_config(update_config, 'Set %s statistics retention to %s' %
+                                     (resolution, retention))
+
     @Expose()
     def get_version(self):
         """Return the version of the running daemon."""
@@ -55,6 +55,7 @@ from mcvirt.parser_modules.drbd_parser import DrbdParser
 from mcvirt.parser_modules.virtual_machine.backup_parser import BackupParser
 from mcvirt.parser_modules.virtual_machine.lock_parser import LockParser
 from mcvirt.parser_modules.watchdog_parser import WatchdogParser
+from mcvirt.parser_modules.statistics_parser import StatisticsParser
 
 
 class ThrowingArgumentParser(argparse.ArgumentParser):
@@ -198,6 +199,9 @@ class Parser(object):
         # Create sub-parser for managing VM locks
         LockParser(self.subparsers, self.parent_parser)
 
+        # Create sub-parser for displaying statistics
+        StatisticsParser(self.subparsers, self.parent_parser)
+
         self.exit_parser = self.subparsers.add_parser('exit', help='Exits the MCVirt shell',
                                                       parents=[self.parent_parser])
 
@@ -43,6 +43,7 @@ class ClusterParser(object):
         self.register_get_connect_string()
         self.register_add()
         self.register_remove()
+        self.register_check_config()
 
     def register_get_connect_string(self):
         """Register get connect string parser."""
@@ -105,3 +106,28 @@ class ClusterParser(object):
         cluster_object = p_.rpc.get_connection('cluster')
         cluster_object.remove_node(args.node)
         p_.print_status('Successfully removed node %s' % args.node)
+
+    def register_check_config(self):
+        """Register parser for checking config consistency."""
+        self.check_config_parser = self.subparser.add_parser(
+            'check-config',
+            help='Compares the configuration of all nodes in the MCVirt cluster',
+            parents=[self.parent_parser]
+        )
+        self.check_config_parser.set_defaults(func=self.handle_check_config)
+
+    def handle_check_config(self, p_, args):
+        """Handle check config."""
+        cluster_object = p_.rpc.get_connection('cluster')
+        results = cluster_object.check_config_consistency()
+        consistent = True
+        for node in sorted(results.keys()):
+            if results[node]['error']:
+                consistent = False
+                p_.print_status('%s: Unable to compare configuration: %s' %
+                                (node, results[node]['error']))
+            for key in results[node]['differences']:
+                consistent = False
+                p_.print_status('%s: %s' % (node, key))
+        if consistent:
+            p_.print_status('Configuration is consistent across all nodes')
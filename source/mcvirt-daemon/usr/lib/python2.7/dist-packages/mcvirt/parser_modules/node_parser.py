@@ -52,6 +52,16 @@ class NodeParser(object):
                                                action='store_true',
                                                help='Return the current autostart interval.')
 
+        self.node_statistics_parser = self.parser.add_argument_group(
+            'Statistics', 'Configure the statistics stored on the node'
+        )
+        self.node_statistics_parser.add_argument(
+            '--set-statistics-retention', dest='statistics_retention', nargs=2,
+            metavar=('raw|minute|hour|day', 'Retention (Seconds)|none'),
+            help=('Set the period that raw statistics or statistics aggregated '
+                  'by minute, hour or day are retained for. Setting to \'none\' '
+                  'will retain the statistics indefinitely.'))
+
         self.node_cluster_config = self.parser.add_argument_group(
             'Cluster', 'Configure the node-specific cluster configurations'
         )
@@ -61,6 +71,31 @@ class NodeParser(object):
                                                     ' for the local node,'
                                                     ' used for Drbd and cluster management.'))
 
+        self.node_config_storage = self.parser.add_argument_group(
+            'Config storage', 'Configure how the node configuration is stored'
+        )
+        self.sharded_storage_mutual_group = self.node_config_storage.add_mutually_exclusive_group(
+            required=False
+        )
+        self.sharded_storage_mutual_group.add_argument(
+            '--enable-sharded-config', dest='sharded_config_enable',
+            action='store_true',
+            help=('Store virtual machine, hard drive and storage backend '
+                  'configurations in individual files'))
+        self.sharded_storage_mutual_group.add_argument(
+            '--disable-sharded-config', dest='sharded_config_disable',
+            action='store_true',
+            help=('Store virtual machine, hard drive and storage backend '
+                  'configurations in the main configuration file'))
+        self.node_config_storage.add_argument(
+            '--audit-config-permissions', dest='audit_config_permissions',
+            action='store_true',
+            help='Report configuration files and directories with incorrect permissions')
+        self.node_config_storage.add_argument(
+            '--repair-config-permissions', dest='repair_config_permissions',
+            action='store_true',
+            help='Correct the permissions of configuration files and directories')
+
         self.ldap_parser = self.parser.add_argument_group(
             'Ldap', 'Configure the LDAP authentication backend'
         )
@@ -166,6 +201,27 @@ class NodeParser(object):
             node.set_cluster_ip_address(args.ip_address)
             p_.print_status('Successfully set cluster IP address to %s' % args.ip_address)
 
+        if args.sharded_config_enable:
+            node.set_sharded_config_storage(True)
+            p_.print_status('Enabled sharded config storage')
+        elif args.sharded_config_disable:
+            node.set_sharded_config_storage(False)
+            p_.print_status('Disabled sharded config storage')
+
+        if args.statistics_retention:
+            resolution, retention = args.statistics_retention
+            retention = None if retention.lower() == 'none' else retention
+            node.set_statistics_retention(resolution, retention)
+            p_.print_status('Set %s statistics retention to %s' % (resolution, retention))
+
+        if args.audit_config_permissions or args.repair_config_permissions:
+            repair = bool(args.repair_config_permissions)
+            changes = node.audit_config_permissions(repair)
+            for path in sorted(changes.keys()):
+                p_.print_status('%s: %s' % (path, ', '.join(changes[path])))
+            p_.print_status('%s %s path(s) with incorrect permissions' % (
+                'Repaired' if repair else 'Found', len(changes)))
+
         if args.autostart_interval or args.autostart_interval == 0:
             autostart_watchdog = p_.rpc.get_connection('autostart_watchdog')
             autostart_watchdog.set_autostart_interval(args.autostart_interval)
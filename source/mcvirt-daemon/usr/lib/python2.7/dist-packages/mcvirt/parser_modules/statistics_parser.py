@@ -0,0 +1,160 @@
+"""Provides watchdog management parser parser."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+from datetime import datetime
+import time
+
+from texttable import Texttable
+
+from mcvirt.constants import (StatisticsDeviceType, HostStatisticsStatType,
+                              VirtualMachineStatisticsStatType,
+                              DiskStatisticsStatType, InterfaceStatisticsStatType)
+from mcvirt.exceptions import ArgumentParserException
+
+
+class StatisticsParser(object):
+    """Handle statistics parser."""
+
+    AGGREGATES = ['avg', 'min', 'max', 'p95', 'last']
+
+    # Device type and stat types for each combination of whether virtual
+    # machines are being queried and the type of device
+    DEVICE_TYPES = {
+        (True, None): (StatisticsDeviceType.VIRTUAL_MACHINE,
+                       VirtualMachineStatisticsStatType),
+        (True, 'disk'): (StatisticsDeviceType.VIRTUAL_MACHINE_DISK, DiskStatisticsStatType),
+        (True, 'interface'): (StatisticsDeviceType.VIRTUAL_MACHINE_INTERFACE,
+                              InterfaceStatisticsStatType),
+        (False, None): (StatisticsDeviceType.HOST, HostStatisticsStatType),
+        (False, 'cpu'): (StatisticsDeviceType.HOST_CPU, HostStatisticsStatType),
+        (False, 'disk'): (StatisticsDeviceType.HOST_DISK, HostStatisticsStatType),
+        (False, 'interface'): (StatisticsDeviceType.HOST_INTERFACE, HostStatisticsStatType)
+    }
+
+    def __init__(self, subparser, parent_parser):
+        """Create subparser for querying statistics."""
+        self.parent_subparser = subparser
+        self.parent_parser = parent_parser
+
+        self.parser = self.parent_subparser.add_parser(
+            'statistics', help='Display statistics for virtual machines and nodes',
+            parents=[self.parent_parser])
+        self.parser.set_defaults(func=self.handle_statistics)
+
+        self.device_mutual_group = self.parser.add_mutually_exclusive_group(required=True)
+        self.device_mutual_group.add_argument(
+            '--virtual-machine-name', '--vm-name', dest='vm_names', metavar='VM Name',
+            action='append', help='Virtual machine to display statistics for')
+        self.device_mutual_group.add_argument(
+            '--node', dest='nodes', metavar='Node', action='append',
+            help='Node to display statistics for')
+        self.parser.add_argument(
+            '--stat-type', dest='stat_types', metavar='Stat type', action='append',
+            choices=sorted(set([stat_type.name.lower()
+                                for _, stat_type_enum in self.DEVICE_TYPES.values()
+                                for stat_type in stat_type_enum])),
+            help='Statistic to display (default all)')
+        self.parser.add_argument(
+            '--device-type', dest='device_type', metavar='Device type',
+            choices=['cpu', 'disk', 'interface'], default=None,
+            help=('Display statistics for a CPU core, disk or network interface '
+                  'of the virtual machines or nodes'))
+        self.parser.add_argument(
+            '--device', dest='device_names', metavar='Device', action='append',
+            help=('Name of the device to display statistics for, such as cpu0, '
+                  'vda, net0, sda or eth0'))
+        self.parser.add_argument(
+            '--period', dest='period', metavar='Period (seconds)', type=int, default=3600,
+            help='Period before the end date to display statistics for (default 3600)')
+        self.parser.add_argument(
+            '--end', dest='end_date', metavar='End date (epoch seconds)', type=int,
+            default=None, help='End of the period to display (default now)')
+        self.parser.add_argument(
+            '--bucket-width', dest='bucket_width', metavar='Bucket width (seconds)',
+            type=int, default=None,
+            help='Period (seconds) that statistics are aggregated over')
+        self.parser.add_argument(
+            '--aggregate', dest='aggregates', action='append', choices=self.AGGREGATES,
+            help='Aggregate function to display (default avg)')
+
+    def handle_statistics(self, p_, args):
+        """Handle statistics query."""
+        if bool(args.device_type) != bool(args.device_names):
+            raise ArgumentParserException(
+                '--device-type and --device must be specified together')
+        if (bool(args.vm_names), args.device_type) not in self.DEVICE_TYPES:
+            raise ArgumentParserException(
+                'Statistics are not gathered for %s devices of virtual machines' %
+                args.device_type)
+        device_type, stat_type_enum = self.DEVICE_TYPES[(bool(args.vm_names),
+                                                         args.device_type)]
+
+        # Dict of device ID -> name of VM or node
+        if args.vm_names:
+            vm_factory = p_.rpc.get_connection('virtual_machine_factory')
+            owners = {}
+            for vm_name in args.vm_names:
+                virtual_machine = vm_factory.get_virtual_machine_by_name(vm_name)
+                p_.rpc.annotate_object(virtual_machine)
+                owners[virtual_machine.get_id()] = vm_name
+        else:
+            owners = {node: node for node in args.nodes}
+
+        # Dict of device ID -> device name, where device IDs of CPU cores,
+        # disks and interfaces are prefixed with the ID of the VM or node
+        if args.device_names:
+            devices = {'%s:%s' % (owner_id, device_name): '%s:%s' % (owner_name, device_name)
+                       for owner_id, owner_name in owners.items()
+                       for device_name in args.device_names}
+        else:
+            devices = owners
+
+        stat_types = None
+        if args.stat_types:
+            invalid_stat_types = [stat_type for stat_type in args.stat_types
+                                  if stat_type.upper() not in stat_type_enum.__members__]
+            if invalid_stat_types:
+                raise ArgumentParserException(
+                    'Invalid stat type(s) for %s%s: %s' % (
+                        '%s devices of ' % args.device_type if args.device_type else '',
+                        'virtual machines' if args.vm_names else 'nodes',
+                        ', '.join(invalid_stat_types)))
+            stat_types = [stat_type_enum[stat_type.upper()].value
+                          for stat_type in args.stat_types]
+
+        end_date = args.end_date or int(time.time())
+        database_factory = p_.rpc.get_connection('database_factory')
+        result = database_factory.query_statistics(
+            [[device_type.value, device_id] for device_id in devices],
+            end_date - args.period, end_date, stat_types=stat_types,
+            bucket_width=args.bucket_width, aggregates=args.aggregates)
+
+        table = Texttable()
+        table.set_deco(Texttable.HEADER | Texttable.VLINES)
+        table.header(tuple(['Date', 'Device', 'Statistic'] + result['aggregates']))
+        for series in result['series']:
+            for index, date in enumerate(series['dates']):
+                table.add_row(tuple(
+                    [datetime.fromtimestamp(date).strftime('%Y-%m-%d %H:%M:%S'),
+                     devices[series['device_id']],
+                     stat_type_enum(series['stat_type']).name.lower()] +
+                    [series[aggregate][index] for aggregate in result['aggregates']]))
+        p_.print_status(table.draw())
+        p_.print_status('Bucket width: %ss, resolution: %s' % (
+            result['bucket_width'], result['resolution'].lower()))
@@ -146,6 +146,12 @@ class UpdateParser(object):
             '--disable-memballoon-deflation', dest='disable_memballoon_deflation',
             action='store_true',
             help='Disable VM memory balloon deflation.')
+        self.update_parser.add_argument(
+            '--agent-telemetry-interval', dest='agent_telemetry_interval',
+            metavar='Interval (seconds)|none',
+            help=('Set the interval that the agent pushes guest statistics to the host, '
+                  'rather than being polled for them. Setting to \'none\' will poll '
+                  'the agent.'))
 
     def handle_update(self, p_, args):
         """Handle VM update."""
@@ -251,4 +257,10 @@ class UpdateParser(object):
             vm_object.disable_delete_protection(args.disable_delete_protection)
 
         if args.enable_memballoon_deflation or args.disable_memballoon_deflation:
-            vm_object.set_memballoon_deflation_state(args.enable_memballoon_deflation)
\ No newline at end of file
+            vm_object.set_memballoon_deflation_state(args.enable_memballoon_deflation)
+
+        if args.agent_telemetry_interval:
+            interval = args.agent_telemetry_interval
+            interval = None if interval.lower() == 'none' else interval
+            vm_object.set_agent_telemetry_interval(interval)
+            p_.print_status('Set agent telemetry interval to %s' % interval)
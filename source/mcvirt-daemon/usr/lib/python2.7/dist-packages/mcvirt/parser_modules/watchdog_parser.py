@@ -17,6 +17,8 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
+from texttable import Texttable
+
 
 class WatchdogParser(object):
     """Handle watchdog management parser."""
@@ -39,6 +41,8 @@ class WatchdogParser(object):
         self.register_set_interval()
         self.register_set_reset_fail_count()
         self.register_set_boot_wait()
+        self.register_agent_latency()
+        self.register_check()
 
     def register_enable(self):
         """Register enable parser."""
@@ -188,3 +192,63 @@ class WatchdogParser(object):
                 p_.print_status(
                     'Set watchdog bot wait period to %s for VM: %s' %
                     (wait_time, virtual_machine.get_name()))
+
+    def register_agent_latency(self):
+        """Register agent latency parser."""
+        self.agent_latency_parser = self.subparser.add_parser(
+            'agent-latency', help=('Show round-trip latency of agent commands '
+                                   'for VMs on the local node'),
+            parents=[self.parent_parser])
+        self.agent_latency_parser.add_argument('--virtual-machine-name', '--vm-name',
+                                               default=None, dest='vm_name', metavar='VM Name')
+        self.agent_latency_parser.set_defaults(func=self.handle_agent_latency)
+
+    def handle_agent_latency(self, p_, args):
+        """Handle agent latency."""
+        agent_session_manager = p_.rpc.get_connection('agent_session_manager')
+        histograms = agent_session_manager.get_latency_histograms(args.vm_name)
+        vm_names = sorted(histograms.keys())
+        if not vm_names:
+            p_.print_status('No agent commands have been run')
+            return
+
+        table = Texttable()
+        table.set_deco(Texttable.HEADER | Texttable.VLINES)
+        table.header(['Latency'] + vm_names)
+        buckets = histograms[vm_names[0]]['buckets']
+        for index, (upper_bound, _) in enumerate(buckets):
+            if upper_bound is None:
+                label = '> %sms' % buckets[index - 1][0]
+            else:
+                label = '<= %sms' % upper_bound
+            table.add_row([label] + [histograms[vm_name]['buckets'][index][1]
+                                     for vm_name in vm_names])
+        for label, key in [('Timeouts', 'timeout_count'),
+                           ('Errors', 'error_count'),
+                           ('Connections', 'connect_count')]:
+            table.add_row([label] + [histograms[vm_name][key] for vm_name in vm_names])
+        p_.print_status(table.draw())
+
+    def register_check(self):
+        """Register agent check parser."""
+        self.check_parser = self.subparser.add_parser(
+            'check', help='Ping the agents of all VMs running on the local node',
+            parents=[self.parent_parser])
+        self.check_parser.set_defaults(func=self.handle_check)
+
+    def handle_check(self, p_, args):
+        """Handle agent check."""
+        watchdog_factory = p_.rpc.get_connection('watchdog_factory')
+        results = watchdog_factory.check_agents()
+        if not results:
+            p_.print_status('No VMs are running on the local node')
+            return
+
+        table = Texttable()
+        table.set_deco(Texttable.HEADER | Texttable.VLINES)
+        table.header(['VM', 'Response time'])
+        for vm_name in sorted(results.keys()):
+            response_time = results[vm_name]
+            table.add_row([vm_name, 'No response' if response_time is None
+                           else '%.1fms' % response_time])
+        p_.print_status(table.draw())
@@ -57,8 +57,16 @@ from mcvirt.exceptions import AuthenticationError
 from mcvirt.rpc.expose_method import Expose
 from mcvirt.thread.auto_start_watchdog import AutoStartWatchdog
 from mcvirt.thread.watchdog import WatchdogFactory
-from mcvirt.thread.virtual_machine_statistics import VirtualMachineStatisticsFactory
+from mcvirt.thread.virtual_machine_statistics import (VirtualMachineStatisticsFactory,
+                                                     DomainStatisticsCollector)
 from mcvirt.thread.host_statistics import HostStatistics
+from mcvirt.thread.git_history import GitHistory
+from mcvirt.thread.statistics_rollup import StatisticsRollup
+from mcvirt.thread.statistics_writer import StatisticsWriter
+from mcvirt.thread.scheduler import Scheduler
+from mcvirt.database.statistics_buffer import StatisticsBuffer
+from mcvirt.virtual_machine.agent_session import AgentSessionManager
+from mcvirt.virtual_machine.agent_reactor import AgentReactor
 
 
 class BaseRpcDaemon(Pyro4.Daemon):
@@ -357,11 +365,19 @@ class RpcNSMixinDaemon(object):
             [HardDriveConfig, 'hard_drive_config'],
             [VirtualMachineConfig, 'virtual_machine_config'],
             [Session(), 'mcvirt_session'],
+            [Scheduler.get_instance(), 'scheduler'],
             [StatisticsSync(), 'statistics_sync'],
+            [StatisticsWriter(), 'statistics_writer'],
+            [StatisticsBuffer(), 'statistics_buffer'],
+            [AgentReactor(), 'agent_reactor'],
+            [AgentSessionManager(), 'agent_session_manager'],
             [WatchdogFactory(), 'watchdog_factory'],
             [VirtualMachineStatisticsFactory(), 'virtual_machine_statistics_factory'],
+            [DomainStatisticsCollector(), 'domain_statistics_collector'],
             [HostStatistics(), 'host_statistics'],
-            [AutoStartWatchdog(), 'autostart_watchdog']
+            [AutoStartWatchdog(), 'autostart_watchdog'],
+            [GitHistory(), 'git_history'],
+            [StatisticsRollup(), 'statistics_rollup']
         ]
         for factory_object, name in registration_factories:
             try:
@@ -385,6 +401,20 @@ class RpcNSMixinDaemon(object):
             RpcNSMixinDaemon.DAEMON.registered_factories['autostart_watchdog'])
         self.timer_objects.append(
             RpcNSMixinDaemon.DAEMON.registered_factories['host_statistics'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['domain_statistics_collector'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['git_history'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['statistics_rollup'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['statistics_writer'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['agent_session_manager'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['agent_reactor'])
+        self.timer_objects.append(
+            RpcNSMixinDaemon.DAEMON.registered_factories['scheduler'])
 
     def obtain_connection(self):
         """Attempt to obtain a connection to the name server."""
@@ -18,6 +18,7 @@
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
 from mcvirt.config.storage import Storage as StorageConfig
+from mcvirt.config.virtual_machine_index import VirtualMachineIndex
 from mcvirt.rpc.pyro_object import PyroObject
 from mcvirt.rpc.expose_method import Expose, Transaction
 from mcvirt.auth.permissions import PERMISSIONS
@@ -361,10 +362,9 @@ class Base(PyroObject):
         #  - Use this storage backend; and
         #  - This node is one of the available nodes
         virtual_machine_factory = self.po__get_registered_object('virtual_machine_factory')
-        for virtual_machine in virtual_machine_factory.get_all_virtual_machines():
-            used_storage_backends = [hdd.storage_backend
-                                     for hdd in virtual_machine.get_hard_drive_objects()]
-            if (self in used_storage_backends and virtual_machine.is_static() and
+        for vm_id in VirtualMachineIndex.get_ids_by_storage_backend(self.id_):
+            virtual_machine = virtual_machine_factory.get_virtual_machine_by_id(vm_id)
+            if (virtual_machine.is_static() and
                     node_name in virtual_machine.get_available_nodes()):
                 raise NodeUsedByStaticVirtualMachine(
                     'Storage backend on node is used by static virtual machines')
@@ -437,20 +437,11 @@ class Base(PyroObject):
 
     def in_use(self, node=None):
         """Whether the storage backend is used for any disks objects."""
-        # Get VM factory
-        virtual_machine_factory = self.po__get_registered_object('virtual_machine_factory')
-
-        # Iterate over all virtual machine and hard drive objects
-        for virtual_machine in virtual_machine_factory.get_all_virtual_machines(node=node):
-            for hard_drive in virtual_machine.get_hard_drive_objects():
-
-                # If the hard drive object uses the current storage backend,
-                # return True
-                if hard_drive.storage_backend == self:
-                    return True
-
-        # If no matches have been found, return False
-        return False
+        # Obtain VMs with hard drives that use the storage backend from the VM index
+        vm_ids = set(VirtualMachineIndex.get_ids_by_storage_backend(self.id_))
+        if node is not None:
+            vm_ids &= set(VirtualMachineIndex.get_ids_by_node(node))
+        return bool(vm_ids)
 
     def get_location(self, node=None, return_default=False):
         """Return the location for a given node, default to local node."""
@@ -0,0 +1,190 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import copy
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.config.replication import ConfigDelta, ConfigReplication
+from mcvirt.exceptions import ConfigDeltaConflictException, InvalidConfigDeltaException
+
+
+class RemoteConfig(object):
+    """Config object of a remote node, which records the updates it receives."""
+
+    def __init__(self, config):
+        """Store config of remote node."""
+        self.config = config
+        self.deltas = []
+        self.full_configs = []
+
+    def apply_config_delta(self, subtrees, base_hash, delta, reason=''):
+        """Apply delta, if the sub-trees match the base config."""
+        ConfigDelta.assert_within_subtrees(delta, subtrees)
+        subtree_config = ConfigReplication.get_subtrees(self.config, subtrees)
+        if ConfigDelta.get_hash(subtree_config) != base_hash:
+            raise ConfigDeltaConflictException('Config does not match base config of delta')
+        self.deltas.append(delta)
+        ConfigDelta.apply(self.config, delta)
+
+    def set_config_subtrees(self, subtree_config, reason=''):
+        """Replace sub-trees."""
+        self.full_configs.append(subtree_config)
+        self.config.update(copy.deepcopy(subtree_config))
+
+
+class RemoteNode(object):
+    """Remote node, providing a connection to its config object."""
+
+    name = 'remote'
+
+    def __init__(self, config):
+        """Create remote config object."""
+        self.mcvirt_config = RemoteConfig(config)
+
+    def get_connection(self, object_name):
+        """Return the remote config object."""
+        return self.mcvirt_config
+
+
+class ConfigDeltaTests(TestBase):
+    """Provides unit tests for config deltas and replication of config sub-trees."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the config delta tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(ConfigDeltaTests('test_create_unchanged'))
+        suite.addTest(ConfigDeltaTests('test_create'))
+        suite.addTest(ConfigDeltaTests('test_apply'))
+        suite.addTest(ConfigDeltaTests('test_apply_copies_values'))
+        suite.addTest(ConfigDeltaTests('test_assert_within_subtrees'))
+        suite.addTest(ConfigDeltaTests('test_replicate_delta'))
+        suite.addTest(ConfigDeltaTests('test_replicate_unchanged'))
+        suite.addTest(ConfigDeltaTests('test_replicate_conflict'))
+        suite.addTest(ConfigDeltaTests('test_replicate_without_base'))
+
+        return suite
+
+    def setUp(self):
+        """Create base config."""
+        self.config = {
+            'ldap': {'enabled': False, 'server_uri': None, 'user_search': None},
+            'git': {'repo_domain': '', 'repo_path': ''},
+            'users': {'user1': {'groups': ['a', 'b']}}
+        }
+
+    def test_create_unchanged(self):
+        """Test that a delta between identical configs is empty."""
+        self.assertEqual(ConfigDelta.create(self.config, copy.deepcopy(self.config)), [])
+
+    def test_create(self):
+        """Test that a delta contains operations for only the changed keys."""
+        new_config = copy.deepcopy(self.config)
+        new_config['ldap']['enabled'] = True
+        del new_config['ldap']['user_search']
+        new_config['users']['user1']['groups'].append('c')
+        new_config['users']['user2'] = {'groups': []}
+
+        self.assertEqual(ConfigDelta.create(self.config, new_config), [
+            {'op': 'remove', 'path': ['ldap', 'user_search']},
+            {'op': 'replace', 'path': ['ldap', 'enabled'], 'value': True},
+            {'op': 'replace', 'path': ['users', 'user1', 'groups'], 'value': ['a', 'b', 'c']},
+            {'op': 'add', 'path': ['users', 'user2'], 'value': {'groups': []}}
+        ])
+
+    def test_apply(self):
+        """Test that applying a delta to the old config results in the new config."""
+        new_config = copy.deepcopy(self.config)
+        new_config['git'] = {'repo_domain': 'git.example.com'}
+        new_config['ldap']['server_uri'] = 'ldap://ldap.example.com'
+        new_config['new_subtree'] = {'key': 'value'}
+
+        config = copy.deepcopy(self.config)
+        ConfigDelta.apply(config, ConfigDelta.create(self.config, new_config))
+        self.assertEqual(config, new_config)
+
+    def test_apply_copies_values(self):
+        """Test that values applied from a delta are not shared with the delta."""
+        delta = [{'op': 'add', 'path': ['users', 'user2'], 'value': {'groups': []}}]
+        ConfigDelta.apply(self.config, delta)
+        self.config['users']['user2']['groups'].append('a')
+        self.assertEqual(delta[0]['value'], {'groups': []})
+
+    def test_assert_within_subtrees(self):
+        """Test that deltas modifying config outside of the sub-trees are rejected."""
+        ConfigDelta.assert_within_subtrees(
+            [{'op': 'replace', 'path': ['ldap', 'enabled'], 'value': True}], ['ldap'])
+
+        for path in [['git', 'repo_domain'], []]:
+            with self.assertRaises(InvalidConfigDeltaException):
+                ConfigDelta.assert_within_subtrees(
+                    [{'op': 'replace', 'path': ['ldap', 'enabled'], 'value': True},
+                     {'op': 'replace', 'path': path, 'value': {}}],
+                    ['ldap'])
+
+    def test_replicate_delta(self):
+        """Test that only the delta is sent to a remote node that matches the base config."""
+        remote_node = RemoteNode(copy.deepcopy(self.config))
+        base_config = ConfigReplication.get_subtrees(self.config, ['ldap'])
+        config = copy.deepcopy(base_config)
+        config['ldap']['enabled'] = True
+
+        self.assertTrue(ConfigReplication.replicate(
+            remote_node, ['ldap'], base_config, config, 'Enable LDAP'))
+        self.assertEqual(remote_node.mcvirt_config.deltas,
+                         [[{'op': 'replace', 'path': ['ldap', 'enabled'], 'value': True}]])
+        self.assertEqual(remote_node.mcvirt_config.full_configs, [])
+        self.assertEqual(remote_node.mcvirt_config.config['ldap'], config['ldap'])
+
+    def test_replicate_unchanged(self):
+        """Test that nothing is sent if the sub-trees have not changed."""
+        remote_node = RemoteNode(copy.deepcopy(self.config))
+        base_config = ConfigReplication.get_subtrees(self.config, ['ldap'])
+
+        self.assertTrue(ConfigReplication.replicate(
+            remote_node, ['ldap'], base_config, copy.deepcopy(base_config), ''))
+        self.assertEqual(remote_node.mcvirt_config.deltas, [])
+        self.assertEqual(remote_node.mcvirt_config.full_configs, [])
+
+    def test_replicate_conflict(self):
+        """Test that the full sub-trees are sent if the remote
+        node does not match the base config.
+        """
+        remote_config = copy.deepcopy(self.config)
+        remote_config['ldap']['server_uri'] = 'ldap://other.example.com'
+        remote_node = RemoteNode(remote_config)
+        base_config = ConfigReplication.get_subtrees(self.config, ['ldap'])
+        config = copy.deepcopy(base_config)
+        config['ldap']['enabled'] = True
+
+        self.assertFalse(ConfigReplication.replicate(
+            remote_node, ['ldap'], base_config, config, 'Enable LDAP'))
+        self.assertEqual(remote_node.mcvirt_config.deltas, [])
+        self.assertEqual(remote_node.mcvirt_config.full_configs, [config])
+        self.assertEqual(remote_node.mcvirt_config.config['ldap'], config['ldap'])
+
+    def test_replicate_without_base(self):
+        """Test that the full sub-trees are sent if there is no base config."""
+        remote_node = RemoteNode({})
+        config = ConfigReplication.get_subtrees(self.config, ['git', 'ldap'])
+
+        self.assertFalse(ConfigReplication.replicate(
+            remote_node, ['git', 'ldap'], None, config, 'Add node'))
+        self.assertEqual(remote_node.mcvirt_config.full_configs, [config])
+        self.assertEqual(remote_node.mcvirt_config.config, config)
@@ -0,0 +1,143 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import copy
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.config.hash_tree import ConfigHashTree
+
+
+def get_hash_tree(config):
+    """Return a hash tree class built from a given config, rather than the node config."""
+    class StaticConfigHashTree(ConfigHashTree):
+        """Hash tree of a static config."""
+
+        TREE = ConfigHashTree._build(config)
+
+        @classmethod
+        def _get_tree(cls):
+            """Return the tree of the static config."""
+            return cls.TREE
+
+    return StaticConfigHashTree
+
+
+class ConfigHashTreeTests(TestBase):
+    """Provides unit tests for comparing config hash trees."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the config hash tree tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(ConfigHashTreeTests('test_get_node'))
+        suite.addTest(ConfigHashTreeTests('test_compare_identical'))
+        suite.addTest(ConfigHashTreeTests('test_compare_changed_value'))
+        suite.addTest(ConfigHashTreeTests('test_compare_added_and_removed_keys'))
+        suite.addTest(ConfigHashTreeTests('test_compare_changed_type'))
+        suite.addTest(ConfigHashTreeTests('test_compare_multiple_differences'))
+
+        return suite
+
+    def setUp(self):
+        """Create local config."""
+        self.config = {
+            'virtual_machines': {
+                'vm1': {'memory_allocation': 512, 'node': 'node1', 'available_nodes': ['node1']},
+                'vm2': {'memory_allocation': 1024, 'node': None, 'available_nodes': []}
+            },
+            'groups': {'group1': {'users': ['user1']}},
+            'superusers': ['user1']
+        }
+        self.local_tree = get_hash_tree(self.config)
+        self.requested_paths = []
+
+    def _compare(self, remote_config):
+        """Compare the local config with a remote config, recording the
+        paths of the nodes requested from the remote tree.
+        """
+        remote_tree = get_hash_tree(remote_config)
+
+        def get_remote_node(path):
+            """Return node of remote tree."""
+            self.requested_paths.append(path)
+            return remote_tree.get_node(path)
+        return self.local_tree.compare(get_remote_node)
+
+    def test_get_node(self):
+        """Test obtaining the hashes of a node and its children."""
+        root_node = self.local_tree.get_node([])
+        self.assertEqual(sorted(root_node['children'].keys()),
+                         ['groups', 'superusers', 'virtual_machines'])
+        self.assertEqual(self.local_tree.get_node(['virtual_machines'])['hash'],
+                         root_node['children']['virtual_machines'])
+        self.assertEqual(self.local_tree.get_node(['superusers'])['children'], None)
+
+        # Assert that paths that do not exist, including within
+        # values that are not dicts, return None
+        self.assertEqual(self.local_tree.get_node(['virtual_machines', 'vm3']), None)
+        self.assertEqual(self.local_tree.get_node(['superusers', 'user1']), None)
+
+    def test_compare_identical(self):
+        """Test that identical configs have no differences and only the root is compared."""
+        self.assertEqual(self._compare(copy.deepcopy(self.config)), [])
+        self.assertEqual(self.requested_paths, [[]])
+
+    def test_compare_changed_value(self):
+        """Test that a changed value is reported by its full path and
+        that sub-trees with matching hashes are not descended into.
+        """
+        remote_config = copy.deepcopy(self.config)
+        remote_config['virtual_machines']['vm1']['available_nodes'].append('node2')
+
+        self.assertEqual(self._compare(remote_config),
+                         [['virtual_machines', 'vm1', 'available_nodes']])
+        self.assertEqual(self.requested_paths,
+                         [[], ['virtual_machines'], ['virtual_machines', 'vm1'],
+                          ['virtual_machines', 'vm1', 'available_nodes']])
+
+    def test_compare_added_and_removed_keys(self):
+        """Test that keys only present on one of the nodes are reported."""
+        remote_config = copy.deepcopy(self.config)
+        del remote_config['virtual_machines']['vm2']
+        remote_config['virtual_machines']['vm3'] = {}
+        del remote_config['groups']
+
+        self.assertEqual(self._compare(remote_config),
+                         [['groups'],
+                          ['virtual_machines', 'vm2'],
+                          ['virtual_machines', 'vm3']])
+
+    def test_compare_changed_type(self):
+        """Test that a value that is a dict on only one of the nodes is reported."""
+        remote_config = copy.deepcopy(self.config)
+        remote_config['groups']['group1'] = None
+
+        self.assertEqual(self._compare(remote_config), [['groups', 'group1']])
+
+    def test_compare_multiple_differences(self):
+        """Test that all differences across sub-trees are reported."""
+        remote_config = copy.deepcopy(self.config)
+        remote_config['virtual_machines']['vm1']['node'] = 'node2'
+        remote_config['virtual_machines']['vm2']['memory_allocation'] = 2048
+        remote_config['superusers'] = []
+
+        self.assertEqual(self._compare(remote_config),
+                         [['superusers'],
+                          ['virtual_machines', 'vm1', 'node'],
+                          ['virtual_machines', 'vm2', 'memory_allocation']])
@@ -0,0 +1,196 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import copy
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.config.base import ConfigTransaction
+
+
+class MemoryConfig(object):
+    """Config object storing the config in memory, which records each write."""
+
+    config_file = '/nonexistent/config.json'
+
+    def __init__(self, config):
+        """Store config."""
+        self.config = config
+        self.writes = []
+        self.commit_messages = []
+
+    def _read_config(self):
+        """Return a copy of the stored config."""
+        return copy.deepcopy(self.config)
+
+    def _write_config(self, config):
+        """Store and record the written config."""
+        self.config = copy.deepcopy(config)
+        self.writes.append(self.config)
+
+    def gitAdd(self, message=''):
+        """Record the commit message."""
+        self.commit_messages.append(message)
+
+    def update_config(self, callback_function, reason=''):
+        """Apply an update in a transaction."""
+        with ConfigTransaction(self) as transaction:
+            transaction.apply(callback_function, reason)
+
+
+def set_value(key, value):
+    """Return a config update callback that sets a key."""
+    def update_config(config):
+        """Set key."""
+        config[key] = value
+    return update_config
+
+
+class ConfigTransactionTests(TestBase):
+    """Provides unit tests for config transactions."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the config transaction tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(ConfigTransactionTests('test_update'))
+        suite.addTest(ConfigTransactionTests('test_coalesce_updates'))
+        suite.addTest(ConfigTransactionTests('test_no_write_without_update'))
+        suite.addTest(ConfigTransactionTests('test_no_write_on_exception'))
+        suite.addTest(ConfigTransactionTests('test_get_config'))
+        suite.addTest(ConfigTransactionTests('test_nested_coalesce'))
+        suite.addTest(ConfigTransactionTests('test_nested_revert'))
+        suite.addTest(ConfigTransactionTests('test_nested_revert_without_update'))
+        suite.addTest(ConfigTransactionTests('test_nested_revert_inner_update'))
+
+        return suite
+
+    def setUp(self):
+        """Create config object."""
+        self.config_object = MemoryConfig({'a': 1, 'b': {'c': 2}})
+
+    def test_update(self):
+        """Test that an update outside of a transaction is written immediately."""
+        self.config_object.update_config(set_value('a', 2), 'Set a')
+        self.assertEqual(self.config_object.writes, [{'a': 2, 'b': {'c': 2}}])
+        self.assertEqual(self.config_object.commit_messages, ['Set a'])
+
+    def test_coalesce_updates(self):
+        """Test that updates within a transaction are written and committed once."""
+        with ConfigTransaction(self.config_object, 'Update config'):
+            self.config_object.update_config(set_value('a', 2), 'Set a')
+            self.config_object.update_config(set_value('d', 3), 'Set d')
+            self.assertEqual(self.config_object.writes, [])
+
+        self.assertEqual(self.config_object.writes, [{'a': 2, 'b': {'c': 2}, 'd': 3}])
+        self.assertEqual(self.config_object.commit_messages,
+                         ['Update config\nSet a\nSet d'])
+
+    def test_no_write_without_update(self):
+        """Test that a transaction without updates does not write the config."""
+        with ConfigTransaction(self.config_object, 'Update config'):
+            pass
+        self.assertEqual(self.config_object.writes, [])
+
+    def test_no_write_on_exception(self):
+        """Test that updates are not written if the transaction raises an exception."""
+        with self.assertRaises(ValueError):
+            with ConfigTransaction(self.config_object):
+                self.config_object.update_config(set_value('a', 2))
+                raise ValueError()
+        self.assertEqual(self.config_object.writes, [])
+        self.assertEqual(ConfigTransaction.get_active(MemoryConfig.config_file), None)
+
+    def test_get_config(self):
+        """Test that the uncommitted config is returned as a copy."""
+        with ConfigTransaction(self.config_object) as transaction:
+            self.config_object.update_config(set_value('a', 2))
+            config = transaction.get_config()
+            self.assertEqual(config, {'a': 2, 'b': {'c': 2}})
+
+            config['b']['c'] = 3
+            self.assertEqual(transaction.get_config()['b'], {'c': 2})
+
+    def test_nested_coalesce(self):
+        """Test that updates in nested transactions are written once by the outer transaction."""
+        with ConfigTransaction(self.config_object, 'Outer'):
+            with ConfigTransaction(self.config_object, 'Nested') as nested_transaction:
+                self.config_object.update_config(set_value('a', 2), 'Set a')
+                self.assertEqual(nested_transaction.get_config()['a'], 2)
+            self.config_object.update_config(set_value('d', 3), 'Set d')
+
+        self.assertEqual(self.config_object.writes, [{'a': 2, 'b': {'c': 2}, 'd': 3}])
+        self.assertEqual(self.config_object.commit_messages, ['Outer\nNested\nSet a\nSet d'])
+
+    def test_nested_revert(self):
+        """Test that updates in a failed nested transaction are reverted,
+        whilst updates of the outer transaction are written.
+        """
+        def set_nested_value(config):
+            """Modify a nested value."""
+            config['b']['c'] = 3
+
+        with ConfigTransaction(self.config_object, 'Outer'):
+            self.config_object.update_config(set_value('a', 2), 'Set a')
+            try:
+                with ConfigTransaction(self.config_object, 'Nested'):
+                    self.config_object.update_config(set_nested_value, 'Set c')
+                    raise ValueError()
+            except ValueError:
+                pass
+
+        self.assertEqual(self.config_object.writes, [{'a': 2, 'b': {'c': 2}}])
+        self.assertEqual(self.config_object.commit_messages, ['Outer\nSet a'])
+
+    def test_nested_revert_without_update(self):
+        """Test that a failed nested transaction without updates leaves the
+        outer transaction unmodified, so the config is not written.
+        """
+        with ConfigTransaction(self.config_object):
+            try:
+                with ConfigTransaction(self.config_object, 'Nested'):
+                    raise ValueError()
+            except ValueError:
+                pass
+
+        self.assertEqual(self.config_object.writes, [])
+
+    def test_nested_revert_inner_update(self):
+        """Test that a failed nested transaction reverts the updates of
+        transactions nested within it, including after the
+        innermost transaction has been reverted.
+        """
+        with ConfigTransaction(self.config_object):
+            self.config_object.update_config(set_value('a', 2), 'Set a')
+            try:
+                with ConfigTransaction(self.config_object):
+                    try:
+                        with ConfigTransaction(self.config_object):
+                            self.config_object.update_config(set_value('d', 3), 'Set d')
+                            raise ValueError()
+                    except ValueError:
+                        pass
+                    self.config_object.update_config(set_value('e', 4), 'Set e')
+                    with ConfigTransaction(self.config_object):
+                        self.config_object.update_config(set_value('f', 5), 'Set f')
+                    raise ValueError()
+            except ValueError:
+                pass
+
+        self.assertEqual(self.config_object.writes, [{'a': 2, 'b': {'c': 2}}])
+        self.assertEqual(self.config_object.commit_messages, ['Set a'])
@@ -0,0 +1,115 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.counter_rate import CounterRate
+
+
+class CounterRateTests(TestBase):
+    """Provides unit tests for conversion of counters into rates."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the counter rate tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(CounterRateTests('test_first_sample'))
+        suite.addTest(CounterRateTests('test_rate'))
+        suite.addTest(CounterRateTests('test_no_elapsed_time'))
+        suite.addTest(CounterRateTests('test_32_bit_wrap'))
+        suite.addTest(CounterRateTests('test_32_bit_reset'))
+        suite.addTest(CounterRateTests('test_reset'))
+        suite.addTest(CounterRateTests('test_64_bit_reset_below_32_bit'))
+        suite.addTest(CounterRateTests('test_generation_change'))
+        suite.addTest(CounterRateTests('test_missing_value'))
+        suite.addTest(CounterRateTests('test_remove'))
+
+        return suite
+
+    def setUp(self):
+        """Create counter rate object."""
+        self.counter_rate = CounterRate()
+
+    def test_first_sample(self):
+        """Test that no rate is returned for the first sample of a counter."""
+        self.assertEqual(self.counter_rate.get_rate('counter', 100, 10), None)
+
+        # Assert that the first sample of a different key has no rate
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 20), 10.0)
+        self.assertEqual(self.counter_rate.get_rate('other', 200, 20), None)
+
+    def test_rate(self):
+        """Test rate per second between samples."""
+        self.counter_rate.get_rate('counter', 100, 10)
+        self.assertEqual(self.counter_rate.get_rate('counter', 600, 20), 50.0)
+        self.assertEqual(self.counter_rate.get_rate('counter', 600, 25), 0.0)
+
+    def test_no_elapsed_time(self):
+        """Test that no rate is returned if no time has elapsed."""
+        self.counter_rate.get_rate('counter', 100, 10)
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 10), None)
+
+    def test_32_bit_wrap(self):
+        """Test rate of a 32-bit counter that has wrapped."""
+        self.counter_rate.get_rate('counter', 2 ** 32 - 100, 10, width=32)
+        self.assertEqual(self.counter_rate.get_rate('counter', 100, 20, width=32), 20.0)
+
+    def test_32_bit_reset(self):
+        """Test that an implausibly large wrap of a 32-bit counter is treated as a reset."""
+        self.counter_rate.get_rate('counter', 2 ** 31, 10, width=32)
+        self.assertEqual(self.counter_rate.get_rate('counter', 100, 20, width=32), None)
+
+        # Assert that the rate is calculated from the sample after the reset
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 30, width=32), 10.0)
+
+    def test_reset(self):
+        """Test that a decrease of a counter of unknown width is treated as a reset."""
+        self.counter_rate.get_rate('counter', 2 ** 40, 10)
+        self.assertEqual(self.counter_rate.get_rate('counter', 100, 20), None)
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 30), 10.0)
+
+    def test_64_bit_reset_below_32_bit(self):
+        """Test that a counter that decreases whilst below 2^32 is not
+        treated as a 32-bit wrap, unless it is known to be 32-bit.
+        """
+        self.counter_rate.get_rate('counter', 2 ** 32 - 100, 10)
+        self.assertEqual(self.counter_rate.get_rate('counter', 100, 20), None)
+
+    def test_generation_change(self):
+        """Test that a change of generation is treated as a reset."""
+        self.counter_rate.get_rate('counter', 100, 10, generation=1)
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 20, generation=2), None)
+        self.assertEqual(self.counter_rate.get_rate('counter', 300, 30, generation=2), 10.0)
+
+    def test_missing_value(self):
+        """Test that a missing value removes the previous sample."""
+        self.counter_rate.get_rate('counter', 100, 10)
+        self.assertEqual(self.counter_rate.get_rate('counter', None, 20), None)
+        self.assertEqual(self.counter_rate.get_rate('counter', 300, 30), None)
+
+    def test_remove(self):
+        """Test removal of samples."""
+        self.counter_rate.get_rate('counter', 100, 10)
+        self.counter_rate.get_rate('other', 100, 10)
+        self.counter_rate.remove(['counter'])
+        self.assertEqual(self.counter_rate.get_rate('counter', 200, 20), None)
+        self.assertEqual(self.counter_rate.get_rate('other', 200, 20), 10.0)
+
+        self.counter_rate.remove()
+        self.assertEqual(self.counter_rate.get_rate('other', 300, 30), None)
@@ -0,0 +1,154 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import threading
+import time
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.thread.scheduler import Scheduler
+
+
+class TimerOwner(object):
+    """Owner of scheduled jobs, which is re-scheduled at an interval like a timer."""
+
+    interval = 0.2
+
+    def __init__(self):
+        """Create member variables."""
+        self.timer = None
+
+
+class SchedulerTests(TestBase):
+    """Provides unit tests for the scheduler."""
+
+    # Period (seconds) to wait for scheduled jobs
+    WAIT_TIMEOUT = 5
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the scheduler tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(SchedulerTests('test_run_after_delay'))
+        suite.addTest(SchedulerTests('test_cancel_job'))
+        suite.addTest(SchedulerTests('test_skip_timer_run'))
+        suite.addTest(SchedulerTests('test_defer_job_scheduled_during_run'))
+        suite.addTest(SchedulerTests('test_long_running_jobs'))
+        suite.addTest(SchedulerTests('test_run_long_running'))
+
+        return suite
+
+    def setUp(self):
+        """Create scheduler."""
+        self.scheduler = Scheduler()
+
+    def tearDown(self):
+        """Stop scheduler."""
+        self.scheduler.cancel()
+        super(SchedulerTests, self).tearDown()
+
+    def test_run_after_delay(self):
+        """Test that a job is run once its delay has passed."""
+        start_time = time.time()
+        job = self.scheduler.schedule(lambda: None, 0.2)
+        self.assertTrue(job.complete.wait(self.WAIT_TIMEOUT))
+        self.assertTrue(time.time() - start_time >= 0.2)
+        self.assertEqual(self.scheduler.run_count, 1)
+
+    def test_cancel_job(self):
+        """Test that a cancelled job is not run."""
+        runs = []
+        job = self.scheduler.schedule(lambda: runs.append(1), 0.2)
+        job.cancel()
+        time.sleep(0.5)
+        self.assertEqual(runs, [])
+        self.assertEqual(self.scheduler.run_count, 0)
+
+    def test_skip_timer_run(self):
+        """Test that the next run of a timer is skipped and re-scheduled
+        whilst the previous run is still running.
+        """
+        owner = TimerOwner()
+        release = threading.Event()
+        runs = []
+
+        def run():
+            runs.append(1)
+            release.wait(self.WAIT_TIMEOUT)
+
+        self.scheduler.schedule(run, 0, owner=owner)
+        time.sleep(0.1)
+        owner.timer = self.scheduler.schedule(run, 0, owner=owner)
+        time.sleep(0.1)
+
+        # Assert that the next run was skipped, rather than run concurrently
+        self.assertEqual(runs, [1])
+        self.assertEqual(self.scheduler.skipped_count, 1)
+
+        # Assert that the skipped run is run after the interval
+        release.set()
+        self.assertTrue(owner.timer.complete.wait(self.WAIT_TIMEOUT))
+        self.assertEqual(runs, [1, 1])
+
+    def test_defer_job_scheduled_during_run(self):
+        """Test that a job scheduled by the running job of an owner,
+        such as a watchdog reset, is run once the running job is complete.
+        """
+        owner = TimerOwner()
+        jobs = []
+        runs = []
+
+        def reset():
+            runs.append('reset')
+
+        def run():
+            runs.append('run')
+            jobs.append(self.scheduler.schedule(reset, 0, owner=owner, long_running=True))
+            time.sleep(0.2)
+
+        owner.timer = self.scheduler.schedule(run, 0, owner=owner)
+        self.assertTrue(owner.timer.complete.wait(self.WAIT_TIMEOUT))
+        self.assertTrue(jobs[0].complete.wait(self.WAIT_TIMEOUT))
+        self.assertEqual(runs, ['run', 'reset'])
+        self.assertEqual(self.scheduler.skipped_count, 0)
+
+    def test_long_running_jobs(self):
+        """Test that jobs continue to run whilst the long-running workers are busy."""
+        release = threading.Event()
+        for _ in range(Scheduler.LONG_RUNNING_WORKER_COUNT + 1):
+            self.scheduler.schedule(lambda: release.wait(self.WAIT_TIMEOUT), 0,
+                                    long_running=True)
+
+        job = self.scheduler.schedule(lambda: None, 0)
+        self.assertTrue(job.complete.wait(self.WAIT_TIMEOUT))
+        release.set()
+
+    def test_run_long_running(self):
+        """Test that run_long_running runs callbacks concurrently and waits for them."""
+        runs = []
+
+        def run():
+            time.sleep(0.5)
+            runs.append(threading.current_thread().name)
+
+        start_time = time.time()
+        self.scheduler.run_long_running([run] * Scheduler.LONG_RUNNING_WORKER_COUNT)
+        self.assertEqual(len(runs), Scheduler.LONG_RUNNING_WORKER_COUNT)
+        self.assertTrue(time.time() - start_time < 1.5)
+        for name in runs:
+            self.assertTrue(name.startswith('SchedulerLongRunningWorker'))
@@ -0,0 +1,114 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.database.statistics_buffer import StatisticsRingBuffer, StatisticsBuffer
+
+
+class StatisticsBufferTests(TestBase):
+    """Provides unit tests for the in-memory statistics buffers."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the statistics buffer tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(StatisticsBufferTests('test_get_last_before_full'))
+        suite.addTest(StatisticsBufferTests('test_get_last_after_wrap'))
+        suite.addTest(StatisticsBufferTests('test_missing_values'))
+        suite.addTest(StatisticsBufferTests('test_average'))
+        suite.addTest(StatisticsBufferTests('test_average_after_wrap'))
+        suite.addTest(StatisticsBufferTests('test_add_statistics'))
+        suite.addTest(StatisticsBufferTests('test_remove_device'))
+
+        return suite
+
+    def test_get_last_before_full(self):
+        """Test obtaining values before the buffer is full."""
+        ring_buffer = StatisticsRingBuffer(4)
+        self.assertEqual(ring_buffer.get_last(2), ([], []))
+
+        ring_buffer.append(1, 10)
+        ring_buffer.append(2, 20)
+        self.assertEqual(ring_buffer.get_last(5), ([1.0, 2.0], [10.0, 20.0]))
+        self.assertEqual(ring_buffer.get_last(1), ([2.0], [20.0]))
+        self.assertEqual(ring_buffer.get_last(0), ([], []))
+
+    def test_get_last_after_wrap(self):
+        """Test that the oldest values are overwritten once the buffer is full."""
+        ring_buffer = StatisticsRingBuffer(3)
+        for stat_date in range(1, 6):
+            ring_buffer.append(stat_date, stat_date * 10)
+
+        self.assertEqual(ring_buffer.get_last(3), ([3.0, 4.0, 5.0], [30.0, 40.0, 50.0]))
+        self.assertEqual(ring_buffer.get_last(10), ([3.0, 4.0, 5.0], [30.0, 40.0, 50.0]))
+        self.assertEqual(ring_buffer.get_last(2), ([4.0, 5.0], [40.0, 50.0]))
+
+    def test_missing_values(self):
+        """Test that missing values are returned as None."""
+        ring_buffer = StatisticsRingBuffer(3)
+        ring_buffer.append(1, None)
+        ring_buffer.append(2, 20)
+        self.assertEqual(ring_buffer.get_last(2), ([1.0, 2.0], [None, 20.0]))
+
+    def test_average(self):
+        """Test average of values within a period, ignoring missing values."""
+        ring_buffer = StatisticsRingBuffer(5)
+        ring_buffer.append(100, 50)
+        ring_buffer.append(150, 10)
+        ring_buffer.append(160, None)
+        ring_buffer.append(170, 20)
+
+        self.assertEqual(ring_buffer.get_average(30, now=180), 15.0)
+        self.assertEqual(ring_buffer.get_average(100, now=180), 80.0 / 3)
+        self.assertEqual(ring_buffer.get_average(5, now=180), None)
+
+    def test_average_after_wrap(self):
+        """Test average of values once the buffer has wrapped."""
+        ring_buffer = StatisticsRingBuffer(2)
+        for stat_date in range(1, 5):
+            ring_buffer.append(stat_date, stat_date)
+
+        # Only the last two values are retained
+        self.assertEqual(ring_buffer.get_average(10, now=5), 3.5)
+
+    def test_add_statistics(self):
+        """Test adding statistics to the buffers of each device and stat type."""
+        statistics_buffer = StatisticsBuffer()
+        statistics_buffer.add_statistics([(1, 'vm1', 1, 5, 100),
+                                          (1, 'vm1', 2, 6, 100),
+                                          (1, 'vm1', 1, 7, 110)])
+
+        self.assertEqual(statistics_buffer._get_buffer(1, 'vm1', 1).get_last(5),
+                         ([100.0, 110.0], [5.0, 7.0]))
+        self.assertEqual(statistics_buffer._get_buffer(1, 'vm1', 2).get_last(5),
+                         ([100.0], [6.0]))
+        self.assertEqual(statistics_buffer._get_buffer(1, 'vm2', 1), None)
+
+    def test_remove_device(self):
+        """Test removal of the buffers of a device, and its disks and interfaces."""
+        statistics_buffer = StatisticsBuffer()
+        statistics_buffer.add_statistics([(1, 'vm1', 1, 5, 100),
+                                          (2, 'vm1:vda', 1, 5, 100),
+                                          (1, 'vm10', 1, 5, 100)])
+        statistics_buffer.remove_device('vm1')
+
+        self.assertEqual(statistics_buffer._get_buffer(1, 'vm1', 1), None)
+        self.assertEqual(statistics_buffer._get_buffer(2, 'vm1:vda', 1), None)
+        self.assertNotEqual(statistics_buffer._get_buffer(1, 'vm10', 1), None)
@@ -0,0 +1,242 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import sqlite3
+import time
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.database import DatabaseFactory
+from mcvirt.constants import StatisticsResolution
+
+
+class MemoryDatabaseConnection(object):
+    """Connection to an in-memory database, committing on exit."""
+
+    def __init__(self, sqlite_object):
+        """Store SQLite object."""
+        self._sqlite_object = sqlite_object
+
+    def __enter__(self):
+        """Return connection."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Commit or rollback changes."""
+        if exc_type is None:
+            self._sqlite_object.commit()
+        else:
+            self._sqlite_object.rollback()
+
+    @property
+    def cursor(self):
+        """Obtain the cursor."""
+        return self._sqlite_object.cursor()
+
+
+class MemoryDatabaseFactory(DatabaseFactory):
+    """Database factory using an in-memory database, which does not
+    obtain the singleton lock held by the daemon's database factory.
+    """
+
+    def __init__(self, retention):
+        """Create database and store retention periods."""
+        self.sqlite_object = sqlite3.connect(':memory:')
+        self.retention = retention
+        with self.get_locking_connection() as db_inst:
+            self._schema_migration(db_inst)
+
+    def __del__(self):
+        """Close database."""
+        self.sqlite_object.close()
+
+    def get_locking_connection(self, perform_sync=True):
+        """Return connection to the in-memory database."""
+        return MemoryDatabaseConnection(self.sqlite_object)
+
+    def get_read_connection(self):
+        """Return connection to the in-memory database."""
+        return MemoryDatabaseConnection(self.sqlite_object)
+
+    def get_statistics_retention(self):
+        """Return the retention periods of the test."""
+        return self.retention
+
+
+class StatisticsRollupTests(TestBase):
+    """Provides unit tests for statistics rollups, pruning and rollup rewinds."""
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the statistics rollup tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(StatisticsRollupTests('test_rollup_minute'))
+        suite.addTest(StatisticsRollupTests('test_rollup_hour_and_day'))
+        suite.addTest(StatisticsRollupTests('test_rollup_incomplete_period'))
+        suite.addTest(StatisticsRollupTests('test_prune'))
+        suite.addTest(StatisticsRollupTests('test_prune_unaggregated'))
+        suite.addTest(StatisticsRollupTests('test_import_rewinds_rollup'))
+        suite.addTest(StatisticsRollupTests('test_import_rewind_limited_to_retention'))
+
+        return suite
+
+    def setUp(self):
+        """Create in-memory database, with statistics from the start of a day
+        three days before the current time.
+        """
+        self.now = int(time.time())
+        self.start = ((self.now // StatisticsResolution.DAY.value) - 3) * \
+            StatisticsResolution.DAY.value
+        self.database = self._create_database()
+
+    def tearDown(self):
+        """Remove database."""
+        self.database = None
+        super(StatisticsRollupTests, self).tearDown()
+
+    def _create_database(self, raw=None, minute=None, hour=None, day=None):
+        """Create in-memory database with the given retention periods."""
+        return MemoryDatabaseFactory({StatisticsResolution.RAW: raw,
+                                      StatisticsResolution.MINUTE: minute,
+                                      StatisticsResolution.HOUR: hour,
+                                      StatisticsResolution.DAY: day})
+
+    def _insert(self, stats):
+        """Insert statistics for a single device and stat type, from
+        a list of (offset from start, value).
+        """
+        with self.database.get_locking_connection() as db_inst:
+            db_inst.cursor.executemany(
+                """INSERT INTO stats(device_type, device_id, stat_type, stat_value, stat_date)
+                   VALUES(1, 'vm1', 1, ?, ?)""",
+                [(value, self.start + offset) for offset, value in stats])
+
+    def _rollup_all(self):
+        """Aggregate statistics until all complete periods have been aggregated,
+        as each rollup is limited to a maximum number of periods.
+        """
+        for _ in range(self.now // StatisticsResolution.DAY.value - self.start //
+                       StatisticsResolution.DAY.value + 1):
+            self.database.rollup_statistics()
+
+    def _get_rollups(self, resolution):
+        """Return list of (offset from start, min, avg, max, count) for a resolution."""
+        with self.database.get_read_connection() as db_inst:
+            return [(stat_date - self.start, stat_min, stat_avg, stat_max, stat_count)
+                    for stat_date, stat_min, stat_avg, stat_max, stat_count in
+                    db_inst.cursor.execute(
+                        """SELECT stat_date, stat_min, stat_avg, stat_max, stat_count
+                           FROM stats_rollup WHERE resolution=? ORDER BY stat_date""",
+                        (resolution.value, ))]
+
+    def _get_rollup_date(self, resolution):
+        """Return the date that a resolution has been aggregated until."""
+        with self.database.get_read_connection() as db_inst:
+            return db_inst.cursor.execute(
+                """SELECT rollup_date FROM stats_rollup_state WHERE resolution=?""",
+                (resolution.value, )).fetchone()[0]
+
+    def _get_raw_dates(self):
+        """Return the offsets from the start of all raw statistics."""
+        with self.database.get_read_connection() as db_inst:
+            return [stat_date - self.start for stat_date, in db_inst.cursor.execute(
+                """SELECT stat_date FROM stats ORDER BY stat_date""")]
+
+    def test_rollup_minute(self):
+        """Test aggregation of raw statistics into minutes."""
+        self._insert([(0, 10), (30, 20), (60, 5), (90, 7), (119, 9)])
+        self.database.rollup_statistics()
+
+        self.assertEqual(self._get_rollups(StatisticsResolution.MINUTE),
+                         [(0, 10.0, 15.0, 20.0, 2), (60, 5.0, 7.0, 9.0, 3)])
+
+    def test_rollup_hour_and_day(self):
+        """Test aggregation of each resolution from the previous resolution,
+        weighting averages by the number of raw statistics.
+        """
+        self._insert([(0, 10), (30, 20), (3600, 40)])
+        self.database.rollup_statistics()
+
+        self.assertEqual(self._get_rollups(StatisticsResolution.HOUR),
+                         [(0, 10.0, 15.0, 20.0, 2), (3600, 40.0, 40.0, 40.0, 1)])
+        self.assertEqual(self._get_rollups(StatisticsResolution.DAY),
+                         [(0, 10.0, 70.0 / 3, 40.0, 3)])
+
+    def test_rollup_incomplete_period(self):
+        """Test that periods are not aggregated until they are complete."""
+        self.start = (self.now // StatisticsResolution.MINUTE.value) * \
+            StatisticsResolution.MINUTE.value
+        self._insert([(0, 10)])
+        self.database.rollup_statistics()
+
+        self.assertEqual(self._get_rollups(StatisticsResolution.MINUTE), [])
+
+    def test_prune(self):
+        """Test removal of statistics older than the retention period,
+        once they have been aggregated.
+        """
+        self.database = self._create_database(raw=StatisticsResolution.DAY.value)
+        self._insert([(0, 10), (self.now - self.start - 120, 20)])
+        self.database.rollup_statistics()
+        self.database.prune_statistics()
+
+        self.assertEqual(self._get_raw_dates(), [self.now - self.start - 120])
+        self.assertEqual(self._get_rollups(StatisticsResolution.MINUTE)[0],
+                         (0, 10.0, 10.0, 10.0, 1))
+
+    def test_prune_unaggregated(self):
+        """Test that statistics that have not been aggregated are not removed."""
+        self.database = self._create_database(raw=StatisticsResolution.DAY.value)
+        self._insert([(0, 10)])
+        self.database.prune_statistics()
+
+        self.assertEqual(self._get_raw_dates(), [0])
+
+    def test_import_rewinds_rollup(self):
+        """Test that importing statistics re-aggregates the periods containing them."""
+        self._insert([(0, 10), (3600, 40)])
+        self.database.rollup_statistics()
+        self.database._import_statistics([[self.start + 30, 20, 1, 1, 'vm1']])
+
+        for resolution in DatabaseFactory.ROLLUP_RESOLUTIONS:
+            self.assertEqual(self._get_rollup_date(resolution), self.start + 30)
+
+        self.database.rollup_statistics()
+        self.assertEqual(self._get_rollups(StatisticsResolution.MINUTE)[0],
+                         (0, 10.0, 15.0, 20.0, 2))
+        self.assertEqual(self._get_rollups(StatisticsResolution.DAY),
+                         [(0, 10.0, 70.0 / 3, 40.0, 3)])
+
+    def test_import_rewind_limited_to_retention(self):
+        """Test that rollups are not rewound before the retention period of
+        the source resolution, so that aggregates are not replaced by
+        aggregates of partial data.
+        """
+        self.database = self._create_database(raw=StatisticsResolution.DAY.value)
+        self._insert([(0, 10), (self.now - self.start - 120, 20)])
+        self._rollup_all()
+        self.database._import_statistics([[self.start + 30, 20, 1, 1, 'vm1']])
+
+        # Minutes are only re-aggregated from the retention period of raw statistics
+        minute_rollup_date = self._get_rollup_date(StatisticsResolution.MINUTE)
+        self.assertTrue(minute_rollup_date >= self.now - StatisticsResolution.DAY.value)
+        self.assertEqual(minute_rollup_date % StatisticsResolution.MINUTE.value, 0)
+
+        # Minutes are retained indefinitely, so hours and days are rewound to the import
+        self.assertEqual(self._get_rollup_date(StatisticsResolution.HOUR), self.start + 30)
+        self.assertEqual(self._get_rollup_date(StatisticsResolution.DAY), self.start + 30)
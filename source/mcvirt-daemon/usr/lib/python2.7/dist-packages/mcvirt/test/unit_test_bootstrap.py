@@ -31,6 +31,14 @@ from mcvirt.test.virtual_machine.hard_drive.drbd_tests import DrbdTests
 from mcvirt.test.update_tests import UpdateTests
 from mcvirt.test.virtual_machine.online_migrate_tests import OnlineMigrateTests
 from mcvirt.test.size_converter_tests import SizeConverterTests
+from mcvirt.test.counter_rate_tests import CounterRateTests
+from mcvirt.test.scheduler_tests import SchedulerTests
+from mcvirt.test.statistics_buffer_tests import StatisticsBufferTests
+from mcvirt.test.statistics_rollup_tests import StatisticsRollupTests
+from mcvirt.test.config_delta_tests import ConfigDeltaTests
+from mcvirt.test.config_hash_tree_tests import ConfigHashTreeTests
+from mcvirt.test.virtual_machine_index_tests import VirtualMachineIndexTests
+from mcvirt.test.config_transaction_tests import ConfigTransactionTests
 from mcvirt.rpc.rpc_daemon import RpcNSMixinDaemon
 
 
@@ -59,6 +67,14 @@ class UnitTestBootstrap(object):
         lock_tests_suite = LockTests.suite()
         ldap_tests_suite = LdapTests.suite()
         size_converter_tests = SizeConverterTests.suite()
+        counter_rate_tests = CounterRateTests.suite()
+        scheduler_tests = SchedulerTests.suite()
+        statistics_buffer_tests = StatisticsBufferTests.suite()
+        statistics_rollup_tests = StatisticsRollupTests.suite()
+        config_delta_tests = ConfigDeltaTests.suite()
+        config_hash_tree_tests = ConfigHashTreeTests.suite()
+        virtual_machine_index_tests = VirtualMachineIndexTests.suite()
+        config_transaction_tests = ConfigTransactionTests.suite()
 
         OnlineMigrateTests.RPC_DAEMON = self.daemon
         AuthTests.RPC_DAEMON = self.daemon
@@ -76,7 +92,15 @@ class UnitTestBootstrap(object):
             validation_test_suite,
             lock_tests_suite,
             ldap_tests_suite,
-            size_converter_tests
+            size_converter_tests,
+            counter_rate_tests,
+            scheduler_tests,
+            statistics_buffer_tests,
+            statistics_rollup_tests,
+            config_delta_tests,
+            config_hash_tree_tests,
+            virtual_machine_index_tests,
+            config_transaction_tests
         ])
 
     def daemon_loop_condition(self):
@@ -0,0 +1,181 @@
+# pylint: disable=C0103
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import copy
+import shutil
+import tempfile
+import unittest
+
+from mcvirt.test.test_base import TestBase
+from mcvirt.constants import DirectoryLocation
+from mcvirt.config.base import Base
+from mcvirt.config.cache import ConfigCache
+from mcvirt.config.core import Core
+from mcvirt.config.sharded_storage import ShardedStorage
+from mcvirt.config.virtual_machine_index import VirtualMachineIndex
+
+
+class VirtualMachineIndexTests(TestBase):
+    """Provides unit tests for the virtual machine indexes, using
+    configs in a temporary directory.
+    """
+
+    @staticmethod
+    def suite():
+        """Returns a test suite of the virtual machine index tests."""
+        suite = unittest.TestSuite()
+        suite.addTest(VirtualMachineIndexTests('test_lookups'))
+        suite.addTest(VirtualMachineIndexTests('test_config_written'))
+        suite.addTest(VirtualMachineIndexTests('test_config_modified_on_disk'))
+        suite.addTest(VirtualMachineIndexTests('test_sharded_object_written'))
+        suite.addTest(VirtualMachineIndexTests('test_sharded_objects_added_and_removed'))
+        suite.addTest(VirtualMachineIndexTests('test_sharded_object_modified_on_disk'))
+
+        return suite
+
+    def setUp(self):
+        """Create config in a temporary node directory."""
+        self.node_storage_dir = DirectoryLocation.NODE_STORAGE_DIR
+        self.config_shard_dir = DirectoryLocation.CONFIG_SHARD_DIR
+        self.temp_dir = tempfile.mkdtemp()
+        DirectoryLocation.NODE_STORAGE_DIR = self.temp_dir
+        DirectoryLocation.CONFIG_SHARD_DIR = self.temp_dir + '/config.d'
+
+        self.config = {
+            'virtual_machines': {
+                'vm-1': {'name': 'vm1', 'node': 'node1', 'clone_parent': None,
+                         'hard_drives': {'0': {'hard_drive_id': 'hdd-1'}}},
+                'vm-2': {'name': 'vm2', 'node': 'node2', 'clone_parent': 'vm1',
+                         'hard_drives': {'0': {'hard_drive_id': 'hdd-2'}}}
+            },
+            'hard_drives': {
+                'hdd-1': {'storage_backend': 'sb-1'},
+                'hdd-2': {'storage_backend': 'sb-1'}
+            },
+            'storage_backends': {},
+            'sharded_storage': False
+        }
+        Base._writeJSON(self.config, Core.get_config_file())
+        VirtualMachineIndex.invalidate()
+
+    def tearDown(self):
+        """Remove temporary directory and discard indexes and cached configs."""
+        VirtualMachineIndex.invalidate()
+        ConfigCache.invalidate()
+        DirectoryLocation.NODE_STORAGE_DIR = self.node_storage_dir
+        DirectoryLocation.CONFIG_SHARD_DIR = self.config_shard_dir
+        shutil.rmtree(self.temp_dir)
+        super(VirtualMachineIndexTests, self).tearDown()
+
+    def _enable_sharded_storage(self):
+        """Move the object configs into individual files."""
+        ShardedStorage.write(self.config)
+        VirtualMachineIndex.invalidate()
+
+    def test_lookups(self):
+        """Test lookups of VMs by each index."""
+        self.assertEqual(sorted(VirtualMachineIndex.get_ids()), ['vm-1', 'vm-2'])
+        self.assertTrue(VirtualMachineIndex.exists('vm-1'))
+        self.assertFalse(VirtualMachineIndex.exists('vm-3'))
+        self.assertEqual(sorted(VirtualMachineIndex.get_names()), ['vm1', 'vm2'])
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm2'), 'vm-2')
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm3'), None)
+        self.assertEqual(VirtualMachineIndex.get_ids_by_node('node1'), ['vm-1'])
+        self.assertEqual(sorted(VirtualMachineIndex.get_ids_by_storage_backend('sb-1')),
+                         ['vm-1', 'vm-2'])
+        self.assertEqual(VirtualMachineIndex.get_clone_children('vm1'), ['vm2'])
+
+    def test_config_written(self):
+        """Test that the indexes are updated when the main config is written."""
+        VirtualMachineIndex.get_ids()
+        config = copy.deepcopy(self.config)
+        config['virtual_machines']['vm-1']['name'] = 'vm1-renamed'
+        config['hard_drives']['hdd-2']['storage_backend'] = 'sb-2'
+        Base._writeJSON(config, Core.get_config_file())
+        VirtualMachineIndex.config_written(config)
+
+        # Assert that the config is not re-read for the lookup
+        cache_statistics = ConfigCache.get_statistics()
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm1-renamed'), 'vm-1')
+        self.assertEqual(ConfigCache.get_statistics(), cache_statistics)
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm1'), None)
+        self.assertEqual(VirtualMachineIndex.get_ids_by_storage_backend('sb-1'), ['vm-1'])
+        self.assertEqual(VirtualMachineIndex.get_ids_by_storage_backend('sb-2'), ['vm-2'])
+
+    def test_config_modified_on_disk(self):
+        """Test that changes to the main config file made outside of MCVirt are detected."""
+        VirtualMachineIndex.get_ids()
+        config = copy.deepcopy(self.config)
+        del config['virtual_machines']['vm-2']
+        Base._writeJSON(config, Core.get_config_file())
+
+        self.assertEqual(VirtualMachineIndex.get_ids(), ['vm-1'])
+        self.assertEqual(VirtualMachineIndex.get_clone_children('vm1'), [])
+
+    def test_sharded_object_written(self):
+        """Test that the indexes are updated when an object config file is written."""
+        self._enable_sharded_storage()
+        VirtualMachineIndex.get_ids()
+
+        ShardedStorage.write_object('hard_drives', 'hdd-1', {'storage_backend': 'sb-2'})
+        cache_statistics = ConfigCache.get_statistics()
+        self.assertEqual(VirtualMachineIndex.get_ids_by_storage_backend('sb-1'), ['vm-2'])
+        self.assertEqual(ConfigCache.get_statistics(), cache_statistics)
+        self.assertEqual(VirtualMachineIndex.get_ids_by_storage_backend('sb-2'), ['vm-1'])
+
+        vm_config = copy.deepcopy(self.config['virtual_machines']['vm-2'])
+        vm_config['node'] = 'node1'
+        ShardedStorage.write_object('virtual_machines', 'vm-2', vm_config)
+        self.assertEqual(sorted(VirtualMachineIndex.get_ids_by_node('node1')),
+                         ['vm-1', 'vm-2'])
+        self.assertEqual(VirtualMachineIndex.get_ids_by_node('node2'), [])
+
+    def test_sharded_objects_added_and_removed(self):
+        """Test that the indexes are updated when objects are added and removed."""
+        self._enable_sharded_storage()
+        VirtualMachineIndex.get_ids()
+
+        config = copy.deepcopy(self.config)
+        del config['virtual_machines']['vm-1']
+        config['virtual_machines']['vm-3'] = {
+            'name': 'vm3', 'node': 'node1', 'clone_parent': None,
+            'hard_drives': {'0': {'hard_drive_id': 'hdd-3'}}
+        }
+        config['hard_drives']['hdd-3'] = {'storage_backend': 'sb-3'}
+        ShardedStorage.write(config)
+
+        self.assertEqual(sorted(VirtualMachineIndex.get_ids()), ['vm-2', 'vm-3'])
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm1'), None)
+        self.assertEqual(VirtualMachineIndex.get_ids_by_storage_backend('sb-3'), ['vm-3'])
+
+    def test_sharded_object_modified_on_disk(self):
+        """Test that changes to object config files and the index file
+        made outside of MCVirt are detected.
+        """
+        self._enable_sharded_storage()
+        VirtualMachineIndex.get_ids()
+
+        vm_config = copy.deepcopy(self.config['virtual_machines']['vm-1'])
+        vm_config['name'] = 'vm1-renamed'
+        Base._writeJSON(vm_config, ShardedStorage.get_object_file('virtual_machines', 'vm-1'))
+        self.assertEqual(VirtualMachineIndex.get_id_by_name('vm1-renamed'), 'vm-1')
+
+        index = ShardedStorage.get_index()
+        index['virtual_machines'].remove('vm-2')
+        Base._writeJSON(index, ShardedStorage.get_index_file())
+        self.assertEqual(VirtualMachineIndex.get_ids(), ['vm-1'])
@@ -28,6 +28,9 @@ from mcvirt.syslogger import Syslogger
 class AutoStartWatchdog(RepeatTimer):
     """Object to perform regular checks to determine that VMs are running."""
 
+    # Starting VMs may block for long periods
+    LONG_RUNNING = True
+
     @property
     def interval(self):
         """Return the timer interval."""
@@ -0,0 +1,233 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+from datetime import datetime
+from Queue import Queue, Empty, Full
+from threading import Thread, current_thread
+import time
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+from mcvirt.constants import DirectoryLocation
+from mcvirt.system import System
+from mcvirt.syslogger import Syslogger
+
+
+class GitHistory(PyroObject):
+    """Commit and push configuration changes to the git
+    history repository in a background thread.
+    """
+
+    # Maximum number of changes that can be waiting to be committed
+    MAX_QUEUE_SIZE = 1000
+
+    # Maximum number of changes squashed into a single commit
+    MAX_BATCH_SIZE = 50
+
+    # Period (seconds) to wait for further changes before committing
+    BATCH_INTERVAL = 5
+
+    # Number of push attempts and initial backoff period (seconds),
+    # which is doubled after each failed attempt. Failed pushes are retried
+    # whilst waiting for further changes, rather than delaying commits.
+    PUSH_ATTEMPTS = 5
+    PUSH_BACKOFF = 2
+
+    # Marker placed on the queue to stop the thread
+    STOP = object()
+
+    def __init__(self):
+        """Create queue and status member variables."""
+        self.queue = Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self.thread = None
+        self.last_commit_date = None
+        self.last_push_date = None
+        self.last_push_latency = None
+        self.last_push_error = None
+
+        # Time that a failed push is next retried, number of failed
+        # push attempts and the backoff period before the next retry
+        self.next_push = None
+        self.push_attempt = 0
+        self.push_backoff = self.PUSH_BACKOFF
+
+    def initialise(self):
+        """Start the history thread."""
+        self.thread = Thread(target=self.run, name='GitHistory')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def cancel(self):
+        """Stop the history thread, once queued changes have been committed."""
+        if self.thread is not None:
+            self.queue.put(self.STOP)
+
+    def add_change(self, paths, action, message):
+        """Queue a change to config files to be committed."""
+        # Changes made by the history thread, such as the initial commit after
+        # cloning the repository, are committed directly, as the thread would
+        # otherwise wait for itself if the queue is full
+        if self.thread is not None and current_thread() is self.thread:
+            self._commit([(paths, action, message)])
+            return
+
+        try:
+            self.queue.put_nowait((paths, action, message))
+        except Full:
+            Syslogger.logger().warning(
+                'Git history queue is full, waiting for history thread')
+            self.queue.put((paths, action, message))
+
+    @Expose()
+    def get_status(self):
+        """Return the state of the history queue and last push."""
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        return {
+            'queue_depth': self.queue.qsize(),
+            'last_commit_date': self._format_date(self.last_commit_date),
+            'last_push_date': self._format_date(self.last_push_date),
+            'last_push_latency': self.last_push_latency,
+            'last_push_error': self.last_push_error
+        }
+
+    @staticmethod
+    def _format_date(date):
+        """Return string representation of date, if set."""
+        return "{:%Y-%m-%d %H:%M:%S}".format(date) if date else None
+
+    def run(self):
+        """Wait for changes, commit them in batches and push."""
+        stop = False
+        while not stop:
+            try:
+                if self.next_push is None:
+                    change = self.queue.get()
+                else:
+                    change = self.queue.get(timeout=max(0, self.next_push - time.time()))
+            except Empty:
+                # Retry failed push
+                try:
+                    self.push()
+                except Exception, exc:
+                    self._reset_push_retry()
+                    Syslogger.logger().error(
+                        'Failed to push configuration history: %s' % str(exc))
+                continue
+
+            if change is self.STOP:
+                break
+            changes = [change]
+
+            # Wait for further changes to be squashed into the commit,
+            # until either the batch is full or the interval has passed
+            batch_end = time.time() + self.BATCH_INTERVAL
+            while len(changes) < self.MAX_BATCH_SIZE:
+                remaining = batch_end - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    change = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if change is self.STOP:
+                    stop = True
+                    break
+                changes.append(change)
+
+            try:
+                if self.commit_changes(changes):
+                    self.last_commit_date = datetime.now()
+                    self.push()
+            except Exception, exc:
+                Syslogger.logger().error(
+                    'Failed to commit configuration history: %s' % str(exc))
+
+    @classmethod
+    def commit_changes(cls, changes):
+        """Commit a list of (list of config paths, action, message)
+        changes to the git repository as a single commit.
+        """
+        from mcvirt.config.core import Core
+
+        if not Core()._checkGitRepo():
+            return False
+        return cls._commit(changes)
+
+    @staticmethod
+    def _commit(changes):
+        """Stage and commit changes, without checking the git repository."""
+        from mcvirt.config.core import Core
+
+        for paths, action, _ in changes:
+            if action == 'rm':
+                System.runCommand([Core.GIT, 'rm', '-r', '--cached'] + paths,
+                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
+            else:
+                # Stage additions, modifications and removals of files within
+                # the paths, ignoring paths that have been removed and were
+                # never committed
+                System.runCommand([Core.GIT, 'add', '-A'] + paths,
+                                  raise_exception_on_failure=False,
+                                  cwd=DirectoryLocation.BASE_STORAGE_DIR)
+
+        if len(changes) == 1:
+            message = changes[0][2]
+        else:
+            message = 'Squashed %s configuration changes\n\n%s' % (
+                len(changes), '\n\n'.join([change[2] for change in changes]))
+        # Do not raise an exception if there were no changes to commit
+        rc, _, _ = System.runCommand([Core.GIT, 'commit', '-m', message],
+                                     raise_exception_on_failure=False,
+                                     cwd=DirectoryLocation.BASE_STORAGE_DIR)
+        return rc == 0
+
+    def push(self):
+        """Push commits to the remote. Failed pushes are scheduled to be retried
+        with an increasing backoff, until the number of attempts is exceeded.
+        """
+        from mcvirt.config.core import Core
+
+        start_time = time.time()
+        rc, _, stderr = System.runCommand([Core.GIT, 'push'],
+                                          raise_exception_on_failure=False,
+                                          cwd=DirectoryLocation.BASE_STORAGE_DIR)
+        if rc == 0:
+            self.last_push_date = datetime.now()
+            self.last_push_latency = time.time() - start_time
+            self.last_push_error = None
+            self._reset_push_retry()
+            return True
+
+        self.last_push_error = stderr
+        self.push_attempt += 1
+        Syslogger.logger().warning(
+            'Failed to push configuration history (attempt %s of %s): %s' %
+            (self.push_attempt, self.PUSH_ATTEMPTS, stderr))
+        if self.push_attempt < self.PUSH_ATTEMPTS:
+            self.next_push = time.time() + self.push_backoff
+            self.push_backoff *= 2
+        else:
+            # Push again once the next change has been committed
+            self._reset_push_retry()
+        return False
+
+    def _reset_push_retry(self):
+        """Clear push retry state."""
+        self.next_push = None
+        self.push_attempt = 0
+        self.push_backoff = self.PUSH_BACKOFF
@@ -26,6 +26,7 @@ from mcvirt.rpc.expose_method import Expose
 from mcvirt.argument_validator import ArgumentValidator
 from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.os_stats import OSStats
+from mcvirt.counter_rate import CounterRate, get_monotonic_time
 from mcvirt.syslogger import Syslogger
 from mcvirt.utils import get_hostname
 
@@ -33,9 +34,27 @@ from mcvirt.utils import get_hostname
 class HostStatistics(RepeatTimer):
     """Object to perform regular cpu and memory stats gathering on host."""
 
+    # Cumulative disk counters for each disk rate stat type
+    DISK_COUNTERS = [(HostStatisticsStatType.DISK_READ_BYTES, 'read_bytes'),
+                     (HostStatisticsStatType.DISK_WRITE_BYTES, 'write_bytes'),
+                     (HostStatisticsStatType.DISK_READ_OPERATIONS, 'read_count'),
+                     (HostStatisticsStatType.DISK_WRITE_OPERATIONS, 'write_count')]
+
+    # Disk latency stat types, with the counters of time spent (ms) and operations
+    DISK_LATENCY_COUNTERS = [(HostStatisticsStatType.DISK_READ_LATENCY, 'read_time', 'read_count'),
+                             (HostStatisticsStatType.DISK_WRITE_LATENCY,
+                              'write_time', 'write_count')]
+
+    # Cumulative network interface counters for each network stat type
+    NETWORK_COUNTERS = [(HostStatisticsStatType.NETWORK_RX_BYTES, 'bytes_recv'),
+                        (HostStatisticsStatType.NETWORK_TX_BYTES, 'bytes_sent'),
+                        (HostStatisticsStatType.NETWORK_RX_PACKETS, 'packets_recv'),
+                        (HostStatisticsStatType.NETWORK_TX_PACKETS, 'packets_sent')]
+
     def __init__(self, *args, **kwargs):
         self._cpu_usage = 0
         self._memory_usage = 0
+        self.counter_rate = CounterRate()
         super(HostStatistics, self).__init__(*args, **kwargs)
 
     @Expose()
@@ -59,9 +78,8 @@ class HostStatistics(RepeatTimer):
         return self.po__get_registered_object(
             'mcvirt_config')().get_config()['statistics']['interval']
 
-    def insert_into_stat_db(self):
+    def insert_into_stat_db(self, device_res=None):
         """Add statistics to statistics database."""
-        db_factory = self.po__get_registered_object('database_factory')
         db_rows = [
             (StatisticsDeviceType.HOST.value, get_hostname(),
              HostStatisticsStatType.CPU_USAGE.value, self._cpu_usage,
@@ -71,12 +89,59 @@ class HostStatistics(RepeatTimer):
              HostStatisticsStatType.MEMORY_USAGE.value, self._memory_usage,
              "{:%s}".format(datetime.now()))
         ]
-        with db_factory.get_locking_connection() as db_inst:
-            db_inst.cursor.executemany(
-                """INSERT INTO stats(
-                    device_type, device_id, stat_type, stat_value, stat_date
-                ) VALUES(?, ?, ?, ?, ?)""",
-                db_rows)
+        now = "{:%s}".format(datetime.now())
+        for device_type, device_id, stat_type, val in (device_res or []):
+            db_rows.append((device_type.value, device_id, stat_type.value, val, now))
+        self.po__get_registered_object('statistics_writer').add_statistics(db_rows)
+
+    def obtain_extended_stats(self):
+        """Obtain per-core CPU, CPU wait, load average, disk and network statistics,
+        returning list of (device type, device ID, stat type, value).
+        """
+        hostname = get_hostname()
+        device_res = []
+
+        for core, cpu_usage in enumerate(OSStats.get_per_cpu_usage()):
+            device_res.append((StatisticsDeviceType.HOST_CPU, '%s:cpu%s' % (hostname, core),
+                               HostStatisticsStatType.CPU_USAGE, cpu_usage))
+
+        iowait, steal = OSStats.get_cpu_wait_usage()
+        load_averages = OSStats.get_load_average()
+        for stat_type, val in [(HostStatisticsStatType.CPU_IOWAIT, iowait),
+                               (HostStatisticsStatType.CPU_STEAL, steal),
+                               (HostStatisticsStatType.LOAD_AVERAGE_1, load_averages[0]),
+                               (HostStatisticsStatType.LOAD_AVERAGE_5, load_averages[1]),
+                               (HostStatisticsStatType.LOAD_AVERAGE_15, load_averages[2])]:
+            if val is not None:
+                device_res.append((StatisticsDeviceType.HOST, hostname, stat_type, val))
+
+        sample_time = get_monotonic_time()
+        for disk, counters in OSStats.get_disk_counters().items():
+            device_id = '%s:%s' % (hostname, disk)
+            rates = {}
+            for counter in ['read_bytes', 'write_bytes', 'read_count', 'write_count',
+                            'read_time', 'write_time']:
+                rates[counter] = self.counter_rate.get_rate(
+                    (device_id, counter), counters.get(counter), sample_time)
+            for stat_type, counter in self.DISK_COUNTERS:
+                if rates[counter] is not None:
+                    device_res.append((StatisticsDeviceType.HOST_DISK, device_id, stat_type,
+                                       round(rates[counter], 2)))
+            # Average time per operation since the previous sample
+            for stat_type, time_counter, count_counter in self.DISK_LATENCY_COUNTERS:
+                if rates[time_counter] is not None and rates[count_counter]:
+                    device_res.append((StatisticsDeviceType.HOST_DISK, device_id, stat_type,
+                                       round(rates[time_counter] / rates[count_counter], 2)))
+
+        for interface, counters in OSStats.get_network_counters().items():
+            device_id = '%s:%s' % (hostname, interface)
+            for stat_type, counter in self.NETWORK_COUNTERS:
+                rate = self.counter_rate.get_rate(
+                    (device_id, counter), counters.get(counter), sample_time)
+                if rate is not None:
+                    device_res.append((StatisticsDeviceType.HOST_INTERFACE, device_id,
+                                       stat_type, round(rate, 2)))
+        return device_res
 
     def run(self):
         """Obtain CPU and memory statistics."""
@@ -84,7 +149,12 @@ class HostStatistics(RepeatTimer):
         Syslogger.logger().debug('Starting host stats gathering')
         self._cpu_usage = OSStats.get_cpu_usage()
         self._memory_usage = OSStats.get_ram_usage()
-        self.insert_into_stat_db()
+        device_res = []
+        try:
+            device_res = self.obtain_extended_stats()
+        except Exception, exc:
+            Syslogger.logger().error('Failed to obtain extended host statistics: %s' % str(exc))
+        self.insert_into_stat_db(device_res)
         Syslogger.logger().debug('Completed host stats gathering')
 
         Pyro4.current_context.INTERNAL_REQUEST = False
@@ -15,14 +15,17 @@
 # You should have received a copy of the GNU General Public License
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
-from threading import Timer
-
 from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.thread.scheduler import Scheduler
 from mcvirt.syslogger import Syslogger
 
 
 class RepeatTimer(PyroObject):
-    """Timer that auto-repeats."""
+    """Timer that auto-repeats, run by the scheduler."""
+
+    # Whether runs may block for long periods, so are run
+    # on the scheduler's long-running workers
+    LONG_RUNNING = False
 
     @property
     def interval(self):
@@ -33,7 +36,7 @@ class RepeatTimer(PyroObject):
         """Create member variables for repeat status and position of restart."""
         # State to determine if next run should kick off another timer
         self.repeat = True
-        # Timer object
+        # Scheduled job for the next run
         self.timer = None
         # Store arguments and kwargs for run
         self.run_args = args if args is not None else []
@@ -45,8 +48,7 @@ class RepeatTimer(PyroObject):
     def initialise(self):
         """Create timer object and start timer."""
         if self.interval and self.interval > 0:
-            self.timer = Timer(float(self.interval), self.repeat_run)
-            self.timer.start()
+            self.timer = self._schedule(float(self.interval))
 
     def cancel(self):
         """Cancel timer, if it is running."""
@@ -54,6 +56,11 @@ class RepeatTimer(PyroObject):
         if self.timer:
             self.timer.cancel()
 
+    def _schedule(self, interval):
+        """Schedule repeat_run to be run after an interval (seconds)."""
+        return Scheduler.get_instance().schedule(self.repeat_run, interval, owner=self,
+                                                 long_running=self.LONG_RUNNING)
+
     def _log_error(self, msg):
         """Log generic error"""
         Syslogger.logger().error(
@@ -64,8 +71,7 @@ class RepeatTimer(PyroObject):
         """Re-start timer once run has complete."""
         # Restart timer, if set to repeat before run
         if not self.repeat_after_run and self.repeat:
-            self.timer = Timer(float(self.interval), self.repeat_run)
-            self.timer.start()
+            self.timer = self._schedule(float(self.interval))
 
         return_output = None
         try:
@@ -76,8 +82,7 @@ class RepeatTimer(PyroObject):
 
         # Restart timer, if set to repeat after run
         if self.repeat_after_run and self.repeat:
-            self.timer = Timer(float(self.interval), self.repeat_run)
-            self.timer.start()
+            self.timer = self._schedule(float(self.interval))
         return return_output
 
     def run(self, *args, **kwargs):
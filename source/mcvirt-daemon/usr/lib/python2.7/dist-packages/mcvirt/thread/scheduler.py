@@ -0,0 +1,272 @@
+"""Provide scheduler for running periodic jobs on a pool of worker threads."""
+
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import heapq
+from itertools import count
+from Queue import Queue
+from threading import Condition, Event, Lock, Thread
+import time
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+from mcvirt.syslogger import Syslogger
+
+
+class ScheduledJob(object):
+    """Job scheduled to run once, which can be cancelled before it is run."""
+
+    def __init__(self, callback, owner, long_running=False):
+        """Store callback and owner of the job."""
+        self.callback = callback
+        self.owner = owner
+        self.long_running = long_running
+        self.due = None
+        self.cancelled = False
+
+        # Set once the job has been run, skipped or cancelled
+        self.complete = Event()
+
+    def cancel(self):
+        """Prevent the job from running."""
+        self.cancelled = True
+
+
+class Scheduler(PyroObject):
+    """Run scheduled jobs on a fixed pool of worker threads, replacing
+    a thread per timer.
+
+    Due jobs are taken from a heap, ordered by due date, and queued for the
+    workers. If the next run of a timer is due whilst a previous job from the
+    same owner is still running, the run is skipped. Other jobs are deferred
+    until the running job of the owner is complete.
+
+    Jobs that may block for long periods, such as those communicating with
+    remote nodes, are run on a separate pool of workers, so that they
+    cannot delay other jobs.
+    """
+
+    # Number of worker threads running jobs
+    WORKER_COUNT = 8
+
+    # Number of worker threads running long-running jobs
+    LONG_RUNNING_WORKER_COUNT = 4
+
+    # Period (seconds) after the due date that a job is counted as late
+    LATE_THRESHOLD = 1.0
+
+    # Marker placed on the queue to stop a worker thread
+    STOP = object()
+
+    # Scheduler shared by all timers
+    INSTANCE = None
+    INSTANCE_LOCK = Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """Return the shared scheduler, creating it if it does not exist."""
+        with cls.INSTANCE_LOCK:
+            if cls.INSTANCE is None:
+                cls.INSTANCE = cls()
+            return cls.INSTANCE
+
+    def __init__(self):
+        """Create heap, queue and status member variables."""
+        self.heap = []
+        self.sequence = count()
+        self.condition = Condition(Lock())
+        self.queue = Queue()
+        self.long_running_queue = Queue()
+        self.threads = []
+        self.stopped = False
+
+        # Owners of jobs that are currently running and dict of
+        # owner -> jobs deferred until the running job is complete
+        self.running = set()
+        self.deferred = {}
+        self.run_count = 0
+        self.skipped_count = 0
+        self.late_count = 0
+
+        # Dict of owner class name -> [run count, skipped count, late count]
+        self.job_type_counts = {}
+
+    def initialise(self):
+        """Start the scheduler and worker threads."""
+        self._start()
+
+    def _start(self):
+        """Start threads, if they have not been started."""
+        with self.condition:
+            if self.threads or self.stopped:
+                return
+            self.threads.append(Thread(target=self._run_scheduler, name='Scheduler'))
+            for worker_number in range(self.WORKER_COUNT):
+                self.threads.append(Thread(target=self._run_worker, args=(self.queue, ),
+                                           name='SchedulerWorker-%s' % worker_number))
+            for worker_number in range(self.LONG_RUNNING_WORKER_COUNT):
+                self.threads.append(Thread(target=self._run_worker,
+                                           args=(self.long_running_queue, ),
+                                           name='SchedulerLongRunningWorker-%s' %
+                                           worker_number))
+            for thread in self.threads:
+                thread.daemon = True
+                thread.start()
+
+    def cancel(self):
+        """Stop the scheduler and worker threads."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        for _ in range(self.WORKER_COUNT):
+            self.queue.put(self.STOP)
+        for _ in range(self.LONG_RUNNING_WORKER_COUNT):
+            self.long_running_queue.put(self.STOP)
+
+    def schedule(self, callback, delay, owner=None, long_running=False):
+        """Schedule a callback to be run after a delay (seconds),
+        returning the job, which can be cancelled.
+        """
+        self._start()
+        job = ScheduledJob(callback, owner, long_running=long_running)
+        self._push(job, time.time() + delay)
+        return job
+
+    def run_long_running(self, callbacks):
+        """Run callbacks concurrently on the long-running workers,
+        waiting for all of them to complete.
+
+        Must not be called by more than one long-running job at a time, as the
+        callbacks could otherwise wait for workers occupied by those jobs.
+        """
+        jobs = [self.schedule(callback, 0, long_running=True) for callback in callbacks]
+        for job in jobs:
+            job.complete.wait()
+
+    def _push(self, job, due):
+        """Add job to the heap."""
+        with self.condition:
+            job.due = due
+            heapq.heappush(self.heap, (due, next(self.sequence), job))
+            self.condition.notify()
+
+    def _count(self, job, index):
+        """Increment run (0), skipped (1) or late (2) count for a job type.
+
+        Must be called whilst holding the lock.
+        """
+        job_type = job.owner.__class__.__name__ if job.owner is not None else 'None'
+        self.job_type_counts.setdefault(job_type, [0, 0, 0])[index] += 1
+
+    def _run_scheduler(self):
+        """Queue jobs for the workers as they become due."""
+        with self.condition:
+            while not self.stopped:
+                # Remove cancelled jobs
+                while self.heap and self.heap[0][2].cancelled:
+                    heapq.heappop(self.heap)
+
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                wait_time = self.heap[0][0] - time.time()
+                if wait_time > 0:
+                    self.condition.wait(wait_time)
+                    continue
+
+                job = heapq.heappop(self.heap)[2]
+                if job.long_running:
+                    self.long_running_queue.put(job)
+                else:
+                    self.queue.put(job)
+
+    def _run_worker(self, queue):
+        """Run jobs from a queue."""
+        while True:
+            job = queue.get()
+            if job is self.STOP:
+                return
+            if job.cancelled:
+                job.complete.set()
+                continue
+
+            with self.condition:
+                skipped = job.owner is not None and job.owner in self.running
+                if not skipped:
+                    if job.owner is not None:
+                        self.running.add(job.owner)
+                    if time.time() - job.due > self.LATE_THRESHOLD:
+                        self.late_count += 1
+                        self._count(job, 2)
+
+                # Skip the next run of a timer, re-scheduling it after the interval,
+                # otherwise defer the job until the running job of the owner is complete
+                elif getattr(job.owner, 'timer', None) is job:
+                    self.skipped_count += 1
+                    self._count(job, 1)
+                else:
+                    self.deferred.setdefault(job.owner, []).append(job)
+                    continue
+
+            if skipped:
+                interval = getattr(job.owner, 'interval', None)
+                if interval:
+                    self._push(job, time.time() + float(interval))
+                else:
+                    job.complete.set()
+                continue
+
+            try:
+                job.callback()
+            except Exception, exc:
+                Syslogger.logger().error('Error ocurred during scheduled job (%s): %s' %
+                                         (job.owner.__class__.__name__, str(exc)))
+            finally:
+                with self.condition:
+                    self.running.discard(job.owner)
+                    self.run_count += 1
+                    self._count(job, 0)
+                    deferred = self.deferred.pop(job.owner, [])
+                job.complete.set()
+                for deferred_job in deferred:
+                    self._push(deferred_job, time.time())
+
+    @Expose()
+    def get_status(self):
+        """Return the number of scheduled, queued and running jobs and
+        the number of runs, skipped runs and late runs for each type of job.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        with self.condition:
+            return {
+                'workers': self.WORKER_COUNT,
+                'long_running_workers': self.LONG_RUNNING_WORKER_COUNT,
+                'scheduled_jobs': len([entry for entry in self.heap if not entry[2].cancelled]),
+                'queue_depth': self.queue.qsize(),
+                'long_running_queue_depth': self.long_running_queue.qsize(),
+                'running_jobs': len(self.running),
+                'run_count': self.run_count,
+                'skipped_count': self.skipped_count,
+                'late_count': self.late_count,
+                'job_types': {job_type: {'run_count': counts[0],
+                                         'skipped_count': counts[1],
+                                         'late_count': counts[2]}
+                              for job_type, counts in self.job_type_counts.items()}
+            }
@@ -0,0 +1,45 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import Pyro4
+
+from mcvirt.thread.repeat_timer import RepeatTimer
+from mcvirt.syslogger import Syslogger
+
+
+class StatisticsRollup(RepeatTimer):
+    """Object to perform regular aggregation and removal of old statistics."""
+
+    # Interval (seconds) between rollups
+    ROLLUP_INTERVAL = 60
+
+    @property
+    def interval(self):
+        """Return the timer interval."""
+        return self.ROLLUP_INTERVAL
+
+    def run(self):
+        """Aggregate statistics and remove statistics past the retention period."""
+        Pyro4.current_context.INTERNAL_REQUEST = True
+        Syslogger.logger().debug('Starting statistics rollup')
+
+        database_factory = self.po__get_registered_object('database_factory')
+        database_factory.rollup_statistics()
+        database_factory.prune_statistics()
+
+        Syslogger.logger().debug('Completed statistics rollup')
+        Pyro4.current_context.INTERNAL_REQUEST = False
@@ -0,0 +1,139 @@
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+from Queue import Queue, Empty, Full
+from threading import Thread
+import time
+
+import Pyro4
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+from mcvirt.syslogger import Syslogger
+
+
+class StatisticsWriter(PyroObject):
+    """Write statistics to the statistics database in batches from
+    a single thread, rather than a transaction per statistics agent.
+    """
+
+    # Maximum number of statistics waiting to be written
+    MAX_QUEUE_SIZE = 100000
+
+    # Period (seconds) to wait for further statistics before writing
+    FLUSH_INTERVAL = 0.5
+
+    # Maximum number of statistics written in a single transaction
+    FLUSH_ROWS = 1000
+
+    # Marker placed on the queue to stop the thread
+    STOP = object()
+
+    def __init__(self):
+        """Create queue and status member variables."""
+        self.queue = Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self.thread = None
+        self.flush_count = 0
+        self.row_count = 0
+        self.dropped_row_count = 0
+        self.last_flush_rows = None
+        self.last_flush_latency = None
+
+    def initialise(self):
+        """Start the writer thread."""
+        self.thread = Thread(target=self.run, name='StatisticsWriter')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def cancel(self):
+        """Stop the writer thread, once queued statistics have been written."""
+        if self.thread is not None:
+            self.queue.put(self.STOP)
+
+    def add_statistics(self, rows):
+        """Queue statistics to be written, each being a tuple of
+        (device_type, device_id, stat_type, stat_value, stat_date),
+        and add to the in-memory statistics buffers.
+        """
+        self.po__get_registered_object('statistics_buffer').add_statistics(rows)
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+            except Full:
+                # Drop statistics, rather than blocking the statistics agents
+                self.dropped_row_count += 1
+
+    @Expose()
+    def get_status(self):
+        """Return the state of the statistics queue and last write."""
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        return {
+            'queue_depth': self.queue.qsize(),
+            'flush_count': self.flush_count,
+            'row_count': self.row_count,
+            'dropped_row_count': self.dropped_row_count,
+            'last_flush_rows': self.last_flush_rows,
+            'last_flush_latency': self.last_flush_latency
+        }
+
+    def run(self):
+        """Wait for statistics and write them in batches."""
+        Pyro4.current_context.INTERNAL_REQUEST = True
+        stop = False
+        while not stop:
+            row = self.queue.get()
+            if row is self.STOP:
+                break
+            rows = [row]
+
+            # Wait for further statistics to be written in the same
+            # transaction, until either the batch is full or the interval has passed
+            flush_time = time.time() + self.FLUSH_INTERVAL
+            while len(rows) < self.FLUSH_ROWS:
+                remaining = flush_time - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self.queue.get(timeout=remaining)
+                except Empty:
+                    break
+                if row is self.STOP:
+                    stop = True
+                    break
+                rows.append(row)
+
+            try:
+                self.flush(rows)
+            except Exception, exc:
+                Syslogger.logger().error(
+                    'Failed to write statistics: %s' % str(exc))
+
+    def flush(self, rows):
+        """Write statistics to the database in a single transaction,
+        notifying statistics sync once the transaction is committed.
+        """
+        start_time = time.time()
+        db_factory = self.po__get_registered_object('database_factory')
+        db_factory.insert_statistics(rows)
+
+        self.last_flush_latency = time.time() - start_time
+        self.last_flush_rows = len(rows)
+        self.flush_count += 1
+        self.row_count += len(rows)
+        Syslogger.logger().debug('Wrote %s statistics in %.3fs (%s queued)' %
+                                 (len(rows), self.last_flush_latency, self.queue.qsize()))
@@ -17,6 +17,9 @@
 
 import json
 from datetime import datetime
+import time
+
+import libvirt
 import Pyro4
 
 from mcvirt.thread.repeat_timer import RepeatTimer
@@ -27,7 +30,10 @@ from mcvirt.config.core import Core as MCVirtConfig
 from mcvirt.rpc.expose_method import Expose
 from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.constants import (StatisticsDeviceType,
-                              VirtualMachineStatisticsStatType)
+                              VirtualMachineStatisticsStatType,
+                              DiskStatisticsStatType,
+                              InterfaceStatisticsStatType)
+from mcvirt.counter_rate import CounterRate, get_monotonic_time
 
 
 class VirtualMachineStatisticsFactory(PyroObject):
@@ -66,6 +72,8 @@ class VirtualMachineStatisticsFactory(PyroObject):
         """Stop statistics."""
         stats = self.get_statistics_agent(virtual_machine)
         stats.cancel()
+        self.po__get_registered_object('statistics_buffer').remove_device(
+            virtual_machine.get_id())
 
     def get_statistics_agent(self, virtual_machine):
         """Get a statistics obect for a given virtual machine."""
@@ -96,27 +104,93 @@ class VirtualMachineStatisticsFactory(PyroObject):
             nodes=self.po__get_registered_object('cluster').get_nodes(include_local=True))
 
 
+class DomainStatisticsCollector(RepeatTimer):
+    """Obtain statistics for all local domains from libvirt in a single
+    call and pass them to the statistics agent for each VM.
+    """
+
+    # Statistics obtained for each domain
+    STATS = (libvirt.VIR_DOMAIN_STATS_CPU_TOTAL |
+             libvirt.VIR_DOMAIN_STATS_BALLOON |
+             libvirt.VIR_DOMAIN_STATS_VCPU |
+             libvirt.VIR_DOMAIN_STATS_BLOCK |
+             libvirt.VIR_DOMAIN_STATS_INTERFACE)
+
+    @property
+    def interval(self):
+        """Return the timer interval."""
+        return MCVirtConfig().get_config()['statistics']['interval']
+
+    def run(self):
+        """Obtain domain statistics and pass to statistics agents."""
+        Pyro4.current_context.INTERNAL_REQUEST = True
+        Syslogger.logger().debug('Starting domain statistics gathering')
+        try:
+            libvirt_connection = self.po__get_registered_object(
+                'libvirt_connector').get_connection()
+            capture_time = time.time()
+            sample_time = get_monotonic_time()
+            domain_stats = libvirt_connection.getAllDomainStats(
+                self.STATS, libvirt.VIR_CONNECT_GET_ALL_DOMAINS_STATS_ACTIVE)
+        except Exception as exc:
+            Syslogger.logger().error(
+                'Failed to obtain domain statistics from libvirt: {}'.format(str(exc)))
+            return
+        finally:
+            Pyro4.current_context.INTERNAL_REQUEST = False
+
+        statistics_agents = self.po__get_registered_object(
+            'virtual_machine_statistics_factory').statistics_agents
+        for domain, stats in domain_stats:
+            stats_agent = statistics_agents.get(domain.name())
+            if stats_agent is not None:
+                stats_agent.set_libvirt_stats(capture_time, sample_time, domain.ID(), stats)
+        Syslogger.logger().debug('Completed domain statistics gathering')
+
+
 class VirtualMachineStatisticsAgent(RepeatTimer):
     """Statistics agent timer thread for checking VM stats."""
 
+    # Libvirt block statistics counters for each disk stat type
+    DISK_COUNTERS = [(DiskStatisticsStatType.READ_BYTES, 'rd.bytes'),
+                     (DiskStatisticsStatType.WRITE_BYTES, 'wr.bytes'),
+                     (DiskStatisticsStatType.READ_OPERATIONS, 'rd.reqs'),
+                     (DiskStatisticsStatType.WRITE_OPERATIONS, 'wr.reqs')]
+
+    # Libvirt interface statistics counters for each interface stat type
+    INTERFACE_COUNTERS = [(InterfaceStatisticsStatType.RX_BYTES, 'rx.bytes'),
+                          (InterfaceStatisticsStatType.TX_BYTES, 'tx.bytes'),
+                          (InterfaceStatisticsStatType.RX_PACKETS, 'rx.pkts'),
+                          (InterfaceStatisticsStatType.TX_PACKETS, 'tx.pkts')]
+
     def __init__(self, virtual_machine, *args, **kwargs):
         """Store virtual machine."""
         self.virtual_machine = virtual_machine
         self._interval = MCVirtConfig().get_config()['statistics']['interval']
+        # Capture time, monotonic sample time, domain ID and
+        # dict of the latest libvirt domain statistics
+        self.libvirt_stats = None
+        # Sample time of the domain statistics last used, as the statistics
+        # agent and collector run on independent timers
+        self.libvirt_sample_time = None
+        self.counter_rate = CounterRate()
         super(VirtualMachineStatisticsAgent, self).__init__(*args, **kwargs)
 
+    def set_libvirt_stats(self, capture_time, sample_time, domain_id, stats):
+        """Store domain statistics obtained by the domain statistics collector."""
+        self.libvirt_stats = (capture_time, sample_time, domain_id, stats)
+
     @property
     def interval(self):
         """Return the timer interval."""
         return self._interval
 
-    def insert_into_stat_db(self, data_res):
+    def insert_into_stat_db(self, data_res, device_res=None):
         """Add statistics to statistics database."""
-        db_factory = self.po__get_registered_object('database_factory')
         db_rows = []
 
         now = "{:%s}".format(datetime.now())
-        for stat_type, val in data_res:
+        for stat_type, val in data_res.values():
             db_rows.append(
                 (StatisticsDeviceType.VIRTUAL_MACHINE.value,
                  self.virtual_machine.id_,
@@ -124,13 +198,10 @@ class VirtualMachineStatisticsAgent(RepeatTimer):
                  val,
                  now)
             )
+        for device_type, device_id, stat_type, val in (device_res or []):
+            db_rows.append((device_type.value, device_id, stat_type.value, val, now))
 
-        with db_factory.get_locking_connection() as db_inst:
-            db_inst.cursor.executemany(
-                """INSERT INTO stats(
-                    device_type, device_id, stat_type, stat_value, stat_date
-                ) VALUES(?, ?, ?, ?, ?)""",
-                db_rows)
+        self.po__get_registered_object('statistics_writer').add_statistics(db_rows)
 
     def run(self):
         """Perform statistics check."""
@@ -147,65 +218,148 @@ class VirtualMachineStatisticsAgent(RepeatTimer):
             return
 
         data_res = {
-            'guest_memory': [VirtualMachineStatisticsStatType.GUEST_MEMORY_USAGE, None],
-            'guest_cpu': [VirtualMachineStatisticsStatType.GUEST_CPU_USAGE, None],
             'host_memory': [VirtualMachineStatisticsStatType.HOST_MEMORY_USAGE, None],
             'host_cpu': [VirtualMachineStatisticsStatType.HOST_CPU_USAGE, None]
         }
 
-        # Obtain statistics from libvirt
-        self.obtain_libvirt_stats(data_res)
-        self.obtain_agent_stats(data_res)
+        # List of (device type, device ID, stat type, value) for disks and interfaces
+        device_res = []
 
-        self.insert_into_stat_db(data_res)
+        # Obtain statistics from libvirt, which are only recorded
+        # if new domain statistics have been gathered since the previous run
+        if self.obtain_libvirt_stats(data_res, device_res):
+            self.insert_into_stat_db(data_res, device_res)
+
+        # Poll the agent, unless the agent is pushing guest statistics.
+        # Guest statistics are added once the agent has responded.
+        if not self.set_agent_telemetry():
+            self.obtain_agent_stats()
 
         Pyro4.current_context.INTERNAL_REQUEST = False
         Syslogger.logger().debug('Statistics daemon complete: %s' %
                                  self.virtual_machine.get_name())
 
-    def obtain_libvirt_stats(self, data_res):
-        """Obtain statistics from libvirt"""
-        try:
-            memory_stats = self.virtual_machine.get_libvirt_memory_stats()
-            cpu_perc = self.virtual_machine.get_libvirt_cpu_stats()
-            capture_time = datetime.now()
-
-        except Exception as exc:
-            Syslogger.logger().error('Failed to obtain VM statistics from libvirt: {}'.format(str(exc)))
-            Syslogger.logger().error("".join(Pyro4.util.getPyroTraceback()))
-        else:
-            vm_obj = self.virtual_machine
-            data_res['host_memory'][1] = vm_obj.current_host_memory_usage = memory_stats['rss']
-
+    def obtain_libvirt_stats(self, data_res, device_res):
+        """Obtain statistics from the latest domain statistics
+        gathered by the domain statistics collector.
+
+        Returns False if the latest domain statistics have already been
+        obtained by a previous run, in which case no statistics are recorded.
+        """
+        if self.libvirt_stats is None:
+            Syslogger.logger().debug('No domain statistics available for %s' %
+                                     self.virtual_machine.get_name())
+            return True
+        capture_time, sample_time, domain_id, stats = self.libvirt_stats
+
+        # Ignore statistics that were not gathered in the last two intervals
+        if capture_time < time.time() - (2 * self.interval):
+            Syslogger.logger().debug('Domain statistics for %s are out of date' %
+                                     self.virtual_machine.get_name())
+            return True
+
+        if sample_time == self.libvirt_sample_time:
+            Syslogger.logger().debug('Domain statistics for %s have already been obtained' %
+                                     self.virtual_machine.get_name())
+            return False
+        self.libvirt_sample_time = sample_time
+
+        vm_obj = self.virtual_machine
+        if 'balloon.rss' in stats:
+            data_res['host_memory'][1] = vm_obj.current_host_memory_usage = stats['balloon.rss']
+
+        if 'cpu.time' in stats:
+            # Calculate CPU usage as percentage of the VM's vCPUs since the previous capture
             vm_obj.current_host_cpu_usage[0] = vm_obj.current_host_cpu_usage[1]
-            data_res['host_cpu'][1] = vm_obj.current_host_cpu_usage[1] = [cpu_perc, capture_time]
-
-    def obtain_agent_stats(self, data_res):
-        """Obtain statistics from agent"""
-        agent_conn = self.virtual_machine.get_agent_connection()
+            vm_obj.current_host_cpu_usage[1] = [stats['cpu.time'], capture_time]
+            cpu_rate = self.counter_rate.get_rate(
+                'cpu.time', stats['cpu.time'], sample_time, domain_id)
+            if cpu_rate is not None:
+                data_res['host_cpu'][1] = round(
+                    cpu_rate * 100.0 / (1000000000 * (stats.get('vcpu.current') or 1)), 2)
+
+        # Calculate disk and interface rates from libvirt counters
+        for prefix, device_type, counters in [
+                ('block', StatisticsDeviceType.VIRTUAL_MACHINE_DISK, self.DISK_COUNTERS),
+                ('net', StatisticsDeviceType.VIRTUAL_MACHINE_INTERFACE, self.INTERFACE_COUNTERS)]:
+            for index in range(stats.get('%s.count' % prefix, 0)):
+                if prefix == 'block':
+                    device_name = stats.get('block.%s.name' % index)
+                else:
+                    device_name = 'net%s' % index
+                device_id = '%s:%s' % (vm_obj.id_, device_name)
+                for stat_type, counter in counters:
+                    rate = self.counter_rate.get_rate(
+                        (device_id, counter), stats.get('%s.%s.%s' % (prefix, index, counter)),
+                        sample_time, domain_id)
+                    if rate is not None:
+                        device_res.append((device_type, device_id, stat_type, round(rate, 2)))
+        return True
+
+    def get_guest_data_res(self):
+        """Return dict of guest statistics, populated from agent statistics."""
+        return {
+            'guest_memory': [VirtualMachineStatisticsStatType.GUEST_MEMORY_USAGE, None],
+            'guest_cpu': [VirtualMachineStatisticsStatType.GUEST_CPU_USAGE, None],
+            'guest_filesystem': [VirtualMachineStatisticsStatType.GUEST_FILESYSTEM_USAGE, None],
+            'guest_load': [VirtualMachineStatisticsStatType.GUEST_LOAD_AVERAGE, None]
+        }
 
-        resp = None
+    def set_agent_telemetry(self):
+        """Subscribe to, or unsubscribe from, statistics pushed by the agent,
+        based on the VM configuration. Returns whether the agent is pushing statistics.
+        """
         try:
-            resp = agent_conn.wait_lock(command='stats')
+            return self.virtual_machine.get_agent_connection().set_telemetry(
+                self.virtual_machine.get_agent_telemetry_interval(),
+                self.add_agent_telemetry)
         except Exception as exc:
             Syslogger.logger().error(
-                'Failed to obtain connection to agent: {}'.format(str(exc)))
+                'Failed to subscribe to agent statistics: {}'.format(str(exc)))
+            return False
+
+    def add_agent_telemetry(self, event):
+        """Add statistics pushed by the agent."""
+        if event.get('event') != 'stats':
+            return
+        data_res = self.get_guest_data_res()
+        self.set_agent_stats(data_res, event['stats'])
+        self.insert_into_stat_db(data_res)
 
+    def obtain_agent_stats(self):
+        """Request statistics from agent, without waiting for the response"""
+        self.virtual_machine.get_agent_connection().send_command(
+            'stats', self.add_agent_stats)
+
+    def add_agent_stats(self, resp):
+        """Add statistics obtained from agent"""
+        data_res = self.get_guest_data_res()
         try:
-            if resp is not None:
-                resp = json.loads(resp)
-                vm_obj = self.virtual_machine
-                data_res['guest_memory'][1] = vm_obj.current_guest_memory_usage = (
-                    resp['memory_usage']
-                    if 'memory_usage' in resp else
-                    None)
-
-                data_res['guest_cpu'][1] = vm_obj.current_guest_cpu_usage = (
-                    resp['cpu_usage']
-                    if 'cpu_usage' in resp else
-                    None)
+            if resp:
+                # Responses from agents not supporting framed requests are JSON strings
+                if isinstance(resp, basestring):
+                    resp = json.loads(resp)
+                self.set_agent_stats(data_res, resp)
 
         except Exception as exc:
             Syslogger.logger().error(
                 'Failed to obtain agent stats: {}'.format(str(exc)))
             pass
+
+        self.insert_into_stat_db(data_res)
+
+    def set_agent_stats(self, data_res, resp):
+        """Populate guest statistics from agent statistics."""
+        vm_obj = self.virtual_machine
+        data_res['guest_memory'][1] = vm_obj.current_guest_memory_usage = (
+            resp['memory_usage']
+            if 'memory_usage' in resp else
+            None)
+
+        data_res['guest_cpu'][1] = vm_obj.current_guest_cpu_usage = (
+            resp['cpu_usage']
+            if 'cpu_usage' in resp else
+            None)
+
+        data_res['guest_filesystem'][1] = resp.get('filesystem_usage')
+        data_res['guest_load'][1] = resp.get('load_average')
@@ -16,9 +16,13 @@
 # along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
 
 from enum import Enum
+from threading import Event, Lock
+import time
+
 import Pyro4
 
 from mcvirt.thread.repeat_timer import RepeatTimer
+from mcvirt.thread.scheduler import Scheduler
 from mcvirt.rpc.pyro_object import PyroObject
 from mcvirt.syslogger import Syslogger
 from mcvirt.argument_validator import ArgumentValidator
@@ -93,6 +97,48 @@ class WatchdogFactory(PyroObject):
             watchdog.repeat = False
             watchdog.cancel()
 
+    @Expose()
+    def check_agents(self):
+        """Ping the agents of all VMs running on the local node at once,
+        returning the round-trip time (ms) of each, or None for agents that did not respond.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        virtual_machines = [
+            virtual_machine
+            for virtual_machine in self.po__get_registered_object(
+                'virtual_machine_factory').get_all_virtual_machines()
+            if virtual_machine.is_registered_locally() and virtual_machine.is_running
+        ]
+        results = {virtual_machine.get_name(): None for virtual_machine in virtual_machines}
+        if not virtual_machines:
+            return results
+
+        lock = Lock()
+        complete = Event()
+        remaining = [len(virtual_machines)]
+
+        def get_callback(vm_name, start_time):
+            """Return callback to record the round-trip time of a VM ping."""
+            def handle_response(resp):
+                """Record round-trip time and mark complete once all agents have responded."""
+                with lock:
+                    if resp == 'pong':
+                        results[vm_name] = (time.time() - start_time) * 1000
+                    remaining[0] -= 1
+                    if not remaining[0]:
+                        complete.set()
+            return handle_response
+
+        for virtual_machine in virtual_machines:
+            virtual_machine.get_agent_connection().send_command(
+                'ping', get_callback(virtual_machine.get_name(), time.time()))
+
+        # Pings that are not responded to are expired after the agent timeout
+        complete.wait(max(virtual_machine.get_agent_timeout()
+                          for virtual_machine in virtual_machines) + 1)
+        with lock:
+            return dict(results)
+
     @Expose(locking=True, remote_nodes=True, support_callback=True)
     def update_watchdog_config(self, change_dict, reason, _f):
         """Update global watchdog config using dict."""
@@ -211,14 +257,19 @@ class Watchdog(RepeatTimer):
         if self.state in [WATCHDOG_STATES.ACTIVE, WATCHDOG_STATES.FAILING]:
             self.set_state(WATCHDOG_STATES.WAITING_RESP)
 
-        agent_conn = self.virtual_machine.get_agent_connection()
+        # The response is handled once received, rather than waiting for it,
+        # so that the agents of all VMs on the node are checked concurrently
+        self.virtual_machine.get_agent_connection().send_command(
+            'ping', self.handle_ping_response)
 
-        resp = None
-        try:
-            resp = agent_conn.wait_lock(command='ping')
-        except Exception, e:
-            Syslogger.logger().error(e)
+        Pyro4.current_context.INTERNAL_REQUEST = False
+        Syslogger.logger().debug('Watchdog ping sent: %s' %
+                                 self.virtual_machine.get_name())
 
+    def handle_ping_response(self, resp):
+        """Handle response to ping, resetting the VM if it has failed to
+        respond to the configured number of pings.
+        """
         # If response is valid, reset counter and state
         if resp == 'pong':
             self.fail_count = 0
@@ -236,12 +287,30 @@ class Watchdog(RepeatTimer):
                     'Watchdog for VM failed. Starting reset: %s' %
                     self.virtual_machine.get_name())
 
-                # Reset VM
-                self.virtual_machine.reset()
-
-                # Reset WATCHDOG_STATES
-                self.set_state(WATCHDOG_STATES.STARTUP)
+                # Reset VM using the scheduler, as the response
+                # may be handled by the agent reactor thread
+                Scheduler.get_instance().schedule(self.reset_virtual_machine, 0, owner=self,
+                                                  long_running=True)
 
-        Pyro4.current_context.INTERNAL_REQUEST = False
         Syslogger.logger().debug('Watchdog complete: %s' %
                                  self.virtual_machine.get_name())
+
+    def reset_virtual_machine(self):
+        """Reset VM and wait for the boot period before the next check."""
+        Pyro4.current_context.INTERNAL_REQUEST = True
+        try:
+            self.virtual_machine.reset()
+        except Exception, exc:
+            self._log_error(exc)
+            return
+        finally:
+            Pyro4.current_context.INTERNAL_REQUEST = False
+
+        # Reset WATCHDOG_STATES
+        self.set_state(WATCHDOG_STATES.STARTUP)
+
+        # Re-schedule the next check using the boot wait period
+        if self.repeat:
+            if self.timer:
+                self.timer.cancel()
+            self.timer = self._schedule(float(self.interval))
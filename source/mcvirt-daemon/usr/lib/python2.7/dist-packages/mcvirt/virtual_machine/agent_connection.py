@@ -18,12 +18,12 @@
 
 import time
 from threading import Lock, Condition
-from serial import Serial
 
 from mcvirt.rpc.pyro_object import PyroObject
 from mcvirt.exceptions import (TimeoutExceededSerialLockError,
-                               UnknownAgentCommandRun)
+                               UnknownAgentCommandRun, AgentCommandFailedError)
 from mcvirt.constants import AgentSerialConfig
+from mcvirt.syslogger import Syslogger
 from mcvirt.version import VERSION
 
 
@@ -50,60 +50,156 @@ class AgentConnection(PyroObject):
     def check_agent_version(self):
         """Check the version of the agent."""
         resp = self.wait_lock(command='version')
+        # Framed responses contain both the agent and protocol version
+        if isinstance(resp, dict):
+            resp = resp['version']
         return resp, VERSION
 
-    def wait_lock(self, callback=None, command=None):
-        """Wait for lock."""
-        # @TODO Replace with 'with' statement
-        # Get lock and condition object
-        lock = self.get_lock_condition()
-        with TimeoutLock(lock=lock, timeout=AgentConnection.LOCK_TIMEOUT):
-            # Attempt to run callback method and capture output
-            conn = None
-            # Obtain serial connection and
-            # pass to callback
-            conn = self.get_serial_connection()
+    def set_telemetry(self, interval, callback):
+        """Subscribe to statistics pushed by the agent at the given interval (seconds),
+        each being passed to the callback, or unsubscribe if the interval is None.
+
+        The agent is only sent the subscription once per connection.
+        Returns whether the agent is pushing statistics.
+        """
+        session_manager = self.virtual_machine.po__get_registered_object(
+            'agent_session_manager')
+        session = session_manager.get_session(self.virtual_machine)
+        if (session.telemetry_interval == interval or
+                (interval and session.protocol == AgentSerialConfig.LEGACY_PROTOCOL_VERSION)):
+            session.event_callback = callback
+            return bool(session.telemetry_interval)
+
+        try:
+            resp = self.wait_lock(command='subscribe', args={'interval': interval})
+        except UnknownAgentCommandRun:
+            # Agent does not support pushing statistics
+            return False
+        if not resp:
+            return False
+
+        session = session_manager.get_session(self.virtual_machine)
+        session.event_callback = callback
+        session.telemetry_interval = interval
+        return bool(interval)
+
+    def wait_lock(self, command, args=None):
+        """Run command on the agent and return the response.
+
+        Agents supporting framed requests are sent the command without waiting
+        for the VM agent lock, allowing commands to run concurrently.
+        Otherwise, the lock is held whilst the command is sent and the response is read.
+        """
+        session_manager = self.virtual_machine.po__get_registered_object(
+            'agent_session_manager')
+        session = session_manager.get_session(self.virtual_machine)
+        if not session.framed:
+            # @TODO Replace with 'with' statement
+            # Get lock and condition object
+            lock = self.get_lock_condition()
+            with TimeoutLock(lock=lock, timeout=AgentConnection.LOCK_TIMEOUT):
+                if session.protocol is None:
+                    try:
+                        session.negotiate()
+                    except Exception:
+                        session_manager.close_connection(self.virtual_machine)
+                        raise
+                if not session.framed:
+                    return self._run_command(session_manager, session, command)
+
+        return self._run_request(session_manager, session, command, args)
+
+    def send_command(self, command, callback, args=None):
+        """Run command on the agent, passing the result to the callback,
+        or None if the command fails or a response is not received before the timeout.
+
+        Agents supporting framed requests are sent the command without waiting for
+        the response, which is passed to the callback by the agent reactor, so the
+        callback must not block. Otherwise, the command is run before returning.
+        """
+        session_manager = self.virtual_machine.po__get_registered_object(
+            'agent_session_manager')
+        try:
+            session = session_manager.get_session(self.virtual_machine)
+            if not session.framed:
+                resp = self.wait_lock(command=command, args=args)
+                callback(resp)
+                return
+        except Exception, exc:
+            Syslogger.logger().error('Failed to run agent command %s on %s: %s' %
+                                     (command, self.virtual_machine.get_name(), str(exc)))
+            callback(None)
+            return
+
+        start_time = time.time()
+
+        def handle_response(resp):
+            """Record latency of the response and pass the result to the callback."""
+            session_manager.record_response(self.virtual_machine, resp,
+                                            time.time() - start_time)
             try:
-                # If callback was provided, run this
-                # with serial command
-                if callback:
-                    resp = callback(conn)
-
-                # Otherwise, if single command was provided to run,
-                # run this
-                elif command:
-                    conn.write('%s\n' % command)
-                    resp = conn.readline().strip()
-
-            except Exception:
-                conn.close()
-                raise
-
-            conn.close()
-
-            # If response indicates that command was not found, raise
-            # an exception
-            if resp == '%%%%':
-                raise UnknownAgentCommandRun('Agent did not understand command')
-
-            return resp
-
-    def get_serial_connection(self):
-        """Obtain serial connection object."""
-        serial_port = self.virtual_machine.get_host_agent_path()
-        timeout = self.virtual_machine.get_agent_timeout()
-        serial_obj = Serial(port=serial_port,
-                            baudrate=AgentSerialConfig.BAUD_RATE,
-                            timeout=timeout,
-                            rtscts=True, dsrdtr=True)
-
-        # Attempt to clear buffers, but retain compatibility with
-        # older versions
-        if 'reset_input_buffer' in dir(serial_obj):
-            serial_obj.reset_input_buffer()
-        if 'reset_output_buffer' in dir(serial_obj):
-            serial_obj.reset_output_buffer()
-        return serial_obj
+                result = self._get_result(resp)
+            except Exception, exc:
+                Syslogger.logger().error('Agent command %s failed on %s: %s' %
+                                         (command, self.virtual_machine.get_name(), str(exc)))
+                result = None
+            callback(result)
+
+        try:
+            session.send_request(command, args, handle_response)
+        except Exception, exc:
+            # Re-open the connection for the next command
+            session_manager.close_connection(self.virtual_machine)
+            Syslogger.logger().error('Failed to send agent command %s to %s: %s' %
+                                     (command, self.virtual_machine.get_name(), str(exc)))
+            callback(None)
+
+    def _run_command(self, session_manager, session, command):
+        """Send bare command to agent and read the response."""
+        start_time = time.time()
+        try:
+            session.reset_input()
+            session.connection.write('%s\n' % command)
+            resp = session.connection.readline().strip()
+        except Exception:
+            # Re-open the connection for the next command
+            session_manager.close_connection(self.virtual_machine)
+            raise
+
+        session_manager.record_response(self.virtual_machine, resp,
+                                        time.time() - start_time)
+
+        # If response indicates that command was not found, raise
+        # an exception
+        if resp == '%%%%':
+            raise UnknownAgentCommandRun('Agent did not understand command')
+
+        return resp
+
+    def _run_request(self, session_manager, session, command, args):
+        """Send framed request to agent and return the result."""
+        start_time = time.time()
+        try:
+            resp = session.request(command, args)
+        except Exception:
+            # Re-open the connection for the next command
+            session_manager.close_connection(self.virtual_machine)
+            raise
+
+        session_manager.record_response(self.virtual_machine, resp,
+                                        time.time() - start_time)
+        return self._get_result(resp)
+
+    def _get_result(self, resp):
+        """Return the result of a framed response."""
+        if resp is None:
+            return None
+        elif resp.get('error') == 'Unknown command':
+            raise UnknownAgentCommandRun('Agent did not understand command')
+        elif 'error' in resp:
+            raise AgentCommandFailedError('Agent command failed: %s' % resp['error'])
+
+        return resp['result']
 
 
 class LockObject(object):
@@ -0,0 +1,220 @@
+"""Multiplex VM agent connections in a single thread."""
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+import errno
+import heapq
+from itertools import count
+import os
+import select
+from threading import Lock, Thread
+import time
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+from mcvirt.syslogger import Syslogger
+
+
+class AgentReactor(PyroObject):
+    """Read from the connections of all VM agents supporting framed requests
+    in a single thread using epoll, rather than a thread per connection.
+
+    Data read from each connection is passed to its session, which runs the
+    callbacks of the requests that have been responded to. Requests that
+    are not responded to before their deadline are expired.
+    """
+
+    # Maximum number of bytes to read from a connection at once
+    READ_SIZE = 4096
+
+    def __init__(self):
+        """Create member variables."""
+        self.epoll = None
+        self.wake_read = None
+        self.wake_write = None
+        self.thread = None
+        self.stopped = False
+        self.lock = Lock()
+
+        # Dict of file descriptor -> session
+        self.sessions = {}
+
+        # Heap of [deadline, sequence, session, request ID], with the session
+        # being set to None once the request has completed, and dict of
+        # (session, request ID) -> entry for requests that have not completed
+        self.deadlines = []
+        self.deadline_entries = {}
+        self.sequence = count()
+        self.loop_count = 0
+        self.expired_count = 0
+
+    def initialise(self):
+        """Start the reactor thread."""
+        self._start()
+
+    def _start(self):
+        """Create epoll object and start thread, if they have not been started."""
+        with self.lock:
+            if self.thread is not None or self.stopped:
+                return
+            self.epoll = select.epoll()
+
+            # Pipe used to wake the thread when an earlier deadline is added
+            self.wake_read, self.wake_write = os.pipe()
+            self.epoll.register(self.wake_read, select.EPOLLIN)
+
+            self.thread = Thread(target=self._run, name='AgentReactor')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def cancel(self):
+        """Stop the reactor thread."""
+        self.stopped = True
+        self._wake()
+
+    def _wake(self):
+        """Wake the reactor thread."""
+        if self.wake_write is not None:
+            try:
+                os.write(self.wake_write, 'x')
+            except OSError:
+                pass
+
+    def register(self, session):
+        """Read from the connection of a session."""
+        self._start()
+        file_descriptor = session.connection.fileno()
+        with self.lock:
+            self.sessions[file_descriptor] = session
+            self.epoll.register(file_descriptor, select.EPOLLIN | select.EPOLLPRI)
+
+    def unregister(self, session):
+        """Stop reading from the connection of a session and remove the deadlines
+        of its requests, which must be called before the connection is closed.
+        """
+        with self.lock:
+            for file_descriptor, registered_session in self.sessions.items():
+                if registered_session is session:
+                    del self.sessions[file_descriptor]
+                    try:
+                        self.epoll.unregister(file_descriptor)
+                    except (IOError, ValueError):
+                        pass
+
+            for key in self.deadline_entries.keys():
+                if key[0] is session:
+                    self.deadline_entries.pop(key)[2] = None
+
+    def add_deadline(self, session, request_id, deadline):
+        """Expire a request if it has not been responded to by the deadline."""
+        self._start()
+        entry = [deadline, next(self.sequence), session, request_id]
+        with self.lock:
+            heapq.heappush(self.deadlines, entry)
+            self.deadline_entries[(session, request_id)] = entry
+            earliest = self.deadlines[0] is entry
+        if earliest:
+            self._wake()
+
+    def remove_deadline(self, session, request_id):
+        """Remove the deadline of a request that has been responded to."""
+        with self.lock:
+            entry = self.deadline_entries.pop((session, request_id), None)
+            if entry is not None:
+                entry[2] = None
+
+    def _get_timeout(self):
+        """Return time (seconds) until the next deadline, or -1 to wait indefinitely."""
+        with self.lock:
+            # Discard deadlines of completed requests
+            while self.deadlines and self.deadlines[0][2] is None:
+                heapq.heappop(self.deadlines)
+            if not self.deadlines:
+                return -1
+            return max(0, self.deadlines[0][0] - time.time())
+
+    def _run(self):
+        """Wait for data from agents and expire requests as their deadlines pass."""
+        while not self.stopped:
+            try:
+                events = self.epoll.poll(self._get_timeout())
+            except IOError, exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                raise
+
+            for file_descriptor, _ in events:
+                if file_descriptor == self.wake_read:
+                    os.read(self.wake_read, self.READ_SIZE)
+                    continue
+                with self.lock:
+                    session = self.sessions.get(file_descriptor)
+                if session is not None:
+                    self._read(session, file_descriptor)
+
+            self._expire_requests()
+            self.loop_count += 1
+
+    def _read(self, session, file_descriptor):
+        """Pass data available on a connection to its session."""
+        try:
+            data = os.read(file_descriptor, self.READ_SIZE)
+        except OSError, exc:
+            if exc.errno in [errno.EAGAIN, errno.EINTR]:
+                return
+            data = ''
+
+        if not data:
+            # The connection has been closed, such as by the VM stopping
+            Syslogger.logger().debug('Agent connection closed: %s' % session.serial_port)
+            session.close()
+            return
+
+        try:
+            session.receive(data)
+        except Exception, exc:
+            Syslogger.logger().error('Failed to handle agent data: %s' % str(exc))
+
+    def _expire_requests(self):
+        """Expire requests with a deadline that has passed."""
+        now = time.time()
+        expired = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, _, session, request_id = heapq.heappop(self.deadlines)
+                if session is not None:
+                    del self.deadline_entries[(session, request_id)]
+                    expired.append((session, request_id))
+
+        for session, request_id in expired:
+            if session.expire_request(request_id):
+                self.expired_count += 1
+
+    @Expose()
+    def get_status(self):
+        """Return the number of connections and outstanding deadlines,
+        the number of loop iterations and the number of expired requests.
+        """
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        with self.lock:
+            return {
+                'connections': len(self.sessions),
+                'deadlines': len(self.deadline_entries),
+                'loop_count': self.loop_count,
+                'expired_count': self.expired_count
+            }
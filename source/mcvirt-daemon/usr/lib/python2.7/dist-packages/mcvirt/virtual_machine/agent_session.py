@@ -0,0 +1,381 @@
+"""Maintain persistent serial connections to VM agents."""
+# Copyright (c) 2018 - I.T. Dev Ltd
+#
+# This file is part of MCVirt.
+#
+# MCVirt is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 2 of the License, or
+# (at your option) any later version.
+#
+# MCVirt is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with MCVirt.  If not, see <http://www.gnu.org/licenses/>
+
+from bisect import bisect_left
+from itertools import count
+from threading import Event, Lock
+import json
+import time
+
+from serial import Serial
+
+from mcvirt.rpc.pyro_object import PyroObject
+from mcvirt.rpc.expose_method import Expose
+from mcvirt.auth.permissions import PERMISSIONS
+from mcvirt.constants import AgentSerialConfig
+from mcvirt.syslogger import Syslogger
+
+
+class AgentRequest(object):
+    """Request sent to an agent, awaiting a response."""
+
+    def __init__(self):
+        """Create event for response."""
+        self.event = Event()
+        self.response = None
+
+    def set_response(self, response):
+        """Store the response and wake the waiting thread."""
+        self.response = response
+        self.event.set()
+
+
+class AgentSession(object):
+    """Serial connection to the agent of a running VM.
+
+    Agents supporting the framed protocol are sent JSON requests,
+    containing a request ID, with responses being read by the agent
+    reactor and passed to the callback of the request, allowing multiple
+    requests to be in progress at once. Older agents are sent a single
+    command at a time, serialised using the VM agent lock.
+    """
+
+    def __init__(self, reactor, serial_port, timeout):
+        """Open the serial connection."""
+        self.reactor = reactor
+        self.serial_port = serial_port
+        self.connection = Serial(port=serial_port,
+                                 baudrate=AgentSerialConfig.BAUD_RATE,
+                                 timeout=timeout,
+                                 rtscts=True, dsrdtr=True)
+        self.protocol = None
+        self.agent_version = None
+        self.closed = False
+        self.request_ids = count(1)
+        self.write_lock = Lock()
+
+        # Dict of request ID -> callback for requests awaiting a response,
+        # which is accessed by the agent reactor and callers, so is guarded by the lock
+        self.pending = {}
+        self.lock = Lock()
+        self.read_buffer = ''
+
+        # Interval (seconds) that the agent has been subscribed to push
+        # statistics at and the callback that pushed statistics are passed to
+        self.telemetry_interval = None
+        self.event_callback = None
+
+    @property
+    def framed(self):
+        """Return whether the agent supports framed requests."""
+        return (self.protocol is not None and
+                self.protocol >= AgentSerialConfig.PROTOCOL_VERSION)
+
+    def reset_input(self):
+        """Discard data received from the agent, such as a response
+        that arrived after the previous command timed out.
+        """
+        # Retain compatibility with older versions
+        if 'reset_input_buffer' in dir(self.connection):
+            self.connection.reset_input_buffer()
+        else:
+            self.connection.flushInput()
+
+    def negotiate(self):
+        """Determine the protocol supported by the agent, by sending the version
+        command as a framed request, which older agents respond to as an unknown command.
+
+        Must be called whilst holding the VM agent lock.
+        """
+        self.reset_input()
+        self.connection.write(json.dumps({'id': 0, 'cmd': 'version'}) + '\n')
+        while True:
+            line = self.connection.readline().strip()
+            if not line:
+                # Agent is not running, so negotiate again for the next command
+                return
+            elif line == '%%%%':
+                # Older agents do not understand framed requests
+                self.protocol = AgentSerialConfig.LEGACY_PROTOCOL_VERSION
+                break
+
+            # Skip statistics pushed by an agent subscribed by a previous
+            # connection, including any partial line remaining after the input was reset
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(response, dict) and response.get('id') == 0:
+                try:
+                    self.agent_version = response['result']['version']
+                    self.protocol = response['result']['protocol']
+                except (KeyError, TypeError):
+                    self.protocol = AgentSerialConfig.LEGACY_PROTOCOL_VERSION
+                break
+
+        if self.framed:
+            self.reactor.register(self)
+
+    def send_request(self, command, args=None, callback=None, timeout=None):
+        """Send framed request to the agent, without waiting for the response.
+
+        The callback is run by the agent reactor with the response, or with None if
+        a response is not received before the timeout (seconds), so must not block.
+        """
+        request_id = next(self.request_ids)
+        with self.lock:
+            registered = not self.closed
+            if registered:
+                self.pending[request_id] = callback
+        if not registered:
+            self._run_callback(callback, {'id': request_id, 'error': 'Agent connection closed'})
+            return
+
+        # Add the deadline before sending the request, as the
+        # response may be received before the request write returns
+        if timeout is None:
+            timeout = self.connection.timeout
+        self.reactor.add_deadline(self, request_id, time.time() + timeout)
+
+        request = {'id': request_id, 'cmd': command}
+        if args:
+            request['args'] = args
+        try:
+            with self.write_lock:
+                self.connection.write(json.dumps(request) + '\n')
+        except Exception:
+            self._pop_request(request_id)
+            self.reactor.remove_deadline(self, request_id)
+            raise
+
+    def request(self, command, args=None):
+        """Send framed request to the agent and return the response,
+        or None if a response is not received before the timeout.
+        """
+        agent_request = AgentRequest()
+        self.send_request(command, args, agent_request.set_response)
+        agent_request.event.wait(self.connection.timeout)
+        return agent_request.response
+
+    def receive(self, data):
+        """Handle data read from the agent by the agent reactor."""
+        # Retain partial responses until the remainder has been received
+        self.read_buffer += data
+        while '\n' in self.read_buffer:
+            line, self.read_buffer = self.read_buffer.split('\n', 1)
+            line = line.strip()
+            try:
+                response = json.loads(line)
+                if 'event' in response:
+                    self._handle_event(response)
+                    continue
+                request_id = response['id']
+            except (ValueError, KeyError, TypeError):
+                Syslogger.logger().error('Invalid response from agent: %s' % line)
+                continue
+            pending, callback = self._pop_request(request_id)
+            if pending:
+                self.reactor.remove_deadline(self, request_id)
+                self._run_callback(callback, response)
+
+    def expire_request(self, request_id):
+        """Pass None to the callback of a request that has not been
+        responded to before its deadline. Returns whether the request had expired.
+        """
+        pending, callback = self._pop_request(request_id)
+        if pending:
+            self._run_callback(callback, None)
+        return pending
+
+    def _pop_request(self, request_id):
+        """Remove a request awaiting a response, returning
+        whether it was awaiting a response and its callback.
+        """
+        with self.lock:
+            if request_id not in self.pending:
+                return False, None
+            return True, self.pending.pop(request_id)
+
+    def _run_callback(self, callback, response):
+        """Pass response to the callback of a request."""
+        if callback is None:
+            return
+        try:
+            callback(response)
+        except Exception, exc:
+            Syslogger.logger().error('Failed to handle agent response: %s' % str(exc))
+
+    def _handle_event(self, event):
+        """Pass event pushed by the agent to the callback."""
+        if self.event_callback is None:
+            return
+        try:
+            self.event_callback(event)
+        except Exception, exc:
+            Syslogger.logger().error('Failed to handle agent event: %s' % str(exc))
+
+    def close(self):
+        """Close the serial connection and fail outstanding requests."""
+        with self.lock:
+            self.closed = True
+            pending, self.pending = self.pending, {}
+
+        self.reactor.unregister(self)
+        try:
+            self.connection.close()
+        except Exception, exc:
+            Syslogger.logger().error('Failed to close agent connection: %s' % str(exc))
+
+        for request_id, callback in pending.items():
+            self._run_callback(callback, {'id': request_id, 'error': 'Agent connection closed'})
+
+
+class AgentLatencyHistogram(object):
+    """Histogram of agent command round-trip latencies for a VM."""
+
+    # Upper bounds (milliseconds) of histogram buckets. Latencies greater
+    # than the last bound are counted in a final bucket.
+    BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+    def __init__(self):
+        """Create empty histogram."""
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.timeout_count = 0
+        self.error_count = 0
+        self.connect_count = 0
+
+    def add(self, latency):
+        """Add the latency (milliseconds) of a response."""
+        self.counts[bisect_left(self.BUCKETS, latency)] += 1
+
+    def to_dict(self):
+        """Return histogram as a dict."""
+        return {
+            'buckets': zip(self.BUCKETS + [None], self.counts),
+            'count': sum(self.counts),
+            'timeout_count': self.timeout_count,
+            'error_count': self.error_count,
+            'connect_count': self.connect_count
+        }
+
+
+class AgentSessionManager(PyroObject):
+    """Keep a serial connection open to the agent of each running VM,
+    rather than opening a connection for each agent command.
+
+    For agents not supporting framed requests, access to the connection
+    for a VM is serialised by the caller, using the VM agent lock.
+    """
+
+    def __init__(self):
+        """Create member variables."""
+        # Sessions and histograms are guarded by the lock. Sessions are
+        # closed without holding the lock, as closing a session runs the
+        # callbacks of outstanding requests.
+        self.sessions = {}
+        self.histograms = {}
+        self.lock = Lock()
+
+    def cancel(self):
+        """Close all agent connections."""
+        with self.lock:
+            sessions, self.sessions = self.sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def get_session(self, virtual_machine):
+        """Return the session for the agent of a VM, opening a new
+        connection if there is no open session.
+
+        Sessions are invalidated when the VM is started, stopped or migrated
+        and are closed when the VM stops, as the serial port of the libvirt
+        domain is no longer valid.
+        """
+        vm_name = virtual_machine.get_name()
+        timeout = virtual_machine.get_agent_timeout()
+        with self.lock:
+            session = self.sessions.get(vm_name)
+        if session is not None and not session.closed:
+            session.connection.timeout = timeout
+            return session
+
+        # Open the connection without holding the lock, so that
+        # a VM that is slow to connect to does not block other VMs
+        new_session = AgentSession(self.po__get_registered_object('agent_reactor'),
+                                   virtual_machine.get_host_agent_path(), timeout)
+        with self.lock:
+            session = self.sessions.get(vm_name)
+            if session is None or session.closed:
+                self.sessions[vm_name] = new_session
+                self._get_histogram(vm_name).connect_count += 1
+                return new_session
+
+        # Another thread has opened a session in the meantime
+        new_session.close()
+        return session
+
+    def close_connection(self, virtual_machine):
+        """Close the connection to a VM agent after a failed command,
+        so that it is re-opened for the next command.
+        """
+        vm_name = virtual_machine.get_name()
+        with self.lock:
+            self._get_histogram(vm_name).error_count += 1
+        self._close_session(vm_name)
+
+    def invalidate(self, virtual_machine):
+        """Close the connection to a VM agent after the VM has been started,
+        stopped or migrated, so that it is re-opened for the next command.
+        """
+        self._close_session(virtual_machine.get_name())
+
+    def _close_session(self, vm_name):
+        """Remove and close the session for a VM."""
+        with self.lock:
+            session = self.sessions.pop(vm_name, None)
+        if session is not None:
+            session.close()
+
+    def record_response(self, virtual_machine, response, latency):
+        """Record the round-trip latency (seconds) of an agent command."""
+        with self.lock:
+            histogram = self._get_histogram(virtual_machine.get_name())
+            if response:
+                histogram.add(latency * 1000)
+            else:
+                histogram.timeout_count += 1
+
+    def _get_histogram(self, vm_name):
+        """Return the latency histogram for a VM, creating it if it does not exist.
+
+        Must be called whilst holding the lock.
+        """
+        if vm_name not in self.histograms:
+            self.histograms[vm_name] = AgentLatencyHistogram()
+        return self.histograms[vm_name]
+
+    @Expose()
+    def get_latency_histograms(self, vm_name=None):
+        """Return agent latency histograms for VMs on the local node."""
+        self.po__get_registered_object('auth').assert_permission(PERMISSIONS.SUPERUSER)
+        with self.lock:
+            return {
+                name: histogram.to_dict()
+                for name, histogram in self.histograms.items()
+                if vm_name is None or name == vm_name
+            }
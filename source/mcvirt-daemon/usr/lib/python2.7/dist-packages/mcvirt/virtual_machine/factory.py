@@ -22,6 +22,7 @@ from enum import Enum
 
 from mcvirt.virtual_machine.virtual_machine import VirtualMachine
 from mcvirt.config.virtual_machine import VirtualMachine as VirtualMachineConfig
+from mcvirt.config.virtual_machine_index import VirtualMachineIndex
 from mcvirt.config.core import Core as MCVirtConfig
 from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.exceptions import (InvalidNodesException, DrbdNotEnabledOnNode,
@@ -96,16 +97,13 @@ class Factory(PyroObject):
     def get_virtual_machine_by_name(self, vm_name):
         """Obtain a VM object, based on VM name."""
         ArgumentValidator.validate_hostname(vm_name)
-        name_id_dict = {
-            val['name']: key
-            for key, val in VirtualMachineConfig.get_global_config().items()
-        }
-        if vm_name not in name_id_dict:
+        vm_id = VirtualMachineIndex.get_id_by_name(vm_name)
+        if vm_id is None:
             raise VirtualMachineDoesNotExistException(
                 'Error: Virtual Machine does not exist: %s' % vm_name
             )
 
-        return self.get_virtual_machine_by_id(name_id_dict[vm_name])
+        return self._get_virtual_machine_object(vm_id)
 
     @Expose()
     def get_virtual_machine_by_id(self, vm_id):
@@ -119,6 +117,10 @@ class Factory(PyroObject):
                 'Error: Virtual Machine does not exist: %s' % vm_id
             )
 
+        return self._get_virtual_machine_object(vm_id)
+
+    def _get_virtual_machine_object(self, vm_id):
+        """Obtain a VM object for a VM ID that is known to exist."""
         # Determine if VM object has been cached
         if vm_id not in Factory.CACHED_OBJECTS:
             # If not, create object, register with pyro
@@ -134,12 +136,17 @@ class Factory(PyroObject):
     @Expose()
     def get_all_virtual_machines(self, node=None):
         """Return objects for all virtual machines."""
-        return [self.get_virtual_machine_by_id(vm_id) for vm_id in self.get_all_vm_ids(node=node)]
+        # IDs are obtained from the VM index, so do not need
+        # to be validated or checked for existence
+        return [self._get_virtual_machine_object(vm_id)
+                for vm_id in self.get_all_vm_ids(node=node)]
 
     @Expose()
     def get_all_vm_ids(self, node=None):
-        """Get all VM IDs."""
-        return VirtualMachineConfig.get_global_config().keys()
+        """Get all VM IDs, optionally only those registered on a given node."""
+        if node is not None:
+            return VirtualMachineIndex.get_ids_by_node(node)
+        return VirtualMachineIndex.get_ids()
 
     @Expose()
     def getAllVmNames(self, node=None):
@@ -149,7 +156,7 @@ class Factory(PyroObject):
 
         # If no node was defined, check the local configuration for all VMs
         if node is None:
-            return [vm['name'] for vm in VirtualMachineConfig.get_global_config().values()]
+            return VirtualMachineIndex.get_names()
 
         elif node == get_hostname():
             # @TODO - Why is this using libvirt?! Should use
@@ -222,7 +229,7 @@ class Factory(PyroObject):
         except (MCVirtTypeError, InvalidVirtualMachineNameException):
             return False
 
-        return id_ in self.get_all_vm_ids()
+        return VirtualMachineIndex.exists(id_)
 
     @Expose()
     def check_exists_by_name(self, name):
@@ -232,7 +239,7 @@ class Factory(PyroObject):
         except (MCVirtTypeError, InvalidVirtualMachineNameException):
             return False
 
-        return name in self.getAllVmNames()
+        return VirtualMachineIndex.get_id_by_name(name) is not None
 
     @Expose()
     def checkName(self, name, ignore_exists=False):
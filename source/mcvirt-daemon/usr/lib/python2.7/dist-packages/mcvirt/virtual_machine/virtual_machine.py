@@ -23,7 +23,8 @@ from texttable import Texttable
 from enum import Enum
 import libvirt
 
-from mcvirt.constants import DirectoryLocation, PowerStates, LockStates, AutoStartStates
+from mcvirt.constants import (DirectoryLocation, PowerStates, LockStates, AutoStartStates,
+                              AgentSerialConfig)
 from mcvirt.exceptions import (
     MigrationFailureExcpetion, InsufficientPermissionsException,
     VmAlreadyExistsException, LibvirtException,
@@ -47,6 +48,7 @@ from mcvirt.config.core import Core as MCVirtConfig
 from mcvirt.virtual_machine.disk_drive import DiskDrive
 from mcvirt.virtual_machine.usb_device import UsbDevice
 from mcvirt.config.virtual_machine import VirtualMachine as VirtualMachineConfig
+from mcvirt.config.virtual_machine_index import VirtualMachineIndex
 from mcvirt.auth.permissions import PERMISSIONS
 from mcvirt.rpc.pyro_object import PyroObject
 from mcvirt.rpc.expose_method import Expose
@@ -331,6 +333,8 @@ class VirtualMachine(PyroObject):
                     self._get_libvirt_domain_object().destroy()
                 except Exception as exc:
                     raise LibvirtException('Failed to stop VM: %s' % str(exc))
+                finally:
+                    self.po__get_registered_object('agent_session_manager').invalidate(self)
             else:
                 raise VmAlreadyStoppedException('The VM is already shutdown')
         elif not self.po__cluster_disabled and self.is_registered_remotely():
@@ -441,6 +445,8 @@ class VirtualMachine(PyroObject):
                     pass
 
                 raise LibvirtException('Failed to start VM: %s' % str(exc))
+            finally:
+                self.po__get_registered_object('agent_session_manager').invalidate(self)
 
         elif not self.po__cluster_disabled and self.is_registered_remotely():
             cluster = self.po__get_registered_object('cluster')
@@ -1048,7 +1054,7 @@ class VirtualMachine(PyroObject):
 
     def get_clone_children(self):
         """Returns the VMs that have been cloned from the VM."""
-        return self.get_config_object().get_config()['clone_children']
+        return VirtualMachineIndex.get_clone_children(self.get_name())
 
     @Expose(locking=True)
     def offline_migrate(self, destination_node_name, start_after_migration=False,
@@ -1174,6 +1180,9 @@ class VirtualMachine(PyroObject):
             if not status:
                 raise MigrationFailureExcpetion('Libvirt migration failed')
 
+            # Close the agent connection, as the domain no longer runs on the local node
+            self.po__get_registered_object('agent_session_manager').invalidate(self)
+
             # Perform post steps on hard disks and check disks
             for disk_object in self.get_hard_drive_objects():
                 disk_object.postOnlineMigration()
@@ -1344,22 +1353,25 @@ class VirtualMachine(PyroObject):
             """Update clone parent config."""
             vm_config['clone_parent'] = self.get_name()
 
-        new_vm_object.get_config_object().update_config(
-            set_clone_parent,
-            'Set VM clone parent after initial clone')
-
         def set_clone_child(vm_config):
             """Set clone children config in new VM."""
             vm_config['clone_children'].append(new_vm_object.get_name())
 
-        self.get_config_object().update_config(
-            set_clone_child,
-            'Added new clone \'%s\' to VM configuration' %
-            self.get_name())
+        # Write the clone configuration and permissions to the config
+        # file in a single transaction
+        with self.get_config_object().config_transaction():
+            new_vm_object.get_config_object().update_config(
+                set_clone_parent,
+                'Set VM clone parent after initial clone')
 
-        # Set current user as an owner of the new VM, so that they have permission
-        # to perform functions on the VM
-        self.po__get_registered_object('auth').copy_permissions(self, new_vm_object)
+            self.get_config_object().update_config(
+                set_clone_child,
+                'Added new clone \'%s\' to VM configuration' %
+                self.get_name())
+
+            # Set current user as an owner of the new VM, so that they have permission
+            # to perform functions on the VM
+            self.po__get_registered_object('auth').copy_permissions(self, new_vm_object)
 
         # Clone the hard drives of the VM
         disk_objects = self.get_hard_drive_objects()
@@ -1797,22 +1809,6 @@ class VirtualMachine(PyroObject):
         """Obtain an agent connection object."""
         return AgentConnection(self)
 
-    def get_libvirt_memory_stats(self):
-        """Obtain memory stats from libvirt"""
-        return self._get_libvirt_domain_object().memoryStats()
-
-    def get_libvirt_cpu_stats(self):
-        """Obtain memory stats from libvirt"""
-        # Return aggregated CPU stats and CPU-specific stats
-        dom = self._get_libvirt_domain_object()
-
-        return (
-            # Aggregated stats
-            [dom.getCPUStats(True)[0]['cpu_time']]
-            # CPU-specific stats
-            + [cpu['vcpu_time'] for cpu in dom.getCPUStats(False)]
-        )
-
     def _get_memballoon_xml(self):
         """Return XML object containing memballoon configuration"""
         xml = ET.Element('memballoon')
@@ -1870,6 +1866,33 @@ class VirtualMachine(PyroObject):
 
         return timeout
 
+    def get_agent_telemetry_interval(self):
+        """Obtain the interval (seconds) that the agent pushes statistics,
+        or None if the agent is polled for statistics.
+        """
+        return self.get_config_object().get_config()['agent']['telemetry_interval']
+
+    @Expose(locking=True)
+    def set_agent_telemetry_interval(self, interval):
+        """Set the interval (seconds) that the agent pushes statistics,
+        or None to poll the agent for statistics.
+        """
+        if interval is not None:
+            ArgumentValidator.validate_positive_float(interval)
+            interval = float(interval)
+            if interval < AgentSerialConfig.MIN_TELEMETRY_INTERVAL:
+                raise MCVirtTypeError('Telemetry interval must be at least %s seconds' %
+                                      AgentSerialConfig.MIN_TELEMETRY_INTERVAL)
+
+        # Check permissions
+        self.po__get_registered_object('auth').assert_permission(
+            PERMISSIONS.MODIFY_VM, self)
+
+        self.update_vm_config(
+            change_dict={'agent': {'telemetry_interval': interval}},
+            reason='Update agent telemetry interval',
+            nodes=self.po__get_registered_object('cluster').get_nodes(include_local=True))
+
     def is_watchdog_enabled(self):
         """Obtain watchdog interval from config."""
         return self.get_config_object().get_config()['watchdog']['enabled']